@@ -1,30 +1,90 @@
+import click
+import time
 from flask import Flask
-from models import db, populate
+from models import db, configure_sqlite, populate, occupancy, migrations, rollups, jobs, admin_jobs
+from models.lot_cache import lot_cache
+from models.principals import load_principal
+from controllers import controllers, user_controllers, admin_controllers, api_controllers
+from controllers.controller_common import routes
 from flask_login import LoginManager
 from config import LocalDevelopmentConfig
 
-def create_app():
+def create_app(config=LocalDevelopmentConfig):
     app = Flask(__name__)
-    app.config.from_object(LocalDevelopmentConfig)
+    app.config.from_object(config)
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('SECRET_KEY is not set; sessions cannot be signed without it.')
     db.init_app(app)
+    lot_cache.configure(app.config.get('LOT_CACHE_URL'))
 
     login_manager = LoginManager()
     login_manager.init_app(app)
 
-    from models.models import User
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_principal(user_id)
 
-    app.app_context().push()
-    return app
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters():
+        """Rebuild per-lot occupancy counters from ParkingSpot rows."""
+        for lot_id, stored, actual in occupancy.find_drift():
+            click.echo(f'Lot {lot_id}: stored {stored}, actual {actual}')
+        occupancy.rebuild_counters()
+        db.session.commit()
+        click.echo('Occupancy counters rebuilt.')
+
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups():
+        """Rebuild the daily revenue rollups from ticket history."""
+        rollups.rebuild_rollups()
+        db.session.commit()
+        click.echo('Revenue rollups rebuilt.')
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Create missing tables and apply pending schema migrations."""
+        applied = migrations.upgrade()
+        click.echo(f'Applied migrations: {applied}' if applied else 'Database is up to date.')
 
-app = create_app()
+    @app.cli.command('seed')
+    @click.option('--demo/--no-demo', default=True, help='Add the demo lots, users and tickets.')
+    @click.option('--lots', default=0, help='Synthetic lots to generate.')
+    @click.option('--spots-per-lot', default=50, help='Spots in each synthetic lot.')
+    @click.option('--users', default=0, help='Synthetic users to generate.')
+    @click.option('--tickets-per-lot', default=0, help='Closed tickets per synthetic lot.')
+    @click.option('--password', default='password', help='Password of the synthetic users.')
+    def seed(demo, lots, spots_per_lot, users, tickets_per_lot, password):
+        """Add demo data and, optionally, bulk synthetic data for benchmarking."""
+        migrations.upgrade()
+        if demo:
+            populate.populate_db()
+            click.echo('Demo data is in place.')
+        if lots or users:
+            start = time.perf_counter()
+            populate.generate_synthetic_data(lots, spots_per_lot, users, tickets_per_lot, password)
+            click.echo(f'Generated {lots} lots, {lots * spots_per_lot} spots, {users} users and '
+                       f'{lots * tickets_per_lot if users else 0} tickets '
+                       f'in {time.perf_counter() - start:.1f} s.')
 
-with app.app_context():
-    from controllers import controllers, user_controllers, admin_controllers
-    db.create_all()
-    populate.populate_db()
+    @app.cli.command('jobs-worker')
+    @click.option('--threads', default=1, help='Jobs to run at the same time.')
+    def jobs_worker(threads):
+        """Run queued background jobs until interrupted."""
+        jobs.start_workers(app, threads - 1)
+        click.echo(f'Running background jobs with {threads} thread(s).')
+        jobs.work(app)
+
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS'))
+        routes.init_app(app)
+        if app.config.get('INSTRUMENTATION'):
+            from controllers import instrumentation
+            instrumentation.init_app(app)
+        if app.config.get('AUTO_MIGRATE'):
+            migrations.upgrade()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    jobs.start_workers(app, app.config['JOB_WORKERS'])
+    app.run(debug=True)
@@ -0,0 +1,26 @@
+"""Async entry point for ASGI servers, e.g.
+
+    uvicorn --workers 4 asgi:app
+
+The read-heavy JSON endpoints (lot listing and availability, ticket
+lookup and the live availability feed) are served by async handlers on an
+aiosqlite engine; every other request runs the Flask app in a thread pool.
+Needs `pip install -r requirements-async.txt`.
+"""
+from app import create_app
+from config import ProductionConfig
+from models import db, jobs
+from models.async_db import create_async_session_factory
+
+
+def create_asgi_app(config=ProductionConfig):
+    flask_app = create_app(config)
+    flask_app.config['LIVE_AVAILABILITY'] = True
+    from controllers.async_api import AsyncReadApi
+    with flask_app.app_context():
+        url = db.engine.url
+    return flask_app, AsyncReadApi(flask_app, create_async_session_factory(url, flask_app.config))
+
+
+flask_app, app = create_asgi_app()
+jobs.start_workers(flask_app, flask_app.config['JOB_WORKERS'])
@@ -0,0 +1,76 @@
+"""Concurrent park requests against one lot must never double-book a spot.
+
+Each worker thread runs park_in_lot() in its own session and commits, the
+way parallel requests would. Run from the repository root:
+
+    python -m benchmarks.bench_allocation
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from models import db
+from models.models import ParkingSpot, Ticket, User
+from models.occupancy import find_drift, rebuild_counters
+from models.parking import park_in_lot
+from models.spot_index import free_spots
+from .common import make_app, seed
+
+SPOTS = 2000
+THREAD_COUNTS = [1, 4, 16, 32]
+
+
+def run(app, lot_id, user_id, n_threads):
+    requests_per_thread = (SPOTS + n_threads - 1) // n_threads + 10
+    failures = []
+
+    def worker(index):
+        with app.app_context():
+            for i in range(requests_per_thread):
+                try:
+                    park_in_lot(user_id, lot_id, f'T{index:02d}{i:05d}')
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    failures.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return n_threads * requests_per_thread / elapsed, failures
+
+
+def main():
+    app = make_app(engine_options={'connect_args': {'timeout': 30, 'check_same_thread': False}})
+    ok = True
+    with app.app_context():
+        lot_id, = seed(1, spots_per_lot=SPOTS)
+        user_id = db.session.query(db.func.min(User.id)).scalar()
+
+    for n_threads in THREAD_COUNTS:
+        ops, failures = run(app, lot_id, user_id, n_threads)
+        with app.app_context():
+            per_spot = Counter(spot_id for (spot_id,) in db.session.query(Ticket.spot_id).filter_by(active=True))
+            doubled = [spot_id for spot_id, n in per_spot.items() if n > 1]
+            occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status='O').count()
+            drift = find_drift()
+            print(f'{n_threads:>3} threads: {ops:8.0f} park req/s, {len(per_spot)} tickets, '
+                  f'{len(doubled)} double-booked, {len(failures)} errors, drift={drift}')
+            if doubled or failures or drift or occupied != SPOTS or len(per_spot) != SPOTS:
+                ok = False
+
+            db.session.query(Ticket).delete()
+            db.session.query(ParkingSpot).update({'status': 'A'})
+            rebuild_counters()
+            db.session.commit()
+            free_spots.invalidate()
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
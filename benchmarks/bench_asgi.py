@@ -0,0 +1,177 @@
+"""Throughput of the read endpoints over WSGI and ASGI at rising concurrency.
+
+Starts one uvicorn process at a time on a copy of the bundled database:
+first serving wsgi.py through its WSGI interface (the whole Flask app in a
+thread pool, as a threaded WSGI worker would), then asgi.py. An asyncio client holds CONNECTIONS keep-alive
+connections open and loops over lot listing, lot availability and ticket
+lookup for DURATION seconds per level, reporting requests per second and
+p50/p99 latency. The last level repeats the first with STREAMS live
+availability feeds held open alongside, which each tie up a thread under
+WSGI; requests that get no answer within REQUEST_TIMEOUT count as errors. Needs the packages
+pinned in requirements-async.txt. Run from the repository root:
+
+    python -m benchmarks.bench_asgi
+"""
+import asyncio
+import http.client
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from .load_test import ROOT, USERS, prepare
+
+CONNECTIONS = [10, 100, 500]
+DURATION = 5
+STREAMS = 50
+REQUEST_TIMEOUT = 5
+HOST = '127.0.0.1'
+# Entry point module -> uvicorn --interface
+MODES = {'wsgi': 'wsgi', 'asgi': 'asgi3'}
+REQUIRED = ['aiosqlite', 'asgiref', 'uvicorn']
+
+
+def start(mode, db_path, port):
+    command = [sys.executable, '-m', 'uvicorn', f'{mode}:app', '--interface', MODES[mode], '--host', HOST,
+               '--port', str(port), '--log-level', 'warning', '--backlog', '4096']
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', SECRET_KEY='benchmark')
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline and server.poll() is None:
+        try:
+            socket.create_connection((HOST, port)).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def setup(port, lot_id):
+    """Log in, park one ticket to look up, and return the session cookie and request paths."""
+    conn = http.client.HTTPConnection(HOST, port)
+    username, password = USERS[0]
+    conn.request('POST', '/login', body=f'username={username}&password={password}',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if cookie is None:
+        raise RuntimeError(f'login as {username} failed: HTTP {response.status}')
+    cookie = cookie.split(';')[0]
+    conn.request('POST', '/api/park', body=json.dumps({'lot_id': lot_id, 'vehicle_number': 'ASGI01'}),
+                 headers={'Content-Type': 'application/json', 'Cookie': cookie})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    try:
+        ticket_id = json.loads(body)['id']
+    except (ValueError, KeyError, TypeError):
+        raise RuntimeError(f'parking a test ticket failed: HTTP {response.status} {body[:200]!r}') from None
+    return cookie, ['/api/lots', f'/api/lots/{lot_id}/availability', f'/api/tickets/{ticket_id}']
+
+
+async def get(reader, writer, path, cookie):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\nCookie: {cookie}\r\n\r\n'.encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, cookie, paths, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(get(reader, writer, paths[i % len(paths)], cookie),
+                                                REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                errors.append('timeout')
+                return
+            i += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(port, cookie, paths, connections, streams=0):
+    """Run ``connections`` clients for DURATION seconds, with ``streams`` feeds held open."""
+    held = []
+    for _ in range(streams):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(f'GET /api/lots/availability/stream HTTP/1.1\r\nHost: {HOST}\r\n'
+                     f'Cookie: {cookie}\r\n\r\n'.encode())
+        held.append(writer)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(*[client(port, cookie, paths, deadline, latencies, errors)
+                           for _ in range(connections)])
+    for writer in held:
+        writer.close()
+    latencies.sort()
+    return {
+        'rps': len(latencies) / DURATION,
+        'p50_ms': statistics.median(latencies) if latencies else float('nan'),
+        'p99_ms': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] if latencies else float('nan'),
+        'errors': len(errors),
+    }
+
+
+def main():
+    missing = [name for name in REQUIRED if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"FAIL: {', '.join(missing)} not installed; run pip install -r requirements-async.txt")
+        return 1
+    db_path, lot_id = prepare('ProductionConfig')
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        port = sock.getsockname()[1]
+    print(f"{'mode':<5} {'connections':>11} {'streams':>7} {'req/s':>8} {'p50':>10} {'p99':>10}")
+    try:
+        for mode in MODES:
+            try:
+                server = start(mode, db_path, port)
+            except RuntimeError as error:
+                print(f'FAIL: {error}')
+                return 1
+            try:
+                try:
+                    cookie, paths = setup(port, lot_id)
+                except (RuntimeError, OSError, http.client.HTTPException) as error:
+                    print(f'FAIL: {mode} server: {error}')
+                    return 1
+                for connections, streams in [(n, 0) for n in CONNECTIONS] + [(CONNECTIONS[0], STREAMS)]:
+                    result = asyncio.run(load(port, cookie, paths, connections, streams))
+                    print(f"{mode:<5} {connections:>11} {streams:>7} {result['rps']:8.0f} "
+                          f"{result['p50_ms']:7.1f} ms "
+                          f"{result['p99_ms']:7.1f} ms"
+                          + (f"  {result['errors']} errors" if result['errors'] else ''))
+            finally:
+                server.terminate()
+                try:
+                    server.wait(10)
+                except subprocess.TimeoutExpired:
+                    # Streams still hold WSGI threads, which a graceful shutdown waits for.
+                    server.kill()
+                    server.wait()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Batched park/release versus one transaction per operation.
+
+For each batch size, parks fill the lot and are then all released, either
+through process_batch() with one commit per batch or through
+park_in_lot()/release_ticket() with one commit per operation. Run from the
+repository root:
+
+    python -m benchmarks.bench_batch
+"""
+import sys
+from models import db
+from models.models import ParkingSpot, Ticket, User
+from models.occupancy import find_drift
+from models.parking import park_in_lot, process_batch, release_ticket
+from .common import make_app, seed, timed
+
+OPERATIONS = 2000
+BATCH_SIZES = [1, 10, 100, 1000]
+
+
+def single(lot_id, user_id):
+    ticket_ids = []
+    for i in range(OPERATIONS):
+        ticket = park_in_lot(user_id, lot_id, f'S{i:05d}')
+        db.session.commit()
+        ticket_ids.append(ticket.id)
+    for ticket_id in ticket_ids:
+        release_ticket(db.session.get(Ticket, ticket_id))
+        db.session.commit()
+
+
+def batched(lot_id, user_id, size):
+    ticket_ids = []
+    for start in range(0, OPERATIONS, size):
+        results = process_batch([{'op': 'park', 'lot_id': lot_id, 'user_id': user_id,
+                                  'vehicle_number': f'B{i:05d}'}
+                                 for i in range(start, min(start + size, OPERATIONS))])
+        ticket_ids.extend(result['ticket'].id for result in results if result['ok'])
+        db.session.commit()
+    for start in range(0, len(ticket_ids), size):
+        process_batch([{'op': 'release', 'ticket_id': ticket_id}
+                       for ticket_id in ticket_ids[start:start + size]])
+        db.session.commit()
+    return len(ticket_ids)
+
+
+def main():
+    app = make_app()
+    ok = True
+    with app.app_context():
+        lot_id, = seed(1, spots_per_lot=OPERATIONS)
+        user_id = db.session.query(db.func.min(User.id)).scalar()
+
+        elapsed = timed(lambda: single(lot_id, user_id), repeat=1)
+        print(f'{"per-op":>10}: {2 * OPERATIONS / elapsed * 1000:8.0f} ops/s')
+
+        for size in BATCH_SIZES:
+            parked = []
+            elapsed = timed(lambda: parked.append(batched(lot_id, user_id, size)), repeat=1)
+            parked = parked[0]
+            occupied = ParkingSpot.query.filter_by(lot_id=lot_id, status='O').count()
+            drift = find_drift()
+            print(f'{"batch " + str(size):>10}: {2 * OPERATIONS / elapsed * 1000:8.0f} ops/s '
+                  f'({parked} parked, {occupied} still occupied, drift={drift})')
+            if parked != OPERATIONS or occupied or drift:
+                ok = False
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Ticket export must stream in flat memory regardless of row count.
+
+Seeds synthetic tickets, consumes the CSV and NDJSON export generators
+and fails if the Python heap grows past a fixed ceiling while exporting.
+Run from the repository root (the default is one million tickets):
+
+    python -m benchmarks.bench_export [tickets]
+"""
+import sys
+import time
+import tracemalloc
+from models.ticket_export import EXPORT_FORMATS, export_statement
+from .common import make_app, seed
+
+MEMORY_CEILING_MB = 32
+
+
+def main(tickets=1_000_000):
+    app = make_app()
+    ok = True
+    with app.app_context():
+        seed(100, spots_per_lot=50, tickets_per_lot=tickets // 100, n_users=1000)
+
+        for fmt, (generate, _) in EXPORT_FORMATS.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            lines = size = 0
+            for chunk in generate(export_statement()):
+                lines += chunk.count('\n')
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            peak_mb = peak / 2**20
+            print(f'{fmt:>6}: {lines} lines, {size / 2**20:.0f} MB in {elapsed:.1f} s, '
+                  f'peak heap {peak_mb:.1f} MB (ceiling {MEMORY_CEILING_MB} MB)')
+            ok = ok and peak_mb <= MEMORY_CEILING_MB and lines >= tickets
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,70 @@
+"""Per-request overhead of the always-on instrumentation.
+
+Serves the same requests from the production config with INSTRUMENTATION
+off and on, each in a fresh interpreter (routes and hooks are registered
+once per process). Runs alternate between the two for ROUNDS rounds and
+the best mean time per request of each is reported. Run from the
+repository root:
+
+    python -m benchmarks.bench_instrumentation
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from .load_test import ROOT, USERS, bench_config, prepare
+
+REQUESTS = 2000
+ROUNDS = 3
+PATHS = ['/api/lots', '/user/dashboard']
+
+
+def serve(db_path, lot_id, instrumented):
+    """Time REQUESTS requests per path in this process and print them as JSON."""
+    from app import create_app
+    config = bench_config('ProductionConfig', db_path)
+    config.INSTRUMENTATION = instrumented
+    app = create_app(config)
+    client = app.test_client()
+    username, password = USERS[0]
+    client.post('/login', data={'username': username, 'password': password})
+    paths = PATHS + [f'/api/lots/{lot_id}/availability']
+    timings = {}
+    for path in paths:
+        for _ in range(100):
+            client.get(path)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            client.get(path)
+        timings[path] = (time.perf_counter() - start) * 1e6 / REQUESTS
+    json.dump(timings, sys.stdout)
+
+
+def main():
+    db_path, lot_id = prepare('ProductionConfig')
+    try:
+        results = {False: {}, True: {}}
+        for _ in range(ROUNDS):
+            for instrumented in (False, True):
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_instrumentation',
+                                         '--serve', db_path, str(lot_id), str(int(instrumented))],
+                                        cwd=ROOT, capture_output=True, text=True, check=True).stdout
+                for path, us in json.loads(output).items():
+                    results[instrumented][path] = min(us, results[instrumented].get(path, us))
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    print(f"{'path':<28} {'off':>9} {'on':>9} {'overhead':>9}")
+    for path, off in results[False].items():
+        on = results[True][path]
+        print(f'{path:<28} {off:6.0f} us {on:6.0f} us {on - off:6.0f} us')
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--serve']:
+        serve(sys.argv[2], int(sys.argv[3]), sys.argv[4] == '1')
+        sys.exit(0)
+    sys.exit(main())
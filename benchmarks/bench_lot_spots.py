@@ -0,0 +1,65 @@
+"""Creating, growing, shrinking and deleting very large lots.
+
+Times the bulk spot paths behind create/edit/delete parking lot on a
+100,000-spot lot, next to the old one-ORM-object-per-spot insert, and
+checks the counters still match the spots. Run from the repository root:
+
+    python -m benchmarks.bench_lot_spots [spots]
+"""
+import sys
+import time
+from models import db
+from models.models import ParkingLot, ParkingSpot
+from models.lot_spots import add_spots, remove_free_spots
+from models.occupancy import find_drift
+from .common import make_app
+
+SPOTS = 100_000
+
+
+def new_lot(name, spots):
+    lot = ParkingLot(prime_location_name=name, price=10, address='-', pin_code='000000',
+                     maximum_number_of_spots=spots)
+    db.session.add(lot)
+    db.session.commit()
+    return lot
+
+
+def step(label, fn):
+    start = time.perf_counter()
+    fn()
+    db.session.commit()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed * 1000:9.0f} ms')
+
+
+def orm_create(lot, spots):
+    for _ in range(spots):
+        db.session.add(ParkingSpot(lot_id=lot.id, status='A'))
+
+
+def main():
+    spots = int(sys.argv[1]) if len(sys.argv) > 1 else SPOTS
+    app = make_app()
+    with app.app_context():
+        step(f'orm create {spots}', lambda: orm_create(new_lot('orm', spots), spots))
+
+        lot = new_lot('bulk', spots)
+        step(f'bulk create {spots}', lambda: add_spots(lot, spots))
+        step(f'grow to {spots * 3 // 2}', lambda: add_spots(lot, spots // 2))
+        step(f'shrink to {spots // 2}', lambda: lot.safely_reduce_spots(spots // 2))
+
+        total = ParkingSpot.query.filter_by(lot_id=lot.id).count()
+        drift = [row for row in find_drift() if row[0] == lot.id]
+        print(f'{total} spots left, counter total {lot.get_total_spots_count()}, drift={drift}')
+
+        def delete_lot():
+            remove_free_spots(lot, lot.get_total_spots_count())
+            db.session.delete(lot)
+        step('delete lot', delete_lot)
+
+    return 0 if total == spots // 2 and not drift else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
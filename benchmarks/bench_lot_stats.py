@@ -0,0 +1,36 @@
+"""Lot statistics must cost the same number of queries at any lot count.
+
+Run from the repository root:  python -m benchmarks.bench_lot_stats
+"""
+import sys
+from models import db
+from models.lot_stats import get_lot_stats
+from .common import make_app, seed, QueryCounter, timed
+
+SCALES = [10, 1000, 5000]
+
+
+def main():
+    app = make_app()
+    query_counts = []
+    with app.app_context():
+        seeded = 0
+        for n_lots in SCALES:
+            seed(n_lots - seeded, spots_per_lot=4, tickets_per_lot=2)
+            seeded = n_lots
+
+            with QueryCounter(db.engine) as counter:
+                stats = get_lot_stats()
+            assert len(stats) == n_lots
+            query_counts.append(counter.count)
+            ms = timed(get_lot_stats)
+            print(f'{n_lots:>6} lots: {counter.count} queries, {ms:8.2f} ms')
+
+    if len(set(query_counts)) != 1:
+        print(f'FAIL: query count grew with lot count: {query_counts}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
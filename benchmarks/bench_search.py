@@ -0,0 +1,138 @@
+"""Lot and user search: FTS5 trigram index versus ILIKE '%q%' scans.
+
+Loads lots and users with varied names, builds the search indexes through
+the migration, then times the same searches both ways and checks that
+the index stays consistent after ORM writes. It also checks that a term
+matching more than RANK_WINDOW lots, of which the lowest ids are full,
+still finds the free ones under every find sort. Run from the repository
+root:
+
+    python -m benchmarks.bench_search [lots] [users]
+"""
+import random
+import sys
+import time
+from sqlalchemy import insert, select
+from models import db
+from models.lot_finder import FIND_LIMIT, FIND_SORTS, find_lots
+from models.migrations import upgrade
+from models.models import ParkingLot, ParkingLotCounter, User
+from models.search import RANK_WINDOW, SEARCH_INDEXES, lot_search, user_search
+from .common import make_app, timed
+
+LOTS = 100_000
+USERS = 1_000_000
+CHUNK = 50_000
+WORDS = ['north', 'south', 'east', 'west', 'central', 'river', 'market', 'station',
+         'harbour', 'airport', 'mall', 'park', 'plaza', 'tower', 'garden', 'square',
+         'hill', 'lake', 'bridge', 'gate', 'avenue', 'metro', 'civic', 'city']
+NAMES = ['john', 'jane', 'arjun', 'priya', 'rahul', 'anita', 'li', 'maria', 'omar',
+         'sara', 'ken', 'fatima', 'ivan', 'chen', 'noah', 'emma', 'ravi', 'meera']
+QUERIES = {
+    lot_search: [('prime_location_name', 'harbour'), ('prime_location_name', 'tower gar'),
+                 ('prime_location_name', 'staton'), ('pin_code', '5600'), ('pin_code', '560999')],
+    user_search: [('username', 'priya'), ('username', 'meera_12'), ('username', 'fatma')],
+}
+
+
+def load(n_lots, n_users):
+    rng = random.Random(15)
+    for start in range(0, n_lots, CHUNK):
+        db.session.execute(insert(ParkingLot), [
+            {
+                'prime_location_name': f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}',
+                'price': 40,
+                'address': f'{i} Bench Road',
+                'pin_code': f'{rng.randrange(100000, 999999)}',
+                'maximum_number_of_spots': 0,
+            }
+            for i in range(start, min(start + CHUNK, n_lots))
+        ])
+    for start in range(0, n_users, CHUNK):
+        db.session.execute(insert(User), [
+            {
+                'username': f'{rng.choice(NAMES)}_{rng.choice(NAMES)}{i}',
+                'fullname': 'Bench User',
+                'address': 'Bench Road',
+                'pincode': '500000',
+                'is_admin': False,
+                'password_hash': 'x',
+            }
+            for i in range(start, min(start + CHUNK, n_users))
+        ])
+    db.session.commit()
+
+
+def busy_area_finds():
+    """Result counts of find_lots for a term matching RANK_WINDOW + 500 lots, the first RANK_WINDOW + 200 full."""
+    count, full = RANK_WINDOW + 500, RANK_WINDOW + 200
+    db.session.execute(insert(ParkingLot), [
+        {'prime_location_name': f'Busyarea {i}', 'price': 40, 'address': f'{i} Busy Road',
+         'pin_code': '110001', 'maximum_number_of_spots': 1}
+        for i in range(count)])
+    lot_ids = db.session.scalars(select(ParkingLot.id).where(ParkingLot.prime_location_name.like('Busyarea %'))
+                                 .order_by(ParkingLot.id))
+    db.session.execute(insert(ParkingLotCounter), [
+        {'lot_id': lot_id, 'occupied_count': int(i < full), 'available_count': int(i >= full)}
+        for i, lot_id in enumerate(lot_ids)])
+    db.session.commit()
+    return {sort: len(find_lots('Busyarea', 'location', sort)) for sort in FIND_SORTS}
+
+
+def ilike(index, column, text):
+    model_column = getattr(index.model, column)
+    return (index.model.query
+            .filter(model_column.ilike(f'%{text}%'))
+            .order_by(index.model.id)
+            .limit(50)
+            .all())
+
+
+def main():
+    n_lots = int(sys.argv[1]) if len(sys.argv) > 1 else LOTS
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else USERS
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        load(n_lots, n_users)
+        print(f'loaded {n_lots} lots and {n_users} users in {time.perf_counter() - start:.1f} s')
+        start = time.perf_counter()
+        upgrade()
+        print(f'migrations incl. index build: {time.perf_counter() - start:.1f} s')
+
+        for index, queries in QUERIES.items():
+            for column, text in queries:
+                results = index.search(text, columns=(column,))
+                found = len(results)
+                top = getattr(results[0], column) if results else None
+                scanned = len(ilike(index, column, text))
+                fts_ms = timed(lambda: index.search(text, columns=(column,)))
+                ilike_ms = timed(lambda: ilike(index, column, text))
+                print(f'{index.name:<12} {text!r:<12} fts {fts_ms:8.2f} ms ({found:2} hits)'
+                      f'   ilike {ilike_ms:8.2f} ms ({scanned:2} hits)   top: {top}')
+
+        busy = busy_area_finds()
+        print(f'busy area finds: {busy}')
+
+        start = time.perf_counter()
+        for i in range(1000):
+            db.session.add(User(username=f'late_user_{i}', fullname='Late', address='-',
+                                pincode='0', password_hash='x'))
+        db.session.commit()
+        print(f'1000 user inserts with index triggers: {(time.perf_counter() - start) * 1000:.0f} ms')
+        user = User.query.filter_by(username='late_user_7').one()
+        user.username = 'renamed_late_user'
+        db.session.commit()
+        renamed = [u.username for u in user_search.search('renamed_late')]
+
+        connection = db.session.connection()
+        for index in SEARCH_INDEXES:
+            connection.exec_driver_sql(
+                f"INSERT INTO {index.name}({index.name}) VALUES ('integrity-check')")
+        print(f'index integrity ok, rename found: {renamed}')
+
+    return 0 if renamed == ['renamed_late_user'] and set(busy.values()) == {FIND_LIMIT} else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
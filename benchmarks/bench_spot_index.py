@@ -0,0 +1,46 @@
+"""Spot allocation latency: free-spot index vs. a database-only pick.
+
+Allocates a batch of spots from one large lot inside a transaction and
+reports the mean cost per allocation. Run from the repository root:
+
+    python -m benchmarks.bench_spot_index
+"""
+import sys
+import time
+from models import db
+from models.models import ParkingSpot
+from models.parking import allocate_spot, _allocate_from_db
+from models.spot_index import free_spots
+from .common import make_app, seed
+
+SPOTS_PER_LOT = 20000
+ALLOCATIONS = 2000
+
+
+def measure(allocate, lot_id):
+    start = time.perf_counter()
+    for _ in range(ALLOCATIONS):
+        assert allocate(lot_id) is not None
+    elapsed = time.perf_counter() - start
+    db.session.rollback()
+    free_spots.invalidate()
+    return elapsed / ALLOCATIONS * 1e6
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        lot_id, = seed(1, spots_per_lot=SPOTS_PER_LOT)
+
+        db_us = measure(_allocate_from_db, lot_id)
+        index_us = measure(allocate_spot, lot_id)
+        assert ParkingSpot.query.filter_by(status='O').count() == 0
+
+    print(f'{SPOTS_PER_LOT} spots, {ALLOCATIONS} allocations')
+    print(f'  database pick : {db_us:8.1f} us/allocation')
+    print(f'  free-spot index: {index_us:8.1f} us/allocation (includes cold load)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""App startup must stay within a time budget and must not import matplotlib.
+
+Boots the app as a production worker does, by calling ``create_app``
+with the production config (pointed at a throwaway database), in a fresh
+interpreter under ``python -X importtime``. Reports the time spent
+importing and the time spent inside ``create_app``, and the slowest
+imports below ``app``. Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+STARTUP_BUDGET_MS = 1000
+RUNS = 3
+FIRST_PARTY = {'app', 'config', 'models', 'controllers'}
+
+CHILD = '''
+import sys, time
+start = time.perf_counter()
+from app import create_app
+from config import ProductionConfig
+imported = time.perf_counter()
+config = type('StartupConfig', (ProductionConfig,), {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + sys.argv[1], 'SECRET_KEY': 'startup'})
+app = create_app(config)
+end = time.perf_counter()
+print((imported - start) * 1000, (end - imported) * 1000)
+print(int('matplotlib' in sys.modules))
+'''
+
+
+def slowest_imports(stderr):
+    """(microseconds, name) of each import, with this repository's modules broken down.
+
+    Third-party imports are reported whole. A module of this repository is
+    replaced by the imports it triggers plus its own time, so the table
+    shows what ``app`` actually pulls in.
+    """
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Children are printed before their parent, one level deeper.
+        node = (int(own), int(cumulative), name.strip(), pending.pop(depth + 1, []))
+        pending.setdefault(depth, []).append(node)
+
+    imports = []
+
+    def walk(node, path):
+        own, cumulative, name, children = node
+        label = f'{path} > {name}' if path else name
+        if name.split('.')[0] in FIRST_PARTY and children:
+            imports.append((own, f'{label} (own code)'))
+            for child in children:
+                walk(child, label)
+        else:
+            imports.append((cumulative, label))
+    for node in pending.get(0, []):
+        walk(node, '')
+    return sorted(imports, reverse=True)
+
+
+def boot():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, db_path],
+                                cwd=root, capture_output=True, text=True, check=True)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    import_ms, create_ms, matplotlib_loaded = result.stdout.split()
+    return float(import_ms), float(create_ms), matplotlib_loaded == '1', slowest_imports(result.stderr)
+
+
+def main():
+    runs = [boot() for _ in range(RUNS)]
+    import_ms, create_ms, _, imports = min(runs, key=lambda run: run[0] + run[1])
+    best_ms = import_ms + create_ms
+    matplotlib_loaded = any(run[2] for run in runs)
+
+    print(f'startup: {best_ms:.1f} ms (imports {import_ms:.1f} ms, create_app {create_ms:.1f} ms; '
+          f'best of {RUNS}, budget {STARTUP_BUDGET_MS} ms)')
+    print('slowest imports:')
+    for cumulative, name in imports[:10]:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+    if matplotlib_loaded:
+        print('FAIL: matplotlib was imported during startup')
+        return 1
+    if best_ms > STARTUP_BUDGET_MS:
+        print('FAIL: startup exceeded its budget')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Ticket history pages must load spot and lot without per-row queries.
+
+Walks a heavy user's history page by page, touching each ticket's lot the
+way the dashboard template does, and fails if any page needs more than
+one statement. Run from the repository root:
+
+    python -m benchmarks.bench_ticket_pages
+"""
+import sys
+from models import db
+from models.tickets import user_tickets_page
+from .common import make_app, seed, QueryCounter, timed
+
+TICKETS = 5000
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        seed(5, spots_per_lot=20, tickets_per_lot=TICKETS // 5, n_users=1)
+        user_id = 1
+        db.session.expire_all()
+
+        pages, worst, cursor = 0, 0, None
+        while True:
+            with QueryCounter(db.engine) as counter:
+                tickets, cursor = user_tickets_page(user_id, cursor)
+                names = [ticket.spot.lot.prime_location_name for ticket in tickets]
+            assert len(names) == len(tickets)
+            pages += 1
+            worst = max(worst, counter.count)
+            db.session.expire_all()
+            if cursor is None:
+                break
+
+        first_ms = timed(lambda: user_tickets_page(user_id))
+        print(f'{TICKETS} tickets in {pages} pages, at most {worst} statement(s) per page, '
+              f'first page {first_ms:.2f} ms')
+    return 0 if worst == 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Per-request cost of loading the logged-in user.
+
+Serves one login_required page that reads current_user.username and
+is_admin, the way every page does, under a multi-threaded load of
+logged-in clients. It compares loading the full User row per request
+with the cached slim principal. Run from the repository root:
+
+    python -m benchmarks.bench_user_loader
+"""
+import statistics
+import sys
+import threading
+import time
+from flask_login import LoginManager, current_user, login_required, login_user
+from models import db
+from models.models import User
+from models.principals import load_principal, principal_cache
+from .common import QueryCounter, make_app, seed
+
+THREADS = 8
+REQUESTS_PER_THREAD = 500
+USERS = 1000
+
+
+def build_app(loader):
+    app = make_app(engine_options={'connect_args': {'check_same_thread': False}})
+    app.config['SECRET_KEY'] = 'bench'
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(loader)
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        login_user(db.session.get(User, user_id))
+        return 'ok'
+
+    @app.route('/whoami')
+    @login_required
+    def whoami():
+        return f'{current_user.username} {current_user.is_admin}'
+
+    with app.app_context():
+        seed(1, spots_per_lot=1, n_users=USERS)
+    return app
+
+
+def run(app):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = app.test_client()
+        client.get(f'/login/{index % USERS + 1}')
+        mine = []
+        for _ in range(REQUESTS_PER_THREAD):
+            start = time.perf_counter()
+            response = client.get('/whoami')
+            mine.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        with lock:
+            latencies.extend(mine)
+
+    with app.app_context():
+        with QueryCounter(db.engine) as queries:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    latencies.sort()
+    return (statistics.median(latencies), latencies[int(len(latencies) * 0.99)],
+            queries.count / len(latencies))
+
+
+def main():
+    loaders = {
+        'full User row': lambda user_id: User.query.get(int(user_id)),
+        'cached principal': load_principal,
+    }
+    for name, loader in loaders.items():
+        principal_cache.clear()
+        p50, p99, queries = run(build_app(loader))
+        print(f'{name:<18} p50 {p50:6.3f} ms   p99 {p99:6.3f} ms   {queries:.2f} queries/request')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
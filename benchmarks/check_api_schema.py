@@ -0,0 +1,228 @@
+"""Every /api route must answer as api_definition.yaml describes.
+
+Boots the app on a copy of the bundled database and calls each /api
+route as a user, as an admin and anonymously, covering success, error
+and 304 responses. Every route must be in the spec with its method, every
+status returned must be listed for that operation, and JSON bodies must
+match the response schema. Only the parts of OpenAPI 3.0 schemas the
+spec uses are checked ($ref, allOf, oneOf, type, nullable, enum,
+properties, required, items, additionalProperties, maxItems). Run from
+the repository root:
+
+    python -m benchmarks.check_api_schema
+"""
+import json
+import os
+import re
+import sys
+import yaml
+from app import create_app
+from models import db
+from models.jobs import enqueue
+from models.models import User
+from .load_test import ROOT, USERS, bench_config, prepare
+
+SPEC_PATH = os.path.join(ROOT, 'api_definition.yaml')
+ADMIN = ('admin', 'admin123')
+TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool,
+}
+
+
+class Validator:
+    """Checks values against the schemas of one OpenAPI document."""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    def ref(self, ref):
+        node = self.spec
+        for part in ref.lstrip('#/').split('/'):
+            node = node[part]
+        return node
+
+    def errors(self, schema, value, path='$'):
+        if '$ref' in schema:
+            return self.errors(self.ref(schema['$ref']), value, path)
+        if value is None:
+            return [] if schema.get('nullable') else [f'{path}: null is not allowed']
+        if 'allOf' in schema:
+            return [error for part in schema['allOf'] for error in self.errors(part, value, path)]
+        if 'oneOf' in schema:
+            matches = [part for part in schema['oneOf'] if not self.errors(part, value, path)]
+            return [] if len(matches) == 1 else [f'{path}: matches {len(matches)} of oneOf']
+        expected = schema.get('type')
+        if expected is not None:
+            python_type = TYPES[expected]
+            if not isinstance(value, python_type) or (isinstance(value, bool) and expected != 'boolean'):
+                return [f'{path}: expected {expected}, got {type(value).__name__}']
+        if 'enum' in schema and value not in schema['enum']:
+            return [f'{path}: {value!r} is not one of {schema["enum"]}']
+        errors = []
+        if isinstance(value, dict):
+            properties = schema.get('properties', {})
+            errors += [f'{path}: missing {name}' for name in schema.get('required', []) if name not in value]
+            extra = schema.get('additionalProperties', True)
+            for name, item in value.items():
+                if name in properties:
+                    errors += self.errors(properties[name], item, f'{path}.{name}')
+                elif isinstance(extra, dict):
+                    errors += self.errors(extra, item, f'{path}.{name}')
+        if isinstance(value, list):
+            if len(value) > schema.get('maxItems', len(value)):
+                errors.append(f'{path}: more than {schema["maxItems"]} items')
+            for i, item in enumerate(value):
+                errors += self.errors(schema.get('items', {}), item, f'{path}[{i}]')
+        return errors
+
+    def operation(self, rule, method):
+        path = re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', rule)
+        return self.spec['paths'].get(path, {}).get(method.lower())
+
+    def response_errors(self, rule, method, response):
+        operation = self.operation(rule, method)
+        if operation is None:
+            return [f'{method} {rule} is not in the spec']
+        documented = operation['responses'].get(str(response.status_code))
+        if documented is None:
+            return [f'status {response.status_code} is not documented']
+        documented = self.ref(documented['$ref']) if '$ref' in documented else documented
+        content = documented.get('content', {})
+        if response.mimetype not in content:
+            if content or response.data:
+                return [f'{response.mimetype} is not a documented content type']
+            return []
+        if response.mimetype != 'application/json':
+            return []
+        return self.errors(content[response.mimetype]['schema'], response.get_json())
+
+
+def login(app, username, password):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def first_event(response):
+    """Event name and data of the first event on an event stream, then close it."""
+    chunk = next(iter(response.response)).decode()
+    response.close()
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines() if ': ' in line)
+    return fields.get('event'), json.loads(fields.get('data', 'null'))
+
+
+def main():
+    with open(SPEC_PATH) as f:
+        validator = Validator(yaml.safe_load(f))
+    db_path, lot_id = prepare('ProductionConfig')
+    app = create_app(bench_config('ProductionConfig', db_path))
+    failures = []
+    covered = set()
+    try:
+        anonymous = app.test_client()
+        user = login(app, *USERS[0])
+        admin = login(app, *ADMIN)
+
+        def call(client, method, url, expected, **kwargs):
+            response = client.open(url, method=method, **kwargs)
+            rule = app.url_map.bind('localhost').match(url.split('?')[0], method=method, return_rule=True)[0].rule
+            covered.add((rule, method))
+            errors = validator.response_errors(rule, method, response)
+            if response.status_code != expected:
+                errors.insert(0, f'expected {expected}, got {response.status_code}')
+            label = f'{method} {url} -> {response.status_code}'
+            print(f"{'ok  ' if not errors else 'FAIL'} {label}" + (f": {'; '.join(errors[:5])}" if errors else ''))
+            if errors:
+                failures.append(label)
+            return response
+
+        call(anonymous, 'GET', '/api/lots', 401)
+        lots = call(user, 'GET', '/api/lots', 200)
+        call(user, 'GET', '/api/lots', 304, headers={'If-None-Match': lots.headers['ETag']})
+        call(user, 'GET', f'/api/lots/{lot_id}/availability', 200)
+        call(user, 'GET', '/api/lots/999999/availability', 404)
+
+        call(user, 'POST', '/api/park', 400, json={})
+        call(user, 'POST', '/api/park', 404, json={'lot_id': 999999, 'vehicle_number': 'SPEC01'})
+        call(admin, 'POST', '/api/park', 403, json={'lot_id': lot_id, 'vehicle_number': 'SPEC01'})
+        ticket_id = call(user, 'POST', '/api/park', 201,
+                         json={'lot_id': lot_id, 'vehicle_number': 'SPEC01'}).get_json()['id']
+        call(user, 'GET', f'/api/tickets/{ticket_id}', 200)
+        call(user, 'GET', '/api/tickets/999999', 404)
+        call(user, 'GET', '/api/tickets', 200)
+        call(user, 'POST', f'/api/tickets/{ticket_id}/release', 200)
+        call(user, 'POST', f'/api/tickets/{ticket_id}/release', 409)
+        call(user, 'GET', '/api/summary', 200)
+
+        stream = user.get('/api/lots/availability/stream', buffered=False)
+        covered.add(('/api/lots/availability/stream', 'GET'))
+        errors = validator.response_errors('/api/lots/availability/stream', 'GET', stream)
+        event, data = first_event(stream)
+        if event != 'snapshot':
+            errors.append(f'first event is {event}, not snapshot')
+        errors += validator.errors({'type': 'object', 'required': ['lots'], 'properties': {'lots': {
+            'type': 'array', 'items': {'$ref': '#/components/schemas/LotCounts'}}}}, data)
+        print(f"{'ok  ' if not errors else 'FAIL'} GET /api/lots/availability/stream -> {stream.status_code}"
+              + (f": {'; '.join(errors[:5])}" if errors else ''))
+        if errors:
+            failures.append('availability stream')
+
+        call(user, 'GET', f'/api/lots/{lot_id}/spots', 403)
+        call(admin, 'GET', f'/api/lots/{lot_id}/spots?limit=10', 200)
+        call(admin, 'GET', f'/api/lots/{lot_id}/spots?status=X', 400)
+        call(admin, 'GET', '/api/lots/999999/spots', 404)
+        call(admin, 'GET', '/api/summary', 200)
+        call(admin, 'GET', '/api/cache/stats', 200)
+        call(admin, 'POST', '/api/batch', 400, json={'operations': []})
+        with app.app_context():
+            user_id = User.query.filter_by(username=USERS[0][0]).one().id
+            job = enqueue('rebuild_summaries')
+            db.session.commit()
+            job_id = job.id
+        batch = call(admin, 'POST', '/api/batch', 200, json={'operations': [
+            {'op': 'park', 'lot_id': lot_id, 'user_id': user_id, 'vehicle_number': 'SPEC02'},
+            {'op': 'release', 'ticket_id': 999999},
+            {'op': 'bogus'},
+        ]})
+        batch_ticket = batch.get_json()['results'][0]['ticket_id']
+        call(admin, 'POST', '/api/batch', 200, json={'operations': [{'op': 'release', 'ticket_id': batch_ticket}]})
+        # Ids that are booleans or too large for SQLite are invalid operations, not server errors.
+        invalid = call(admin, 'POST', '/api/batch', 200, json={'operations': [
+            {'op': 'park', 'lot_id': lot_id, 'user_id': 2 ** 64, 'vehicle_number': 'SPEC03'},
+            {'op': 'park', 'lot_id': True, 'user_id': True, 'vehicle_number': 'SPEC04'},
+            {'op': 'release', 'ticket_id': 2 ** 70},
+        ]})
+        if any(result['ok'] for result in invalid.get_json()['results']):
+            print('FAIL an invalid batch operation was applied')
+            failures.append('invalid batch ids')
+        call(user, 'POST', '/api/park', 400, json={'lot_id': True, 'vehicle_number': 'SPEC05'})
+        call(user, 'POST', '/api/park', 400, json={'lot_id': 2 ** 70, 'vehicle_number': 'SPEC05'})
+        call(admin, 'GET', '/api/jobs', 200)
+        call(admin, 'GET', f'/api/jobs/{job_id}', 200)
+        call(admin, 'GET', '/api/jobs/999999', 404)
+        call(user, 'GET', '/api/jobs', 403)
+
+        for rule in app.url_map.iter_rules():
+            if not rule.rule.startswith('/api/'):
+                continue
+            for method in rule.methods - {'HEAD', 'OPTIONS'}:
+                if validator.operation(rule.rule, method) is None:
+                    print(f'FAIL {method} {rule.rule} is not in the spec')
+                    failures.append(rule.rule)
+                elif (rule.rule, method) not in covered:
+                    print(f'FAIL {method} {rule.rule} is not checked')
+                    failures.append(rule.rule)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Occupancy counters must match the ParkingSpot rows after every operation.
+
+Boots the app on a fresh database with the demo data and drives each
+operation that moves spots or tickets through its real route: creating a
+lot, parking and releasing (HTML, JSON and batch API), reducing and
+growing a lot, deleting a spot and deleting a lot. Lots larger than
+JOB_INLINE_ROWS go through the background job path, whose jobs are run
+in-process. After each step ``occupancy.find_drift()`` must be empty.
+It also checks that a lot closed for deletion takes no parks, that a lot
+with active tickets is not deleted, that a deletion that fails part way
+leaves the lot open, and that two resizes of one lot are not claimed at
+the same time.
+Run from the repository root:
+
+    python -m benchmarks.check_counters
+"""
+import os
+import sys
+import tempfile
+from app import create_app
+from controllers import admin_controllers
+from models import admin_jobs, db, populate
+from models.jobs import claim_next, enqueue, run_job
+from models.models import ParkingLot, ParkingSpot, Ticket
+from models.occupancy import find_drift
+from .load_test import USERS, bench_config
+
+ADMIN = ('admin', 'admin123')
+# Lots above this many spots are created, resized and deleted by jobs.
+INLINE_ROWS = 20
+
+
+def login(app, username, password):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def lot_form(name, spots, price=40):
+    return {'prime_location_name': name, 'price': price, 'address': '1 Check Road',
+            'pin_code': '500001', 'maximum_number_of_spots': spots}
+
+
+def run_jobs_and_find_drift():
+    while (job_id := claim_next()) is not None:
+        run_job(job_id)
+    return find_drift()
+
+
+def main():
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    config = type('CheckConfig', (bench_config('LocalDevelopmentConfig', db_path),),
+                  {'JOB_INLINE_ROWS': INLINE_ROWS})
+    app = create_app(config)
+    failures = []
+    try:
+        with app.app_context():
+            populate.populate_db()
+        admin = login(app, *ADMIN)
+        user = login(app, *USERS[0])
+
+        def query(fn):
+            with app.app_context():
+                return fn()
+
+        def lot_id(name):
+            return query(lambda: ParkingLot.query.filter_by(prime_location_name=name).one().id)
+
+        def active_tickets(lot):
+            return query(lambda: [ticket.id for ticket in Ticket.query.join(ParkingSpot).filter(
+                ParkingSpot.lot_id == lot, Ticket.active == True)])
+
+        def step(label, fn):
+            fn()
+            drift = query(run_jobs_and_find_drift)
+            print(f"{'ok  ' if not drift else 'FAIL'} {label}" + (f': {drift}' if drift else ''))
+            if drift:
+                failures.append(label)
+
+        step('create lot', lambda: admin.post('/admin/add_parking_lot', data=lot_form('Check Small', 10)))
+        step('create lot (job)', lambda: admin.post('/admin/add_parking_lot', data=lot_form('Check Large', 50)))
+        small, large = lot_id('Check Small'), lot_id('Check Large')
+
+        step('park (form)', lambda: [user.post('/user/park', data={'lot_id': small, 'vehicle_number': f'CK{i}'})
+                                     for i in range(3)])
+        step('park (API)', lambda: [user.post('/api/park', json={'lot_id': large, 'vehicle_number': f'CA{i}'})
+                                    for i in range(3)])
+        step('release (form)', lambda: user.post(f'/user/release_parking/{active_tickets(small)[0]}'))
+        step('release (API)', lambda: user.post(f'/api/tickets/{active_tickets(large)[0]}/release'))
+        user_id = query(lambda: db.session.get(Ticket, active_tickets(small)[0]).user_id)
+        step('batch', lambda: admin.post('/api/batch', json={'operations': [
+            {'op': 'release', 'ticket_id': active_tickets(small)[0]},
+            {'op': 'release', 'ticket_id': active_tickets(large)[0]},
+            {'op': 'park', 'lot_id': small, 'user_id': user_id, 'vehicle_number': 'CB1'},
+            {'op': 'park', 'lot_id': large, 'user_id': user_id, 'vehicle_number': 'CB2'},
+            {'op': 'park', 'lot_id': large, 'user_id': user_id, 'vehicle_number': 'CB3'},
+        ]}))
+        if len(active_tickets(small)) != 2 or len(active_tickets(large)) != 3:
+            print('FAIL parks and releases did not all go through')
+            failures.append('ticket counts')
+
+        def set_status(lot, status):
+            def update():
+                db.session.get(ParkingLot, lot).status = status
+                db.session.commit()
+            query(update)
+
+        set_status(small, 'closed')
+        step('park in closed lot', lambda: [user.post('/user/park', data={'lot_id': small, 'vehicle_number': 'CC1'}),
+                                            user.post('/api/park', json={'lot_id': small, 'vehicle_number': 'CC2'})])
+        set_status(small, 'open')
+        if len(active_tickets(small)) != 2:
+            print('FAIL a closed lot took a park')
+            failures.append('closed lot')
+        step('delete lot with tickets', lambda: admin.post(f'/admin/delete_parking_lot/{small}'))
+        if query(lambda: db.session.get(ParkingLot, small).status) != 'open':
+            print('FAIL a lot with active tickets was left closed')
+            failures.append('refused delete')
+
+        def failing_remove(lot, count):
+            raise RuntimeError('injected failure')
+
+        for label, module in [('failed delete', admin_controllers), ('failed delete (job)', admin_jobs)]:
+            for ticket_id in active_tickets(small) + active_tickets(large):
+                user.post(f'/api/tickets/{ticket_id}/release')
+            remove = module.remove_free_spots
+            module.remove_free_spots = failing_remove
+            try:
+                lot = small if module is admin_controllers else large
+                step(label, lambda: admin.post(f'/admin/delete_parking_lot/{lot}'))
+            finally:
+                module.remove_free_spots = remove
+            if query(lambda: db.session.get(ParkingLot, lot).status) != 'open':
+                print(f'FAIL {label} left the lot closed')
+                failures.append(label)
+        step('park after failed deletes', lambda: [
+            user.post('/api/park', json={'lot_id': lot, 'vehicle_number': f'CF{lot}'}) for lot in (small, large)])
+
+        def claim_two_resizes():
+            enqueue('resize_lot', lot_id=large)
+            enqueue('resize_lot', lot_id=large)
+            db.session.commit()
+            return [claim_next(), claim_next()]
+        claimed = query(claim_two_resizes)
+        if claimed[0] is None or claimed[1] is not None:
+            print(f'FAIL two resizes of one lot were claimed together: {claimed}')
+            failures.append('resize claims')
+        query(lambda: run_job(claimed[0]))
+
+        step('reduce lot', lambda: admin.post(f'/admin/edit_parking_lot/{small}', data=lot_form('Check Small', 6)))
+        step('grow lot', lambda: admin.post(f'/admin/edit_parking_lot/{small}', data=lot_form('Check Small', 12)))
+        step('reduce lot (job)', lambda: admin.post(f'/admin/edit_parking_lot/{large}', data=lot_form('Check Large', 20)))
+        step('grow lot (job)', lambda: admin.post(f'/admin/edit_parking_lot/{large}', data=lot_form('Check Large', 45)))
+        free_spot = query(lambda: ParkingSpot.query.filter_by(lot_id=small, status='A').first().id)
+        step('delete spot', lambda: admin.post(f'/admin/delete_parking_spot/{small}/{free_spot}'))
+        spots = query(lambda: {lot: ParkingSpot.query.filter_by(lot_id=lot).count() for lot in (small, large)})
+        if spots != {small: 11, large: 45}:
+            print(f'FAIL lots were not resized: {spots}')
+            failures.append('spot counts')
+
+        for lot in (small, large):
+            for ticket_id in active_tickets(lot):
+                user.post(f'/api/tickets/{ticket_id}/release')
+        step('delete lot', lambda: admin.post(f'/admin/delete_parking_lot/{small}'))
+        step('delete lot (job)', lambda: admin.post(f'/admin/delete_parking_lot/{large}'))
+        if query(lambda: ParkingLot.query.filter(ParkingLot.id.in_([small, large])).count()):
+            print('FAIL lots still exist after deletion')
+            failures.append('deleted lots')
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
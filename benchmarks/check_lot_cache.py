@@ -0,0 +1,128 @@
+"""Lot details cache: behaviour on both backends, and lookup cost.
+
+Runs the same checks against the in-process backend and the Redis backend
+over an in-memory fake client (no Redis server needed): read-through,
+invalidation on commit but not on rollback, a read racing an edit not
+being stored, and TTL expiry; and that parking bills the database price
+while the cache still holds the old one. Then times
+cached lookups against loading the lot from the database. Run from the
+repository root:
+
+    python -m benchmarks.check_lot_cache
+"""
+import sys
+import time
+from sqlalchemy import update
+from models import db
+from models.cache import LocalBackend, RedisBackend
+from models.lot_cache import LotCache, lot_cache
+from models.models import ParkingLot, User
+from models.parking import park_in_lot
+from .common import make_app, seed, timed
+
+LOOKUPS = 10_000
+
+
+class FakeRedis:
+    """The slice of the redis-py client used by RedisBackend, kept in a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        value, expires = self.data.get(name, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.data[name]
+            return None
+        return value
+
+    def set(self, name, value, ex=None):
+        self.data[name] = (value.encode(), time.monotonic() + ex if ex else None)
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+
+def check(name, cache, lot_id):
+    failures = []
+
+    def expect(label, condition):
+        if not condition:
+            failures.append(label)
+
+    first = cache.get(lot_id)
+    expect('first read misses', cache.misses == 1 and first is not None)
+    expect('second read hits', cache.get(lot_id) == first and cache.hits == 1)
+    expect('unknown lot is None', cache.get(10 ** 9) is None)
+    expect('all lots', [lot.id for lot in cache.all()][:1] == [lot_id])
+
+    lot = db.session.get(ParkingLot, lot_id)
+    lot.price = 99
+    cache.invalidate(lot_id)
+    db.session.rollback()
+    expect('rollback keeps entry', cache.get(lot_id) == first)
+
+    lot.price = 99
+    cache.invalidate(lot_id)
+    db.session.commit()
+    expect('commit drops entry', cache.get(lot_id).price == 99)
+    expect('commit drops all-lots list', cache.all()[0].price == 99)
+
+    def racing_load():
+        # An edit commits while this reader is still loading the old row.
+        cache.invalidate(lot_id)
+        db.session.commit()
+        return before
+    before = cache.backend.get(f'lot:{lot_id}')
+    cache.backend.delete(f'lot:{lot_id}')
+    cache._read(f'lot:{lot_id}', racing_load)
+    expect('stale read racing an edit is not stored', cache.backend.get(f'lot:{lot_id}') is None)
+
+    cache.ttl = 0.05
+    cache.backend.delete(f'lot:{lot_id}')
+    cache.get(lot_id)
+    time.sleep(0.1)
+    misses = cache.misses
+    cache.get(lot_id)
+    expect('entry expires after ttl', cache.misses == misses + 1)
+
+    print(f"{'ok  ' if not failures else 'FAIL'} {name}: {cache.stats()}"
+          + (f" failed: {', '.join(failures)}" if failures else ''))
+    return not failures
+
+
+def check_billing(lot_id):
+    """A ticket is billed at the lot's price in the database, even while the cache lags."""
+    cache = lot_cache
+    cache.get(lot_id)
+    db.session.execute(update(ParkingLot).where(ParkingLot.id == lot_id).values(price=123))
+    db.session.commit()
+    ticket = park_in_lot(db.session.query(User.id).scalar(), lot_id, 'CACHE1')
+    db.session.commit()
+    ok = cache.get(lot_id).price != 123 and ticket.parking_cost_per_unit_time == 123
+    print(f"{'ok  ' if ok else 'FAIL'} billing uses the database price while the cache is stale")
+    return ok
+
+
+def main():
+    app = make_app()
+    ok = True
+    with app.app_context():
+        lot_ids = seed(100, spots_per_lot=1)
+        for name, backend in [('local', LocalBackend()), ('redis (fake)', RedisBackend(FakeRedis()))]:
+            ok = check(name, LotCache(backend), lot_ids[0]) and ok
+        ok = check_billing(lot_ids[1]) and ok
+
+        for name, backend in [('local', LocalBackend()), ('redis (fake)', RedisBackend(FakeRedis()))]:
+            cache = LotCache(backend)
+            ms = timed(lambda: [cache.get(lot_ids[i % 100]) for i in range(LOOKUPS)])
+            print(f'{name:<14} {ms * 1000 / LOOKUPS:6.2f} us per cached lookup')
+        ms = timed(lambda: [db.session.get(ParkingLot, lot_ids[i % 100], populate_existing=True)
+                            for i in range(LOOKUPS)])
+        print(f"{'database':<14} {ms * 1000 / LOOKUPS:6.2f} us per lookup")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
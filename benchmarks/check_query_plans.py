@@ -0,0 +1,62 @@
+"""Every hot-path query must be answered from an index, not a table scan.
+
+Runs EXPLAIN QUERY PLAN on each statement against an upgraded SQLite
+schema. Run from the repository root:
+
+    python -m benchmarks.check_query_plans
+"""
+import sys
+from models import db
+from models.migrations import upgrade
+from models.models import ParkingLot, ParkingSpot, User, Ticket
+from models.parking import _claim_spot_stmt
+from models.spot_grid import lot_spots_query
+from .common import make_app, seed
+
+
+def hot_queries():
+    dialect = db.engine.dialect
+    return {
+        'allocate spot': _claim_spot_stmt(1, dialect),
+        'ticket history': (Ticket.query
+                           .filter_by(user_id=1)
+                           .order_by(Ticket.parking_timestamp.desc())
+                           .statement),
+        'active ticket for spot': (Ticket.query
+                                   .filter(Ticket.spot_id == 1, Ticket.active == True)
+                                   .statement),
+        'active tickets in lot': (Ticket.query
+                                  .join(ParkingSpot)
+                                  .filter(ParkingSpot.lot_id == 1, Ticket.active == True)
+                                  .statement),
+        'spot grid page': lot_spots_query(1, after=10, status='O').limit(500).statement,
+        'login': User.query.filter_by(username='john_doe').statement,
+        'lot by name': ParkingLot.query.filter_by(prime_location_name='x').statement,
+    }
+
+
+def explain(statement):
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+    return [row[-1] for row in rows]
+
+
+def main():
+    app = make_app()
+    failed = False
+    with app.app_context():
+        upgrade()
+        seed(10, spots_per_lot=50, tickets_per_lot=20)
+        db.session.execute(db.text('ANALYZE'))
+        for name, statement in hot_queries().items():
+            plan = explain(statement)
+            scans = [step for step in plan
+                     if step.startswith('SCAN') and 'INDEX' not in step]
+            failed = failed or bool(scans)
+            print(f"{'FAIL' if scans else 'ok  '} {name}: {'; '.join(plan)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import time
+from flask import Flask
+from sqlalchemy import event
+from models import db
+from models.populate import generate_synthetic_data
+
+
+def make_app(db_path=None, engine_options=None):
+    """Bare Flask app bound to a throwaway SQLite database."""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options or {}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+class QueryCounter:
+    """Counts SQL statements sent through the engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def timed(fn, repeat=5):
+    """Best wall-clock time of ``repeat`` calls, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def seed(n_lots, spots_per_lot, tickets_per_lot=0, n_users=1):
+    """Bulk-load lots, spots, users and closed tickets. Needs an app context."""
+    return generate_synthetic_data(n_lots, spots_per_lot, n_users, tickets_per_lot, password=None)
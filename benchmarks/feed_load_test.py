@@ -0,0 +1,178 @@
+"""Fan-out of the live availability feed to many concurrent subscribers.
+
+Serves the production config from a threaded HTTP server in a separate
+process and connects subscribers to /api/lots/availability/stream in
+steps (LEVELS). At each step a driver parks and releases CHANGES times in
+the load test lot through the JSON API, and every subscriber records when
+each change reaches it. Reports the delay from the park or release
+request to delivery (p50/p99 over all subscribers) and the SQL statements
+the server ran per change, which should not grow with the subscribers.
+Run from the repository root:
+
+    python -m benchmarks.feed_load_test
+    python -m benchmarks.feed_load_test --subscribers 100 --subscribers 2000
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from .load_test import ROOT, USERS, bench_config, prepare
+
+LEVELS = [1, 100, 500, 1000]
+CHANGES = 40
+# Pause between changes, so each one is delivered before the next.
+CHANGE_INTERVAL = 0.05
+HOST = '127.0.0.1'
+METRICS_TOKEN = 'feed-load-test'
+
+
+def serve(db_path, port):
+    """Serve the app on ``port`` with a thread per connection (run in its own process)."""
+    from werkzeug.serving import make_server
+    from app import create_app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    config = type('FeedConfig', (bench_config('ProductionConfig', db_path),), {'METRICS_TOKEN': METRICS_TOKEN})
+    app = create_app(config)
+    server = make_server(HOST, port, app, threaded=True)
+    server.socket.listen(4096)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+def request(port, method, path, cookie=None, body=None, form=False, headers=None):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    headers = dict(headers or {})
+    if cookie:
+        headers['Cookie'] = cookie
+    if body is not None:
+        headers['Content-Type'] = 'application/x-www-form-urlencoded' if form else 'application/json'
+        body = body if form else json.dumps(body)
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def login(port, username, password):
+    response, _ = request(port, 'POST', '/login', body=f'username={username}&password={password}',
+                          form=True)
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def sql_statements(port):
+    _, body = request(port, 'GET', '/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'})
+    match = re.search(rb'^sql_statement_duration_seconds_count (\d+)', body, re.M)
+    return int(match.group(1))
+
+
+class Subscriber(threading.Thread):
+    """Holds one event stream open and records when each availability event arrives."""
+
+    def __init__(self, port, cookie, lot_id, connected):
+        super().__init__(daemon=True)
+        self.port = port
+        self.cookie = cookie
+        self.lot_id = lot_id
+        self.connected = connected
+        self.received = []
+
+    def run(self):
+        sock = socket.create_connection((HOST, self.port))
+        sock.sendall(f'GET /api/lots/availability/stream?lot_id={self.lot_id} HTTP/1.1\r\n'
+                     f'Host: {HOST}\r\nCookie: {self.cookie}\r\n'
+                     'Accept: text/event-stream\r\n\r\n'.encode())
+        stream = sock.makefile('rb')
+        for line in stream:
+            if line.startswith(b'event: snapshot'):
+                self.connected.release()
+            elif line.startswith(b'event: availability'):
+                self.received.append(time.time())
+
+
+def measure(port, cookie, lot_id, subscribers):
+    """Make CHANGES park/release requests; delivery delays (ms) and SQL statements per change."""
+    first = [len(s.received) for s in subscribers]
+    before = sql_statements(port)
+    sent, ticket_id = [], None
+    for i in range(CHANGES):
+        sent.append(time.time())
+        if ticket_id is None:
+            _, body = request(port, 'POST', '/api/park', cookie,
+                              {'lot_id': lot_id, 'vehicle_number': f'FEED{i:04d}'})
+            ticket_id = json.loads(body)['id']
+        else:
+            request(port, 'POST', f'/api/tickets/{ticket_id}/release', cookie, {})
+            ticket_id = None
+        time.sleep(CHANGE_INTERVAL)
+    statements = (sql_statements(port) - before) / CHANGES
+
+    deadline = time.time() + 10
+    while time.time() < deadline and any(len(s.received) - n < CHANGES for s, n in zip(subscribers, first)):
+        time.sleep(0.05)
+    delays, missing = [], 0
+    for subscriber, n in zip(subscribers, first):
+        received = subscriber.received[n:n + CHANGES]
+        missing += CHANGES - len(received)
+        delays.extend((at - start) * 1000 for at, start in zip(received, sent))
+    delays.sort()
+    return {
+        'p50_ms': statistics.median(delays),
+        'p99_ms': delays[min(int(len(delays) * 0.99), len(delays) - 1)],
+        'statements': statements,
+        'missing': missing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the live availability feed.')
+    parser.add_argument('--subscribers', type=int, action='append',
+                        help='subscriber count to measure at (repeatable; default: %s)' % LEVELS)
+    args = parser.parse_args()
+    levels = sorted(args.subscribers or LEVELS)
+
+    db_path, lot_id = prepare('ProductionConfig')
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.feed_load_test', '--serve', db_path, str(port)],
+                              cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()
+        subscriber_cookie = login(port, *USERS[0])
+        driver_cookie = login(port, *USERS[1])
+        connected = threading.Semaphore(0)
+        subscribers = []
+        print(f"{'subscribers':>11} {'p50':>10} {'p99':>10} {'SQL/change':>11}")
+        for level in levels:
+            while len(subscribers) < level:
+                subscriber = Subscriber(port, subscriber_cookie, lot_id, connected)
+                subscriber.start()
+                subscribers.append(subscriber)
+                connected.acquire()
+            result = measure(port, driver_cookie, lot_id, subscribers)
+            print(f"{level:>11} {result['p50_ms']:7.1f} ms {result['p99_ms']:7.1f} ms "
+                  f"{result['statements']:11.1f}"
+                  + (f"  {result['missing']} events missing" if result['missing'] else ''))
+    finally:
+        server.terminate()
+        server.wait()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--serve']:
+        serve(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Throughput of the whole app under a multi-worker, multi-threaded load.
+
+Mimics a pre-forking server: WORKERS processes each build the app with
+the config under test against the same copy of the bundled database and
+drive it from THREADS concurrent test clients. Once every client has
+logged in, all of them loop for DURATION seconds over listing lots,
+reading one lot's availability, parking and releasing through the JSON
+API. Compares the
+development config with the production config (connection pool, WAL,
+synchronous=NORMAL, busy_timeout, mmap). Run from the repository root:
+
+    python -m benchmarks.load_test
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import config
+
+WORKERS = 4
+THREADS = 4
+DURATION = 5
+LOAD_LOT_SPOTS = 1000
+USERS = [('john_doe', 'password123'), ('jane_smith', 'janesmith123')]
+CONFIGS = ['LocalDevelopmentConfig', 'ProductionConfig']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_config(name, db_path):
+    """The named config from config.py, pointed at ``db_path``, with a throwaway secret key."""
+    return type(name, (getattr(config, name),), {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+                                                 'SECRET_KEY': 'benchmark'})
+
+
+def prepare(name):
+    """Copy the bundled database, migrate it and add a large lot to park in."""
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    shutil.copyfile(os.path.join(ROOT, 'instance', 'parking_lot.db.sqlite'), db_path)
+    code = f'''
+from app import create_app
+from benchmarks.load_test import bench_config
+from models import db, migrations
+from models.models import ParkingLot
+from models.lot_spots import add_spots
+app = create_app(bench_config({name!r}, {db_path!r}))
+with app.app_context():
+    migrations.upgrade()
+    lot = ParkingLot(prime_location_name='Load Test Lot', price=40, address='1 Load Road',
+                     pin_code='500001', maximum_number_of_spots={LOAD_LOT_SPOTS})
+    db.session.add(lot)
+    db.session.flush()
+    add_spots(lot, {LOAD_LOT_SPOTS})
+    db.session.commit()
+    print(lot.id)
+'''
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return db_path, int(result.stdout.split()[-1])
+
+
+def login(app, index):
+    client = app.test_client()
+    username, password = USERS[index % len(USERS)]
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def client_loop(client, index, lot_id, deadline, results):
+    latencies, errors = [], 0
+
+    def call(method, path, **kwargs):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            response = getattr(client, method)(path, **kwargs)
+        except Exception:
+            response = None
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code >= 500:
+            errors += 1
+            return None
+        return response
+
+    n = 0
+    while time.perf_counter() < deadline:
+        call('get', '/api/lots')
+        call('get', f'/api/lots/{lot_id}/availability')
+        parked = call('post', '/api/park', json={'lot_id': lot_id, 'vehicle_number': f'LT{index}-{n}'})
+        if parked is not None and parked.status_code == 201:
+            call('post', f"/api/tickets/{parked.get_json()['id']}/release")
+        n += 1
+    results.append((latencies, errors))
+
+
+def worker(name, db_path, lot_id):
+    """Run THREADS clients in this process and print their latencies as JSON.
+
+    Prints 'ready' once the clients are logged in and starts the load when
+    a line arrives on stdin, so the password hashing of every worker's
+    logins stays out of the measurement.
+    """
+    from app import create_app
+    app = create_app(bench_config(name, db_path))
+    clients = [login(app, i) for i in range(THREADS)]
+    print('ready', flush=True)
+    sys.stdin.readline()
+    results = []
+    deadline = time.perf_counter() + DURATION
+    threads = [threading.Thread(target=client_loop, args=(client, i, lot_id, deadline, results))
+               for i, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    json.dump({'latencies': [ms for latencies, _ in results for ms in latencies],
+               'errors': sum(errors for _, errors in results)}, sys.stdout)
+
+
+def run(name):
+    db_path, lot_id = prepare(name)
+    try:
+        processes = [subprocess.Popen([sys.executable, '-m', 'benchmarks.load_test', '--worker',
+                                       name, db_path, str(lot_id)],
+                                      cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      text=True)
+                     for _ in range(WORKERS)]
+        for process in processes:
+            process.stdout.readline()
+        for process in processes:
+            process.stdin.write('go\n')
+            process.stdin.flush()
+        reports = [json.loads(process.communicate()[0]) for process in processes]
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    latencies = sorted(ms for report in reports for ms in report['latencies'])
+    errors = sum(report['errors'] for report in reports)
+    return (len(latencies) / DURATION, statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99)], errors)
+
+
+def main():
+    print(f'{WORKERS} workers x {THREADS} threads, {DURATION} s per config')
+    for name in CONFIGS:
+        throughput, p50, p99, errors = run(name)
+        print(f'{name:<24} {throughput:7.0f} req/s   p50 {p50:6.2f} ms   '
+              f'p99 {p99:7.2f} ms   {errors} errors')
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+    sys.exit(main())
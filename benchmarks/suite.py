@@ -0,0 +1,330 @@
+"""Benchmark suite for the hot request paths, with a stored baseline.
+
+For each scale, a SQLite database is generated once with
+populate.generate_synthetic_data (and cached in the temp directory), then
+copied so every run starts from the same data. A fresh interpreter boots
+the app on the copy with the production config and drives each scenario
+through the Flask test client: first sequentially, then from THREADS
+concurrent clients. Each scenario reports p50/p99 latency, SQL statements
+per request and the process's resident memory afterwards. Results are compared against
+benchmarks/baseline.json, and regressions are flagged with a non-zero
+exit status. Latency and memory depend on the machine, so the committed
+baseline's timings only mean something where they were recorded: run
+with --save-baseline on your machine (at the commit to compare against)
+before comparing. Queries per request do not depend on the machine. Run
+from the repository root:
+
+    python -m benchmarks.suite                     # small and medium scales
+    python -m benchmarks.suite --scale large       # 10k lots, 1M tickets
+    python -m benchmarks.suite --save-baseline     # record a new baseline
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import event
+from .load_test import ROOT, bench_config
+
+SCALES = {
+    'small': {'lots': 10, 'spots_per_lot': 20, 'users': 100, 'tickets_per_lot': 100},
+    'medium': {'lots': 1_000, 'spots_per_lot': 20, 'users': 1_000, 'tickets_per_lot': 1},
+    'large': {'lots': 10_000, 'spots_per_lot': 10, 'users': 10_000, 'tickets_per_lot': 100},
+}
+DEFAULT_SCALES = ['small', 'medium']
+# Bump when the generated data changes, so cached databases are rebuilt.
+# Schema changes need no bump: the cache is keyed by the latest migration
+# too, and each copy is migrated before it is used.
+DATA_VERSION = 1
+PASSWORD = 'password'
+ADMIN = ('admin', 'admin123')
+
+ITERATIONS = 200
+LOGIN_ITERATIONS = 20
+THREADS = 8
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+# Latency and memory may grow this much over the baseline before they
+# count as a regression.
+P50_TOLERANCE = 0.25
+P99_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+# Queries per request may grow by this many, by mode. Sequential averages
+# are exact up to their rounding; concurrent ones move by a fraction of a
+# query from run to run as threads race to fill the same cache entries.
+QUERY_SLACK = {'sequential': 0.005, 'concurrent': 0.5}
+
+FIND_QUERIES = [('location', 'Lot 1'), ('location', 'Lot 42'), ('location', 'Downtown'),
+                ('pincode', '5000'), ('pincode', '500123'), ('location', 'Parking')]
+
+
+def database(scale):
+    """Path of the generated database for ``scale``, building it on first use."""
+    from models import migrations, populate
+    schema = migrations.MIGRATIONS[-1][0]
+    path = os.path.join(tempfile.gettempdir(), f'parking-bench-{scale}-v{DATA_VERSION}-m{schema}.sqlite')
+    if not os.path.exists(path):
+        from .common import make_app
+        building = path + '.building'
+        if os.path.exists(building):
+            os.remove(building)
+        sizes = SCALES[scale]
+        app = make_app(building)
+        with app.app_context():
+            migrations.upgrade()
+            populate.populate_db()
+            populate.generate_synthetic_data(sizes['lots'], sizes['spots_per_lot'], sizes['users'],
+                                             sizes['tickets_per_lot'], PASSWORD)
+        os.replace(building, path)
+    return path
+
+
+def rss_mb():
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ThreadQueries:
+    """Counts SQL statements per thread, so concurrent requests can be told apart."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self._local.count = self.count + 1
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class Session:
+    """One logged-in test client and the tickets it has parked."""
+
+    def __init__(self, app, index, username, password):
+        self.index = index
+        self.username = username
+        self.password = password
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': username, 'password': password})
+        self.tickets = []
+
+
+def _active_tickets(app, username):
+    from models import db
+    from models.models import Ticket, User
+    with app.app_context():
+        return [ticket_id for (ticket_id,) in db.session.query(Ticket.id)
+                .join(User, Ticket.user_id == User.id)
+                .filter(User.username == username, Ticket.active == True)
+                .order_by(Ticket.id)]
+
+
+def scenarios(app, lot_ids):
+    """Scenario name -> (function(session, i) making one request, needs admin, setup).
+
+    ``setup(sessions)``, if given, runs before the scenario is timed.
+    """
+    def login(session, i):
+        return session.client.post('/login', data={'username': session.username,
+                                                   'password': session.password})
+
+    def user_dashboard(session, i):
+        return session.client.get('/user/dashboard')
+
+    def find_parking(session, i):
+        search_type, query = FIND_QUERIES[i % len(FIND_QUERIES)]
+        return session.client.post('/user/find', data={'search_query': query,
+                                                       'search_type': search_type})
+
+    # Spread parks evenly over the lots, however they are split between threads
+    parks = itertools.count()
+
+    def park_vehicle(session, i):
+        return session.client.post('/user/park', data={
+            'lot_id': lot_ids[next(parks) % len(lot_ids)],
+            'vehicle_number': f'BM{i:05d}'})
+
+    def load_tickets(sessions):
+        for session in sessions:
+            session.tickets = _active_tickets(app, session.username)
+
+    def release_parking(session, i):
+        return session.client.post(f'/user/release_parking/{session.tickets.pop()}')
+
+    def admin_summary(session, i):
+        return session.client.get('/admin/summary')
+
+    def view_parking_spots(session, i):
+        lot_id = lot_ids[i % len(lot_ids)]
+        page = session.client.get(f'/admin/view_parking_spots/{lot_id}')
+        feed = session.client.get(f'/api/lots/{lot_id}/spots')
+        return page if page.status_code != 200 else feed
+
+    return {
+        'login': (login, False, None),
+        'user_dashboard': (user_dashboard, False, None),
+        'find_parking': (find_parking, False, None),
+        'park_vehicle': (park_vehicle, False, None),
+        'release_parking': (release_parking, False, load_tickets),
+        'admin_summary': (admin_summary, True, None),
+        'view_parking_spots': (view_parking_spots, True, None),
+    }
+
+
+def measure(fn, sessions, iterations, queries):
+    """Run ``iterations`` requests split over ``sessions``, one thread per session."""
+    latencies, counts, failures = [], [], []
+    lock = threading.Lock()
+
+    def worker(session, n):
+        mine, my_counts = [], []
+        for i in range(n):
+            before = queries.count
+            start = time.perf_counter()
+            response = fn(session, i)
+            mine.append((time.perf_counter() - start) * 1000)
+            my_counts.append(queries.count - before)
+            if response.status_code >= 400:
+                failures.append(response.status_code)
+        with lock:
+            latencies.extend(mine)
+            counts.extend(my_counts)
+
+    per_session = max(iterations // len(sessions), 1)
+    if len(sessions) == 1:
+        worker(sessions[0], per_session)
+    else:
+        threads = [threading.Thread(target=worker, args=(session, per_session)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 3),
+        'queries': round(sum(counts) / len(counts), 2),
+        'rss_mb': round(rss_mb(), 1),
+        'errors': len(failures),
+    }
+
+
+def run_scale(scale, db_path):
+    """Benchmark every scenario on ``db_path`` in this process; print JSON results."""
+    from app import create_app
+    from models import db, migrations
+    from models.models import ParkingLot, User
+    app = create_app(bench_config('ProductionConfig', db_path))
+    with app.app_context():
+        # As `flask db-upgrade` does on deploy; the production config does not migrate at startup.
+        migrations.upgrade()
+        queries = ThreadQueries(db.engine)
+        lot_ids = [lot_id for (lot_id,) in db.session.query(ParkingLot.id)
+                   .filter(ParkingLot.prime_location_name.like('Lot %')).order_by(ParkingLot.id)]
+        usernames = [name for (name,) in db.session.query(User.username)
+                     .filter(User.username.like('user_%')).order_by(User.id).limit(THREADS)]
+
+    users = [Session(app, i, name, PASSWORD) for i, name in enumerate(usernames)]
+    admins = [Session(app, i, *ADMIN) for i in range(THREADS)]
+    results = {}
+    # All scenarios run sequentially before any runs concurrently, so each
+    # round of parks is released before the next one.
+    for mode, clients in [('sequential', 1), ('concurrent', THREADS)]:
+        for name, (fn, admin, setup) in scenarios(app, lot_ids).items():
+            sessions = (admins if admin else users)[:clients]
+            if setup:
+                setup(sessions)
+            iterations = LOGIN_ITERATIONS if name == 'login' else ITERATIONS
+            results.setdefault(name, {})[mode] = measure(fn, sessions, iterations, queries)
+    json.dump(results, sys.stdout)
+
+
+def run(scale):
+    template = database(scale)
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    shutil.copyfile(template, db_path)
+    try:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--run', scale, db_path],
+                                cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return json.loads(output)
+
+
+def regressions(result, baseline, mode):
+    """Descriptions of the ways ``result`` is worse than ``baseline``."""
+    found = []
+    for key, tolerance in [('p50_ms', P50_TOLERANCE), ('p99_ms', P99_TOLERANCE),
+                           ('rss_mb', MEMORY_TOLERANCE)]:
+        if result[key] > baseline[key] * (1 + tolerance):
+            found.append(f'{key} {baseline[key]} -> {result[key]}')
+    if result['queries'] > baseline['queries'] + QUERY_SLACK[mode]:
+        found.append(f"queries {baseline['queries']} -> {result['queries']}")
+    if result['errors'] > baseline.get('errors', 0):
+        found.append(f"errors {baseline.get('errors', 0)} -> {result['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot request paths.')
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES),
+                        help='scale to run (repeatable; default: small and medium)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    for scale in args.scale or DEFAULT_SCALES:
+        sizes = SCALES[scale]
+        print(f"{scale}: {sizes['lots']} lots, {sizes['lots'] * sizes['tickets_per_lot']} tickets, "
+              f"{sizes['users']} users")
+        results[scale] = run(scale)
+        for name, modes in results[scale].items():
+            for mode, result in modes.items():
+                previous = baseline.get(scale, {}).get(name, {}).get(mode)
+                worse = regressions(result, previous, mode) if previous else []
+                failed = failed or bool(worse)
+                print(f"  {name:<20} {mode:<10} p50 {result['p50_ms']:8.2f} ms  "
+                      f"p99 {result['p99_ms']:8.2f} ms  {result['queries']:6.2f} q/req  "
+                      f"{result['rss_mb']:6.1f} MB"
+                      + (f"  {result['errors']} errors" if result['errors'] else '')
+                      + (f"  REGRESSION: {', '.join(worse)}" if worse else ''))
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run_scale(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    sys.exit(main())
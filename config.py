@@ -1,8 +1,73 @@
+import os
+
+
 class CONFIG():
     DEBUG = False
-    SQLALCHEMY_TRACK_MODIFICATIONS = True
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Share the lot details cache through Redis, e.g. 'redis://localhost:6379/0';
+    # None keeps it in-process.
+    LOT_CACHE_URL = None
+    # PRAGMAs run on every new SQLite connection.
+    SQLITE_PRAGMAS = {}
+    # Apply pending migrations when the app starts; otherwise run
+    # `flask db-upgrade` (and `flask seed` for demo data) on deploy.
+    AUTO_MIGRATE = False
+    # Request, SQL, template and chart metrics at /metrics, plus X-Profile.
+    INSTRUMENTATION = True
+    # Lets a scraper read /metrics with `Authorization: Bearer <token>`;
+    # otherwise only admins can.
+    METRICS_TOKEN = None
+    # Background job worker threads per process; 0 leaves the queue to
+    # `flask jobs-worker`. Admin changes touching more spots and tickets
+    # than JOB_INLINE_ROWS are queued instead of run in the request.
+    JOB_WORKERS = 1
+    JOB_INLINE_ROWS = 1000
+    # Seconds between reloads of lot counts into the live availability feed,
+    # picking up changes made by other processes.
+    AVAILABILITY_SYNC_INTERVAL = 5
+    # The find page keeps its counts current through the availability feed.
+    # An open feed holds a server thread under WSGI, so only asgi.py, whose
+    # async handlers hold none, turns this on.
+    LIVE_AVAILABILITY = False
+    # Rendered summary charts, shared by all worker processes on the host;
+    # None keeps them in the instance folder.
+    CHART_CACHE_DIR = None
 
 class LocalDevelopmentConfig(CONFIG):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///parking_lot.db.sqlite'
-    SECRET_KEY = 'secret_key'
\ No newline at end of file
+    SECRET_KEY = 'secret_key'
+    AUTO_MIGRATE = True
+
+class ProductionConfig(CONFIG):
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///parking_lot.db.sqlite')
+    # Required: create_app refuses to start without it.
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    LOT_CACHE_URL = os.environ.get('LOT_CACHE_URL')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+    # One pool per worker process; threads check connections out of it
+    # instead of opening a new one per request.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+    }
+    # The async read path (asgi.py) queues requests for a connection without
+    # holding a thread, and SQLite gains nothing from more connections than
+    # cores, so it gets a small pool of its own.
+    ASYNC_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('ASYNC_DB_POOL_SIZE', 2)),
+        'max_overflow': 0,
+        'pool_timeout': 30,
+    }
+    # WAL lets readers run alongside the single writer; NORMAL syncs at
+    # checkpoints instead of every commit, which is still durable under WAL
+    # against application crashes. Writers wait up to busy_timeout ms for
+    # the lock instead of failing with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+    }
@@ -1,9 +1,22 @@
 from functools import wraps
 from .controller_common import *
-import matplotlib.pyplot as plt
-import io
-import base64
 from sqlalchemy.exc import IntegrityError
+from models.admin_jobs import lot_row_count
+from models.jobs import Job, enqueue, pending
+from models.lot_cache import lot_cache
+from models.lot_finder import lots_changed
+from models.lot_spots import add_spots, remove_free_spot, remove_free_spots
+from models.lot_stats import get_lot_stats, summarize_lot_stats
+from models.search import lot_search, user_search
+from .charts import request_chart
+
+RECENT_JOBS = 5
+
+
+def runs_in_background(rows):
+    """Whether a change touching ``rows`` spots and tickets should be queued as a job."""
+    return rows > app.config['JOB_INLINE_ROWS']
+
 
 def admin_required(f):
     @wraps(f)
@@ -18,101 +31,46 @@ def admin_required(f):
     return decorated_function
 
 
-@app.route('/admin/dashboard')
+@routes.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
-    parking_lots = ParkingLot.query.all()
-    return render_template('admin/dashboard.html', parking_lots=parking_lots)
+    parking_lots = lot_cache.all()
+    recent_jobs = Job.query.order_by(Job.id.desc()).limit(RECENT_JOBS).all()
+    return render_template('admin/dashboard.html', parking_lots=parking_lots, recent_jobs=recent_jobs)
 
 
-@app.route('/admin/summary', methods=['GET', 'POST'])
+@routes.route('/admin/summary', methods=['GET', 'POST'])
 @admin_required
 def admin_summary():
     try:
-        if not ParkingLot.query.first():
+        lot_stats = get_lot_stats()
+        if not lot_stats:
             flash('No parking lots available to generate summary.', 'warning')
             return redirect(url_for('admin_dashboard'))
 
-        parking_lots = ParkingLot.query.all()
-        
-        revenue_data = {}
-        total_revenue = 0
-        for lot in parking_lots:
-            revenue = db.session.query(db.func.sum(Ticket.total_cost))\
-                .join(ParkingSpot)\
-                .filter(ParkingSpot.lot_id == lot.id)\
-                .scalar() or 0
-            revenue_data[lot.prime_location_name] = float(revenue)
-            total_revenue += float(revenue)
+        totals = summarize_lot_stats(lot_stats)
+        total_revenue = totals['total_revenue']
+        revenue_data = {stats['name']: stats['revenue'] for stats in lot_stats}
 
         revenue_plot = None 
 
         if total_revenue > 0:
-            plt.figure(figsize=(10, 6))
-            plt.pie(revenue_data.values(), labels=revenue_data.keys(), autopct='%1.1f%%', pctdistance=0.85, textprops={'fontsize': 18})
-            plt.gca().add_artist(plt.Circle((0,0), 0.70, fc='white'))
-            plt.text(0, 0, f'\u20b9{total_revenue:.2f}\nTotal', ha='center', va='center', fontsize=21, fontweight='bold')
-            plt.title('Revenue Distribution by Parking Lot', fontsize=24, fontweight='bold')
-
-            revenue_img = io.BytesIO()
-            plt.savefig(revenue_img, format='png', bbox_inches='tight')
-            revenue_img.seek(0)
-            plt.close() 
-
-            revenue_plot = base64.b64encode(revenue_img.getvalue()).decode()
+            revenue_plot = request_chart('revenue_pie', {
+                'labels': list(revenue_data.keys()),
+                'values': list(revenue_data.values()),
+                'total': total_revenue,
+            })
         else:
             app.logger.warning("Total revenue is zero. Skipping revenue distribution plot generation.")
             flash('No revenue generated yet to display a revenue distribution chart.', 'info')
 
-        lot_names = []
-        occupied_spots = []
-        available_spots = []
-        total_spots = 0
-        total_occupied = 0
-        
-        for lot in parking_lots:
-            occupied = ParkingSpot.query.filter_by(lot_id=lot.id, status='O').count()
-            available = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').count()
-            total = occupied + available
-            
-            lot_names.append(lot.prime_location_name)
-            occupied_spots.append(occupied)
-            available_spots.append(available)
-            
-            total_spots += total
-            total_occupied += occupied
-        
-        spots_plot = None
-        if lot_names:
-            plt.figure(figsize=(12, 6))
-            x = range(len(lot_names))
-            width = 0.35
-            
-            plt.bar([i - width/2 for i in x], occupied_spots, width, label='Occupied', color='#dc3545', alpha=0.8)
-            plt.bar([i + width/2 for i in x], available_spots, width, label='Available', color='#28a745', alpha=0.8)
-            
-            plt.xlabel('Parking Lots', fontsize=21, fontweight='bold')
-            plt.ylabel('Number of Spots', fontsize=21, fontweight='bold')
-            plt.title('Parking Spots Distribution by Lot', fontsize=24, fontweight='bold')
-            plt.xticks(x, lot_names, fontsize=18)
-            plt.yticks(fontsize=18)
-            plt.legend(fontsize=18)
-            plt.tight_layout()
-            
-            spots_img = io.BytesIO()
-            plt.savefig(spots_img, format='png', bbox_inches='tight', dpi=100)
-            spots_img.seek(0)
-            plt.close()
-            
-            spots_plot = base64.b64encode(spots_img.getvalue()).decode()
+        spots_plot = request_chart('spots_bar', {
+            'labels': [stats['name'] for stats in lot_stats],
+            'occupied': [stats['occupied'] for stats in lot_stats],
+            'available': [stats['available'] for stats in lot_stats],
+        })
         
-        summary_stats = {
-            'total_revenue': f"\u20b9{total_revenue:.2f}",
-            'total_spots': total_spots,
-            'total_occupied': total_occupied,
-            'total_available': total_spots - total_occupied,
-            'overall_occupancy': (total_occupied/total_spots*100) if total_spots > 0 else 0
-        }
+        summary_stats = dict(totals, total_revenue=f"\u20b9{total_revenue:.2f}")
 
         return render_template(
             'admin/summary.html',
@@ -126,25 +84,31 @@ def admin_summary():
         flash('Error generating summary. Please try again later.', 'error')
         return redirect(url_for('admin_dashboard'))
     
-@app.route('/admin/search', methods=['GET', 'POST'])
+@routes.route('/admin/rebuild_summaries', methods=['POST'])
+@admin_required
+def admin_rebuild_summaries():
+    job = enqueue('rebuild_summaries')
+    db.session.commit()
+    flash(f'Occupancy counters and revenue rollups are being rebuilt in the background (job #{job.id}).', 'info')
+    return redirect(url_for('admin_summary'))
+
+@routes.route('/admin/search', methods=['GET', 'POST'])
 @admin_required
 def admin_search():
     if request.method == 'POST':
         search_type = request.form.get('search_type')
         if search_type == 'parking_lot':
             search_query = request.form.get('search_query')
-            parking_lots = ParkingLot.query.filter(
-                ParkingLot.prime_location_name.ilike(f'%{search_query}%')
-            ).all()
+            parking_lots = lot_search.search(search_query, columns=('prime_location_name',))
             return render_template('admin/search.html', parking_lots=parking_lots, search_query=search_query)
         elif search_type == 'user':
             search_query = request.form.get('search_query')
-            users = User.query.filter(User.username.ilike(f'%{search_query}%')).all()
+            users = user_search.search(search_query)
             return render_template('admin/search.html', users=users, search_query=search_query)
     return render_template('admin/search.html')
 
     
-@app.route("/admin/users")
+@routes.route("/admin/users")
 @admin_required
 def users():
     users = User.query.filter_by(is_admin=False).all()
@@ -153,15 +117,13 @@ def users():
 
 def create_parking_spots(lot):
     try:
-        for spot_number in range(lot.maximum_number_of_spots):
-            spot = ParkingSpot(lot_id=lot.id, status='A')
-            db.session.add(spot)
+        add_spots(lot, lot.maximum_number_of_spots)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         raise e
 
-@app.route("/admin/add_parking_lot", methods=['GET', 'POST'])
+@routes.route("/admin/add_parking_lot", methods=['GET', 'POST'])
 @admin_required
 def add_parking_lot():
     if request.method == 'POST':
@@ -202,11 +164,18 @@ def add_parking_lot():
                 maximum_number_of_spots=maximum_number_of_spots
             )
             db.session.add(new_lot)
+            lot_cache.invalidate()
+            job = None
+            if runs_in_background(maximum_number_of_spots):
+                db.session.flush()
+                job = enqueue('resize_lot', lot_id=new_lot.id)
             db.session.commit()
 
-            create_parking_spots(new_lot)
-
-            flash('Parking lot and spots created successfully!', 'success')
+            if job is None:
+                create_parking_spots(new_lot)
+                flash('Parking lot and spots created successfully!', 'success')
+            else:
+                flash(f'Parking lot created; its spots are being added in the background (job #{job.id}).', 'success')
             return redirect(url_for('admin_dashboard'))
         except ValueError:
             flash('Invalid input for price or maximum number of spots. Please enter valid numbers.', 'error')
@@ -225,11 +194,14 @@ def add_parking_lot():
 
     return render_template('admin/parking/create_lot.html')
 
-@app.route("/admin/edit_parking_lot/<int:lot_id>", methods=['GET', 'POST'])
+@routes.route("/admin/edit_parking_lot/<int:lot_id>", methods=['GET', 'POST'])
 @admin_required
 def edit_parking_lot(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
     if request.method == 'POST':
+        if lot.status != 'open':
+            flash('This parking lot is being deleted and can no longer be edited.', 'error')
+            return redirect(url_for('admin_dashboard'))
         try:
             form_data = request.form.to_dict()
 
@@ -257,8 +229,15 @@ def edit_parking_lot(lot_id):
                 flash(f'A parking lot with the name "{new_location_name}" already exists. Please choose a different name.', 'error')
                 return render_template('admin/parking/edit_lot.html', lot=lot)
 
+            # Resizes of one lot run one after another, so queue behind a pending one.
+            in_background = (runs_in_background(abs(new_max_spots - lot.get_total_spots_count()))
+                             or pending('resize_lot', lot_id=lot.id))
             if new_max_spots < lot.maximum_number_of_spots:
-                success, message = lot.safely_reduce_spots(new_max_spots)
+                if in_background:
+                    success = lot.can_reduce_spots(new_max_spots)
+                    message = f"Cannot reduce spots below occupied count ({lot.get_occupied_spots_count()} spots in use)"
+                else:
+                    success, message = lot.safely_reduce_spots(new_max_spots)
                 if not success:
                     flash(message, 'error')
                     return render_template('admin/parking/edit_lot.html', lot=lot)
@@ -269,14 +248,19 @@ def edit_parking_lot(lot_id):
             lot.pin_code = form_data['pin_code']
             lot.maximum_number_of_spots = new_max_spots
 
-            if new_max_spots > len(lot.spots):
-                spots_to_add = new_max_spots - len(lot.spots)
-                for _ in range(spots_to_add):
-                    new_spot = ParkingSpot(lot_id=lot.id, status='A')
-                    db.session.add(new_spot)
+            job = None
+            if in_background:
+                job = enqueue('resize_lot', lot_id=lot.id)
+            elif lot.needs_spots():
+                add_spots(lot, lot.remaining_spots_to_create())
+            lots_changed()
+            lot_cache.invalidate(lot.id)
 
             db.session.commit()
-            flash('Parking lot updated successfully!', 'success')
+            if job is None:
+                flash('Parking lot updated successfully!', 'success')
+            else:
+                flash(f'Parking lot updated; its spots are being resized in the background (job #{job.id}).', 'success')
             return redirect(url_for('admin_dashboard'))
 
         except ValueError:
@@ -296,16 +280,34 @@ def edit_parking_lot(lot_id):
 
     return render_template('admin/parking/edit_lot.html', lot=lot)
 
-@app.route("/admin/delete_parking_lot/<int:lot_id>", methods=['POST'])
+@routes.route("/admin/delete_parking_lot/<int:lot_id>", methods=['POST'])
 @admin_required
 def delete_parking_lot(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
     try:
-        if any(spot.has_active_tickets() for spot in lot.spots):
+        if lot.has_active_tickets():
             flash('Cannot delete parking lot with active tickets.', 'error')
             return redirect(url_for('admin_dashboard'))
-            
+
+        if runs_in_background(lot_row_count(lot)):
+            job = enqueue('delete_lot', lot_id=lot_id)
+            db.session.commit()
+            flash(f'Parking lot is being deleted in the background (job #{job.id}).', 'success')
+            return redirect(url_for('admin_dashboard'))
+
+        # Closing and deleting in one transaction: a failure rolls both back,
+        # and the close is written before the check, so no park slips in.
+        lot.status = 'closed'
+        db.session.flush()
+        if lot.has_active_tickets():
+            db.session.rollback()
+            flash('Cannot delete parking lot with active tickets.', 'error')
+            return redirect(url_for('admin_dashboard'))
+        remove_free_spots(lot, lot.get_total_spots_count())
         db.session.delete(lot)
+        lot_changed(lot_id)
+        lot_cache.invalidate(lot_id)
+        lots_changed()
         db.session.commit()
         flash('Parking lot deleted successfully!', 'success')
     except Exception as e:
@@ -315,14 +317,23 @@ def delete_parking_lot(lot_id):
     return redirect(url_for('admin_dashboard'))
 
 
-@app.route("/admin/view_parking_spots/<int:lot_id>")
+@routes.route("/admin/export/tickets.<fmt>")
+@admin_required
+def admin_export_tickets(fmt):
+    return export_tickets_response(
+        fmt,
+        lot_id=request.args.get('lot_id', type=int),
+        user_id=request.args.get('user_id', type=int)
+    )
+
+
+@routes.route("/admin/view_parking_spots/<int:lot_id>")
 @admin_required
 def view_parking_spots(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
-    spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-    return render_template('admin/parking/view_spots.html', lot=lot, spots=spots)
+    return render_template('admin/parking/view_spots.html', lot=lot)
 
-@app.route("/admin/view_spot_details/<int:lot_id>/<int:spot_id>")
+@routes.route("/admin/view_spot_details/<int:lot_id>/<int:spot_id>")
 @admin_required
 def view_spot_details(lot_id, spot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
@@ -352,7 +363,7 @@ def view_spot_details(lot_id, spot_id):
                          duration_hours=duration_hours,
                          estimated_cost=estimated_cost)
 
-@app.route("/admin/delete_parking_spot/<int:lot_id>/<int:spot_id>", methods=['POST'])
+@routes.route("/admin/delete_parking_spot/<int:lot_id>/<int:spot_id>", methods=['POST'])
 @admin_required
 def delete_parking_spot(lot_id, spot_id):
     spot = ParkingSpot.query.get_or_404(spot_id)
@@ -363,9 +374,12 @@ def delete_parking_spot(lot_id, spot_id):
         flash('Cannot delete an occupied parking spot.', 'error')
     else:
         try:
-            db.session.delete(spot)
-            db.session.commit()
-            flash('Parking spot deleted successfully.', 'success')
+            if remove_free_spot(lot_id, spot_id):
+                db.session.commit()
+                flash('Parking spot deleted successfully.', 'success')
+            else:
+                db.session.rollback()
+                flash('Cannot delete an occupied parking spot.', 'error')
         except Exception as e:
             db.session.rollback()
             flash(f'Error deleting parking spot: {str(e)}', 'error')
@@ -0,0 +1,285 @@
+import json
+from .controller_common import *
+from models.availability_feed import availability_feed, load_counts
+from models.jobs import Job
+from models.lot_cache import lot_cache
+from models.lot_finder import find_cache
+from models.lot_stats import get_lot_stats, summarize_lot_stats, get_lot_availability
+from models.parking import park_in_lot, release_ticket, process_batch, valid_id
+from models.rollups import user_revenue_summary
+from models.spot_grid import (lot_spots_page, pack_spots_page, SPOT_STATUSES,
+                               SPOTS_PER_PAGE, MAX_SPOTS_PER_PAGE)
+from models.tickets import user_tickets_page, with_spot_and_lot
+
+MAX_BATCH_SIZE = 1000
+JOBS_PER_PAGE = 50
+# Seconds between comments on an idle stream, so dead connections are noticed.
+STREAM_HEARTBEAT = 15
+
+
+def api_response(payload, status=200):
+    """Compact JSON response; GET responses carry an ETag and honour If-None-Match."""
+    response = Response(json.dumps(payload, separators=(',', ':')), status=status,
+                        mimetype='application/json')
+    if request.method == 'GET' and status == 200:
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def api_error(message, status):
+    return api_response({'error': message}, status)
+
+
+def api_login_required(admin=None):
+    """Reject unauthenticated callers with JSON; ``admin`` restricts to admins or users."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return api_error('Authentication required.', 401)
+            if admin is not None and current_user.is_admin != admin:
+                return api_error('Not allowed for this account.', 403)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def _money(value):
+    return float(value) if value is not None else None
+
+
+def lot_json(lot, occupied, available):
+    return {
+        'id': lot.id,
+        'prime_location_name': lot.prime_location_name,
+        'price': float(lot.price),
+        'address': lot.address,
+        'pin_code': lot.pin_code,
+        'maximum_number_of_spots': lot.maximum_number_of_spots,
+        'occupied_spots': occupied,
+        'available_spots': available,
+    }
+
+
+def ticket_json(ticket):
+    return {
+        'id': ticket.id,
+        'active': ticket.active,
+        'spot_id': ticket.spot_id,
+        'lot_id': ticket.spot.lot_id,
+        'lot_name': ticket.spot.lot.prime_location_name,
+        'vehicle_number': ticket.vehicle_number,
+        'parking_timestamp': _timestamp(ticket.parking_timestamp),
+        'leaving_timestamp': _timestamp(ticket.leaving_timestamp),
+        'duration': ticket.duration,
+        'total_cost': _money(ticket.total_cost),
+        'parking_cost_per_unit_time': _money(ticket.parking_cost_per_unit_time),
+    }
+
+
+def _own_ticket(ticket_id):
+    ticket = Ticket.query.options(*with_spot_and_lot()).get(ticket_id)
+    if ticket is None or ticket.user_id != current_user.id:
+        return None
+    return ticket
+
+
+@routes.route('/api/lots')
+@api_login_required()
+def api_lots():
+    return api_response({'lots': [lot_json(*row) for row in get_lot_availability()]})
+
+
+@routes.route('/api/lots/<int:lot_id>/availability')
+@api_login_required()
+def api_lot_availability(lot_id):
+    rows = get_lot_availability([lot_id])
+    if not rows:
+        return api_error('Parking lot not found.', 404)
+    lot, occupied, available = rows[0]
+    return api_response(availability_json(lot.id, occupied, available))
+
+
+def _event(event, data, event_id):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def availability_json(lot_id, occupied, available):
+    return {'lot_id': lot_id, 'occupied_spots': occupied, 'available_spots': available}
+
+
+def availability_events(lot_ids, changes, after):
+    """Event stream text for ``changes`` read from the feed after change ``after``.
+
+    None (missed changes, or a new stream) sends a snapshot of every lot,
+    or those in ``lot_ids``; no changes send a keep-alive comment. Returns
+    the text and the number of the last change it covers.
+    """
+    if changes is None:
+        after, counts = availability_feed.snapshot()
+        return _event('snapshot', {'lots': [
+            availability_json(lot_id, *lot_counts) for lot_id, lot_counts in sorted(counts.items())
+            if lot_ids is None or lot_id in lot_ids]}, after), after
+    if not changes:
+        return ': keep-alive\n\n', after
+    return ''.join(_event('availability', availability_json(lot_id, occupied, available), seq)
+                   for seq, lot_id, occupied, available in changes
+                   if lot_ids is None or lot_id in lot_ids), changes[-1][0]
+
+
+def availability_stream(lot_ids, after):
+    """Server-sent events: a snapshot, then each change, resuming after change ``after`` if given."""
+    changes = availability_feed.changes(after) if after is not None else None
+    while True:
+        text, after = availability_events(lot_ids, changes, after)
+        if text:
+            yield text
+        changes = availability_feed.changes(after, STREAM_HEARTBEAT)
+
+
+@routes.route('/api/lots/availability/stream')
+@api_login_required()
+def api_availability_stream():
+    if not availability_feed.loaded:
+        availability_feed.sync(load_counts())
+    availability_feed.start_sync(app._get_current_object(), app.config['AVAILABILITY_SYNC_INTERVAL'])
+    lot_ids = set(request.args.getlist('lot_id', type=int)) or None
+    after = request.headers.get('Last-Event-ID', type=int)
+    return Response(availability_stream(lot_ids, after), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@routes.route('/api/lots/<int:lot_id>/spots')
+@api_login_required(admin=True)
+def api_lot_spots(lot_id):
+    status = request.args.get('status') or None
+    if status is not None and status not in SPOT_STATUSES:
+        return api_error('status must be A or O.', 400)
+    if lot_cache.get(lot_id) is None:
+        return api_error('Parking lot not found.', 404)
+    per_page = min(max(request.args.get('limit', SPOTS_PER_PAGE, type=int), 1), MAX_SPOTS_PER_PAGE)
+    rows, next_after = lot_spots_page(lot_id, request.args.get('after', type=int), status, per_page)
+    return api_response(pack_spots_page(rows, next_after))
+
+
+@routes.route('/api/park', methods=['POST'])
+@api_login_required(admin=False)
+def api_park():
+    data = request.get_json(silent=True) or {}
+    lot_id = data.get('lot_id')
+    vehicle_number = data.get('vehicle_number')
+    if not valid_id(lot_id) or not vehicle_number:
+        return api_error('lot_id (integer) and vehicle_number are required.', 400)
+    if lot_cache.get(lot_id) is None:
+        return api_error('Parking lot not found.', 404)
+
+    ticket = park_in_lot(current_user.id, lot_id, vehicle_number)
+    if not ticket:
+        db.session.rollback()
+        return api_error('No parking spots available in this lot.', 409)
+    db.session.commit()
+    return api_response(ticket_json(ticket), 201)
+
+
+@routes.route('/api/tickets/<int:ticket_id>/release', methods=['POST'])
+@api_login_required(admin=False)
+def api_release(ticket_id):
+    ticket = _own_ticket(ticket_id)
+    if ticket is None:
+        return api_error('Ticket not found.', 404)
+    if release_ticket(ticket) is None:
+        db.session.rollback()
+        return api_error('This parking spot is not booked.', 409)
+    db.session.commit()
+    return api_response(ticket_json(ticket))
+
+
+@routes.route('/api/batch', methods=['POST'])
+@api_login_required(admin=True)
+def api_batch():
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return api_error('operations must be a non-empty list.', 400)
+    if len(operations) > MAX_BATCH_SIZE:
+        return api_error(f'At most {MAX_BATCH_SIZE} operations per batch.', 400)
+
+    try:
+        results = []
+        for result in process_batch(operations):
+            ticket = result.pop('ticket', None)
+            if ticket is not None:
+                result.update(ticket_id=ticket.id, spot_id=ticket.spot_id,
+                              active=ticket.active, total_cost=_money(ticket.total_cost))
+            results.append(result)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error processing batch: {str(e)}")
+        return api_error('The batch could not be processed; no operation was applied.', 500)
+    return api_response({'results': results})
+
+
+@routes.route('/api/cache/stats')
+@api_login_required(admin=True)
+def api_cache_stats():
+    return api_response({
+        'lot_cache': lot_cache.stats(),
+        'find_cache': {'hits': find_cache.hits, 'misses': find_cache.misses, 'size': len(find_cache)},
+    })
+
+
+@routes.route('/api/jobs')
+@api_login_required(admin=True)
+def api_jobs():
+    query = Job.query.order_by(Job.id.desc())
+    if request.args.get('status'):
+        query = query.filter(Job.status == request.args['status'])
+    return api_response({'jobs': [job.to_dict() for job in query.limit(JOBS_PER_PAGE)]})
+
+
+@routes.route('/api/jobs/<int:job_id>')
+@api_login_required(admin=True)
+def api_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return api_error('Job not found.', 404)
+    return api_response(job.to_dict())
+
+
+@routes.route('/api/tickets')
+@api_login_required(admin=False)
+def api_tickets():
+    tickets, next_cursor = user_tickets_page(current_user.id, request.args.get('before'))
+    return api_response({'tickets': [ticket_json(ticket) for ticket in tickets],
+                         'next_cursor': next_cursor})
+
+
+@routes.route('/api/tickets/<int:ticket_id>')
+@api_login_required(admin=False)
+def api_ticket(ticket_id):
+    ticket = _own_ticket(ticket_id)
+    if ticket is None:
+        return api_error('Ticket not found.', 404)
+    return api_response(ticket_json(ticket))
+
+
+@routes.route('/api/summary')
+@api_login_required()
+def api_summary():
+    if current_user.is_admin:
+        lot_stats = get_lot_stats()
+        return api_response({'lots': lot_stats, 'totals': summarize_lot_stats(lot_stats)})
+
+    summary = user_revenue_summary(current_user.id)
+    if summary is None:
+        return api_response({'total_parkings': 0, 'total_spent': 0, 'avg_cost': 0,
+                             'most_used_lot': None, 'daily': []})
+    summary['daily'] = [{'day': day.isoformat(), 'ticket_count': count, 'revenue': revenue}
+                        for day, count, revenue in summary['daily']]
+    return api_response(summary)
@@ -0,0 +1,209 @@
+"""Async handlers for the read-heavy JSON endpoints, served over ASGI.
+
+Lot listing, lot availability, ticket lookup and the live availability
+feed are answered on an asyncio engine, so a request waiting on SQLite or
+on the next availability change holds no thread. Responses match the
+Flask handlers byte for byte, ETags included. Everything else, and any
+request these handlers cannot serve on the happy path (no session,
+someone else's ticket, ...), is passed to the Flask app, so errors,
+redirects and remember-me logins behave exactly as under WSGI.
+Requires ``aiosqlite`` and ``asgiref``.
+"""
+import asyncio
+import contextvars
+import json
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+from werkzeug.http import generate_etag, parse_cookie, parse_etags
+from models.async_db import get_ticket, load_principal, lot_availability, lot_counts
+from models.availability_feed import availability_feed
+from .api_controllers import (STREAM_HEARTBEAT, availability_events, availability_json, lot_json,
+                              ticket_json)
+
+
+class AsyncRequest:
+    """What a handler needs from an ASGI request: headers, query, principal and a DB session."""
+
+    def __init__(self, scope, receive, session):
+        self.scope = scope
+        self.receive = receive
+        self.session = session
+        self.headers = {name.decode('latin-1'): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.args = parse_qs(scope['query_string'].decode('latin-1'))
+        self.principal = None
+
+
+class FeedRelay:
+    """Wakes asyncio subscribers when the availability feed changes.
+
+    One thread blocks on the feed's condition and resolves a future on the
+    event loop after each change; every stream awaits that same future.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._waiter = None
+
+    def _run(self):
+        after = availability_feed.snapshot()[0]
+        while True:
+            changes = availability_feed.changes(after, STREAM_HEARTBEAT)
+            if changes is None:
+                after = availability_feed.snapshot()[0]
+            elif not changes:
+                continue
+            else:
+                after = changes[-1][0]
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+        self._waiter = None
+
+    async def wait(self, disconnected, timeout):
+        """Wait for the next change, a disconnect or ``timeout`` seconds, whichever is first."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            threading.Thread(target=self._run, name='availability-relay', daemon=True).start()
+        if self._waiter is None:
+            self._waiter = self._loop.create_future()
+        await asyncio.wait({self._waiter, disconnected}, timeout=timeout,
+                           return_when=asyncio.FIRST_COMPLETED)
+
+
+class AsyncReadApi:
+    """ASGI app answering the read endpoints itself and passing the rest to Flask."""
+
+    def __init__(self, flask_app, session_factory):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.sessions = session_factory
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.relay = FeedRelay()
+        self.request_seconds = None
+        if flask_app.config.get('INSTRUMENTATION'):
+            from .instrumentation import request_seconds
+            self.request_seconds = request_seconds
+        self.routes = [(re.compile(pattern), endpoint, handler) for pattern, endpoint, handler in [
+            (r'/api/lots', 'api_lots', self.lots),
+            (r'/api/lots/(\d+)/availability', 'api_lot_availability', self.lot_availability),
+            (r'/api/lots/availability/stream', 'api_availability_stream', self.availability_stream),
+            (r'/api/tickets/(\d+)', 'api_ticket', self.ticket),
+        ]]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, endpoint, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match and await self._serve(endpoint, handler, match.groups(), scope, receive, send):
+                    return
+        # uvicorn starts the next request on a keep-alive connection from
+        # inside the last response's send, which WsgiToAsgi runs in the
+        # context of its worker thread; in that context asgiref finds the
+        # finished request's executor and fails. A fresh context avoids it.
+        await contextvars.Context().run(asyncio.ensure_future, self.wsgi(scope, receive, send))
+
+    async def _serve(self, endpoint, handler, args, scope, receive, send):
+        start = time.perf_counter()
+        async with self.sessions() as session:
+            request = AsyncRequest(scope, receive, session)
+            request.principal = await self._principal(request)
+            if request.principal is None:
+                return False
+            status = await handler(request, send, *args)
+        if status is None:
+            return False
+        if self.request_seconds is not None:
+            self.request_seconds.observe(time.perf_counter() - start, endpoint, 'GET', str(status))
+        return True
+
+    async def _principal(self, request):
+        """The logged-in user from Flask's signed session cookie, or None."""
+        if self.session_serializer is None:
+            return None
+        cookie = parse_cookie(request.headers.get('cookie', '')).get(
+            self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not cookie:
+            return None
+        try:
+            data = self.session_serializer.loads(
+                cookie, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+            user_id = int(data['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+        return await load_principal(request.session, user_id)
+
+    async def _json(self, request, send, payload):
+        """Send ``payload`` as api_controllers.api_response would; returns the status."""
+        body = json.dumps(payload, separators=(',', ':')).encode()
+        etag = generate_etag(body)
+        status = 200
+        if parse_etags(request.headers.get('if-none-match')).contains(etag):
+            status, body = 304, b''
+        headers = [(b'content-type', b'application/json'), (b'etag', f'"{etag}"'.encode()),
+                   (b'vary', b'Cookie')]
+        if status == 200:
+            headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return status
+
+    async def lots(self, request, send):
+        rows = await lot_availability(request.session)
+        return await self._json(request, send, {'lots': [lot_json(*row) for row in rows]})
+
+    async def lot_availability(self, request, send, lot_id):
+        rows = await lot_availability(request.session, [int(lot_id)])
+        if not rows:
+            return None
+        lot, occupied, available = rows[0]
+        return await self._json(request, send, availability_json(lot.id, occupied, available))
+
+    async def ticket(self, request, send, ticket_id):
+        if request.principal.is_admin:
+            return None
+        ticket = await get_ticket(request.session, int(ticket_id))
+        if ticket is None or ticket.user_id != request.principal.id:
+            return None
+        return await self._json(request, send, ticket_json(ticket))
+
+    async def availability_stream(self, request, send):
+        if not availability_feed.loaded:
+            availability_feed.sync(await lot_counts(request.session))
+        availability_feed.start_sync(self.flask_app, self.flask_app.config['AVAILABILITY_SYNC_INTERVAL'])
+        # Give the connection back before the stream settles in to wait.
+        await request.session.close()
+        lot_ids = {int(lot_id) for lot_id in request.args.get('lot_id', []) if lot_id.isdigit()} or None
+        after = request.headers.get('last-event-id', '')
+        after = int(after) if after.isdigit() else None
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        disconnected = asyncio.ensure_future(self._disconnect(request.receive))
+        try:
+            changes = availability_feed.changes(after) if after is not None else None
+            while not disconnected.done():
+                text, after = availability_events(lot_ids, changes, after)
+                if text:
+                    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+                changes = availability_feed.changes(after)
+                if changes == []:
+                    await self.relay.wait(disconnected, STREAM_HEARTBEAT)
+                    changes = availability_feed.changes(after)
+        finally:
+            disconnected.cancel()
+        return 200
+
+    @staticmethod
+    async def _disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
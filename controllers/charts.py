@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app as app, request, make_response, abort
+from flask_login import login_required
+from models.metrics import metrics
+from .controller_common import routes
+
+CACHE_SIZE = 128
+RENDER_WORKERS = 2
+RENDER_TIMEOUT = 30
+MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='charts')
+_lock = threading.Lock()
+# Renders started by this process, by key, until their file is written.
+_pending = {}
+
+render_seconds = metrics.histogram('chart_render_duration_seconds',
+                                   'matplotlib chart render time, by chart and format.',
+                                   ['chart', 'format'])
+
+
+def _cache_dir():
+    path = app.config.get('CHART_CACHE_DIR') or os.path.join(app.instance_path, 'charts')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write(path, body):
+    """Write ``body`` to ``path`` atomically, so other workers never read half a file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def _touch(path):
+    """Mark a cache file as recently used; False if it has been evicted."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _evict(directory):
+    """Drop the least recently used charts beyond CACHE_SIZE, with their rendered files."""
+    specs = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                specs.append((os.path.getmtime(os.path.join(directory, name)), name[:-5]))
+            except FileNotFoundError:
+                pass
+    specs.sort()
+    for _, key in specs[:max(len(specs) - CACHE_SIZE, 0)]:
+        for fmt in ('json',) + tuple(MIMETYPES):
+            try:
+                os.remove(os.path.join(directory, f'{key}.{fmt}'))
+            except FileNotFoundError:
+                pass
+
+
+def _render(kind, data, fmt, path):
+    # matplotlib is only imported by the first chart render, not at startup
+    from . import plots
+    start = time.perf_counter()
+    body = getattr(plots, kind)(data, fmt)
+    render_seconds.observe(time.perf_counter() - start, kind, fmt)
+    _write(path, body)
+    return body
+
+
+def _submit(key, spec, path):
+    """Render ``spec`` to ``path`` on the worker pool, once per key in this process."""
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _pending[key] = _executor.submit(_render, spec['kind'], spec['data'], spec['fmt'], path)
+            future.add_done_callback(lambda _: _forget(key))
+    return future
+
+
+def _forget(key):
+    with _lock:
+        _pending.pop(key, None)
+
+
+def fingerprint(kind, data, fmt):
+    payload = json.dumps([kind, data, fmt], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def request_chart(kind, data, fmt='png'):
+    """Queue a chart for rendering and return the key it is served under.
+
+    Charts are keyed by a fingerprint of their data and kept as files in
+    CHART_CACHE_DIR, the chart's data next to its rendered image, so every
+    worker process can serve a chart that any of them requested, and an
+    unchanged chart is rendered once. Rendering happens on a small worker
+    pool; the image endpoint waits for it if needed, or renders the chart
+    again from its data if the image is missing.
+    """
+    key = fingerprint(kind, data, fmt)
+    directory = _cache_dir()
+    spec_path = os.path.join(directory, f'{key}.json')
+    image_path = os.path.join(directory, f'{key}.{fmt}')
+    if _touch(spec_path):
+        if os.path.exists(image_path):
+            return key
+    else:
+        _write(spec_path, json.dumps({'kind': kind, 'data': data, 'fmt': fmt}).encode())
+        _evict(directory)
+    _submit(key, {'kind': kind, 'data': data, 'fmt': fmt}, image_path)
+    return key
+
+
+def _get_chart(key, fmt):
+    """The chart's bytes, waiting for or starting its render; None for an unknown chart."""
+    directory = _cache_dir()
+    image_path = os.path.join(directory, f'{key}.{fmt}')
+    with _lock:
+        future = _pending.get(key)
+    if future is None:
+        try:
+            with open(image_path, 'rb') as f:
+                body = f.read()
+            _touch(os.path.join(directory, f'{key}.json'))
+            return body
+        except FileNotFoundError:
+            pass
+        try:
+            with open(os.path.join(directory, f'{key}.json')) as f:
+                spec = json.load(f)
+        except FileNotFoundError:
+            return None
+        if spec['fmt'] != fmt:
+            return None
+        future = _submit(key, spec, image_path)
+    return future.result(timeout=RENDER_TIMEOUT)
+
+
+@routes.route('/charts/<key>.<fmt>')
+@login_required
+def chart_image(key, fmt):
+    if key in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(key)
+        return response
+
+    if fmt not in MIMETYPES or not key.isalnum():
+        abort(404)
+    try:
+        body = _get_chart(key, fmt)
+    except Exception as e:
+        app.logger.error(f"Error rendering chart {key}: {str(e)}")
+        abort(500)
+    if body is None:
+        abort(404)
+
+    response = make_response(body)
+    response.mimetype = MIMETYPES[fmt]
+    response.set_etag(key)
+    response.cache_control.private = True
+    response.cache_control.max_age = 86400
+    return response
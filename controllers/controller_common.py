@@ -1,14 +1,58 @@
-from flask import current_app as app, jsonify, request, render_template, flash, redirect, url_for
+from flask import current_app as app, jsonify, request, render_template, flash, redirect, url_for, abort, Response, stream_with_context
 from models import db
 from flask_login import login_user, login_required, current_user
-from models.models import ParkingLot, ParkingSpot, User, Ticket
+from models.models import ParkingLot, ParkingLotCounter, ParkingSpot, User, Ticket
+from models.occupancy import adjust_counts
+from models.principals import principal_changed
+from models.spot_index import lot_changed
+from models.ticket_export import EXPORT_FORMATS, export_statement
 from werkzeug.security import generate_password_hash
-from datetime import datetime
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
-from matplotlib.dates import DateFormatter
+from datetime import datetime, date
 import os
 from functools import wraps
+
+
+class Routes:
+    """Views declared by the controller modules, added to each app by ``init_app``.
+
+    The modules decorate their views with ``routes.route`` when first
+    imported, so every app that create_app builds gets the same rules
+    under the same endpoint names.
+    """
+
+    def __init__(self):
+        self._rules = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self._rules.append((rule, view, options))
+            return view
+        return decorator
+
+    def init_app(self, app):
+        for rule, view, options in self._rules:
+            app.add_url_rule(rule, view_func=view, **options)
+
+
+routes = Routes()
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'Invalid {name} date, expected YYYY-MM-DD.')
+
+
+def export_tickets_response(fmt, **filters):
+    """Stream ticket history as CSV or NDJSON, filtered by the start/end query args."""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    generate, mimetype = EXPORT_FORMATS[fmt]
+    stmt = export_statement(start=date_arg('start'), end=date_arg('end'), **filters)
+    response = Response(stream_with_context(generate(stmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=tickets.{fmt}'
+    return response
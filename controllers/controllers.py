@@ -1,12 +1,12 @@
 from .controller_common import *
 
 
-@app.route('/')
+@routes.route('/')
 def index():
     return render_template('index.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@routes.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -23,7 +23,7 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@routes.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         form_data = request.form.to_dict()
@@ -48,18 +48,21 @@ def register():
     return render_template('register.html')
 
 
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@routes.route('/edit_profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     if request.method == 'POST':
         form_data = request.form.to_dict()
-        
-        current_user.username = form_data['username']
+        # current_user is a shared read-only principal; edit the real row
+        user = db.session.get(User, current_user.id)
+
+        user.username = form_data['username']
         if form_data['password']:
-            current_user.password_hash = generate_password_hash(form_data['password'])
-        current_user.fullname = form_data['fullname']
-        current_user.address = form_data['address']
-        current_user.pincode = form_data['pincode']
+            user.password_hash = generate_password_hash(form_data['password'])
+        user.fullname = form_data['fullname']
+        user.address = form_data['address']
+        user.pincode = form_data['pincode']
+        principal_changed(user.id)
         db.session.commit()
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('user_dashboard'))
@@ -67,7 +70,7 @@ def edit_profile():
     return render_template('edit_profile.html', user=current_user)
 
 
-@app.route('/logout')
+@routes.route('/logout')
 @login_required
 def logout():
     from flask_login import logout_user
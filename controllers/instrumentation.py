@@ -0,0 +1,182 @@
+"""Always-on request metrics, served at /metrics, and opt-in per-request profiles.
+
+Every request records its latency and the number and duration of SQL
+statements it ran; every template render records its time. An admin (or
+anyone, in debug mode) can send ``X-Profile: 1`` to get a cProfile
+breakdown of that one request back instead of its body; the header value
+may name a pstats sort key such as ``tottime``.
+
+/metrics is served to admins and to scrapers that send
+``Authorization: Bearer <METRICS_TOKEN>`` when that token is configured.
+"""
+import cProfile
+import hmac
+import io
+import pstats
+import threading
+import time
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from .controller_common import *
+from models.lot_cache import lot_cache
+from models.lot_finder import find_cache
+from models.metrics import metrics
+from models.principals import principal_cache
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_LINES = 40
+PROFILE_SORTS = {'cumulative', 'tottime', 'calls', 'ncalls', 'time'}
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Time to build the response, by endpoint.',
+    ['endpoint', 'method', 'status'])
+request_queries = metrics.histogram(
+    'http_request_sql_statements', 'SQL statements run per request, by endpoint.',
+    ['endpoint'], buckets=QUERY_BUCKETS)
+request_sql_seconds = metrics.histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per request, by endpoint.',
+    ['endpoint'])
+sql_seconds = metrics.histogram(
+    'sql_statement_duration_seconds', 'Duration of each SQL statement.')
+template_seconds = metrics.histogram(
+    'template_render_duration_seconds', 'Jinja template render time, by template.',
+    ['template'])
+
+
+def _cache_stats():
+    stats = {('lots', 'hit'): lot_cache.hits, ('lots', 'miss'): lot_cache.misses}
+    for name, cache in [('find', find_cache), ('principals', principal_cache)]:
+        stats[(name, 'hit')] = cache.hits
+        stats[(name, 'miss')] = cache.misses
+    return stats
+
+
+metrics.collected('cache_lookups_total', 'Cache lookups, by cache and result.',
+                  ['cache', 'result'], _cache_stats, type='counter')
+metrics.collected('cache_entries', 'Entries held by the in-process caches.', ['cache'],
+                  lambda: {('find',): len(find_cache), ('principals',): len(principal_cache)})
+
+# Per-thread state of the request being served; SQL and template events
+# fire on the thread that runs the request.
+_local = threading.local()
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+# Statement start times live on the execution context, which is dropped
+# with the statement, so a statement that fails leaves nothing behind.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    sql_seconds.observe(elapsed)
+    if getattr(_local, 'start', None) is not None:
+        _local.queries += 1
+        _local.sql_time += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    if not hasattr(_local, 'templates'):
+        _local.templates = []
+    _local.templates.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    elapsed = time.perf_counter() - _local.templates.pop()
+    template_seconds.observe(elapsed, template.name or 'string')
+    if getattr(_local, 'start', None) is not None:
+        _local.template_times.append((template.name, elapsed))
+
+
+def _may_profile():
+    return app.debug or (current_user.is_authenticated and current_user.is_admin)
+
+
+def _start_request():
+    _local.start = time.perf_counter()
+    _local.queries = 0
+    _local.sql_time = 0.0
+    _local.templates = []
+    _local.template_times = []
+    _local.profiler = None
+    if PROFILE_HEADER in request.headers and _may_profile():
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+
+
+def _finish_request(response):
+    start = getattr(_local, 'start', None)
+    if start is None:
+        return response
+    profiler = _local.profiler
+    if profiler is not None:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+    endpoint = _endpoint()
+    request_seconds.observe(elapsed, endpoint, request.method, str(response.status_code))
+    request_queries.observe(_local.queries, endpoint)
+    request_sql_seconds.observe(_local.sql_time, endpoint)
+    if profiler is not None:
+        response = _profile_response(profiler, response, elapsed)
+    return response
+
+
+def _end_request(exc):
+    _local.start = None
+    _local.profiler = None
+
+
+def _profile_response(profiler, response, elapsed):
+    sort = request.headers[PROFILE_HEADER].strip().lower()
+    if sort not in PROFILE_SORTS:
+        sort = 'cumulative'
+    out = io.StringIO()
+    out.write(f'{request.method} {request.full_path.rstrip("?")} -> {response.status_code} '
+              f'in {elapsed * 1000:.1f} ms\n')
+    out.write(f'SQL: {_local.queries} statements in {_local.sql_time * 1000:.1f} ms\n')
+    for name, seconds in _local.template_times:
+        out.write(f'Template {name}: {seconds * 1000:.1f} ms\n')
+    out.write('\n')
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(PROFILE_LINES)
+    profiled = Response(out.getvalue(), status=response.status_code, mimetype='text/plain')
+    profiled.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                         f'db;dur={_local.sql_time * 1000:.1f}')
+    return profiled
+
+
+def _may_scrape():
+    token = app.config.get('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     f'Bearer {token}'.encode()):
+        return True
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def prometheus_metrics():
+    if not _may_scrape():
+        abort(401 if not current_user.is_authenticated else 403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Record metrics for ``app``'s requests, SQL and templates and serve them.
+
+    Call with ``app``'s context pushed, so its engine is the one listened to.
+    """
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', view_func=prometheus_metrics)
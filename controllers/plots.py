@@ -0,0 +1,51 @@
+import io
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+
+
+def _save(fig, fmt, **kwargs):
+    img = io.BytesIO()
+    fig.savefig(img, format=fmt, bbox_inches='tight', **kwargs)
+    return img.getvalue()
+
+
+def revenue_pie(data, fmt):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.pie(data['values'], labels=data['labels'], autopct='%1.1f%%', pctdistance=0.85, textprops={'fontsize': 18})
+    ax.add_artist(Circle((0, 0), 0.70, fc='white'))
+    ax.text(0, 0, f"₹{data['total']:.2f}\nTotal", ha='center', va='center', fontsize=21, fontweight='bold')
+    ax.set_title('Revenue Distribution by Parking Lot', fontsize=24, fontweight='bold')
+    return _save(fig, fmt)
+
+
+def spots_bar(data, fmt):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    x = range(len(data['labels']))
+    width = 0.35
+
+    ax.bar([i - width/2 for i in x], data['occupied'], width, label='Occupied', color='#dc3545', alpha=0.8)
+    ax.bar([i + width/2 for i in x], data['available'], width, label='Available', color='#28a745', alpha=0.8)
+
+    ax.set_xlabel('Parking Lots', fontsize=21, fontweight='bold')
+    ax.set_ylabel('Number of Spots', fontsize=21, fontweight='bold')
+    ax.set_title('Parking Spots Distribution by Lot', fontsize=24, fontweight='bold')
+    ax.set_xticks(list(x), data['labels'], fontsize=18)
+    ax.tick_params(axis='y', labelsize=18)
+    ax.legend(fontsize=18)
+    fig.tight_layout()
+    return _save(fig, fmt, dpi=100)
+
+
+def cost_history(data, fmt):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.bar(data['dates'], data['costs'], color='#007bff', alpha=0.85)
+    ax.set_title('Parking Cost History', fontsize=24, fontweight='bold')
+    ax.set_xlabel('Date', fontsize=21, fontweight='bold')
+    ax.set_ylabel('Cost (₹)', fontsize=21, fontweight='bold')
+    ax.tick_params(axis='x', labelsize=18, rotation=0)
+    ax.tick_params(axis='y', labelsize=18)
+    fig.tight_layout()
+    return _save(fig, fmt)
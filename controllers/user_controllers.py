@@ -1,5 +1,10 @@
 from .controller_common import *
-from decimal import Decimal
+from models.parking import park_in_lot, release_ticket
+from models.tickets import user_tickets_page, with_spot_and_lot
+from models.rollups import user_revenue_summary
+from models.lot_cache import lot_cache
+from models.lot_finder import find_lots
+from .charts import request_chart
 
 def user_required(f):
     @wraps(f)
@@ -13,104 +18,64 @@ def user_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/user/dashboard')
+@routes.route('/user/dashboard')
 @user_required
 def user_dashboard():
-    tickets = Ticket.query.filter_by(user_id=current_user.id).all()
-    parking_lots = ParkingLot.query.all()
-    return render_template('user/dashboard.html', tickets=tickets, parking_lots=parking_lots, user=current_user.username)
+    cursor = request.args.get('before')
+    tickets, next_cursor = user_tickets_page(current_user.id, cursor)
+    parking_lots = lot_cache.all()
+    return render_template('user/dashboard.html', tickets=tickets, parking_lots=parking_lots,
+                           next_cursor=next_cursor, is_first_page=not cursor, user=current_user.username)
 
-@app.route('/user/park', methods=['POST'])
+@routes.route('/user/park', methods=['POST'])
 @user_required
 def park_vehicle():
     form_data = request.form.to_dict()
     lot_id = form_data['lot_id']
     vehicle_number = form_data['vehicle_number']
     
-    available_spot = ParkingSpot.query.filter_by(lot_id=lot_id, status='A').first()
-    if not available_spot:
+    ticket = park_in_lot(current_user.id, lot_id, vehicle_number)
+    if not ticket:
+        db.session.rollback()
         flash('No parking spots available in this lot.', 'error')
         return redirect(url_for('user_dashboard'))
     
-    lot = ParkingLot.query.get(lot_id)
-    ticket = Ticket(
-        spot_id=available_spot.id,
-        user_id=current_user.id,
-        vehicle_number=vehicle_number,
-        parking_timestamp=datetime.now(),
-        parking_cost_per_unit_time=lot.price,
-        active=True
-    )
-    
-    available_spot.status = 'O'
-    
-    db.session.add(ticket)
     db.session.commit()
     
     flash('Vehicle parked successfully!', 'success')
     return redirect(url_for('user_dashboard'))
 
-@app.route('/user/history')
+@routes.route('/user/history')
 @user_required
 def parking_history():
     tickets = (Ticket.query
+              .options(*with_spot_and_lot())
               .filter_by(user_id=current_user.id)
               .order_by(Ticket.parking_timestamp.desc())
               .limit(50)
               .all())
     return render_template('user/history.html', tickets=tickets, user=current_user.username)
 
-@app.route('/user/summary')
+@routes.route('/user/summary')
 @user_required
 def user_summary():
     try:
-        tickets = Ticket.query.filter_by(user_id=current_user.id).order_by(Ticket.parking_timestamp.asc()).all()
+        summary = user_revenue_summary(current_user.id)
         
-        if not tickets:
+        if not summary:
             flash('No parking history available.', 'info')
             return redirect(url_for('user_dashboard'))
 
-        plt.figure(figsize=(10, 6))
-        dates = [ticket.parking_timestamp.strftime('%Y-%m-%d') for ticket in tickets]
-        costs = [ticket.total_cost if ticket.total_cost else 0 for ticket in tickets]
-        
-        plt.bar(dates, costs, color='#007bff', alpha=0.85)
-        plt.title('Parking Cost History', fontsize=24, fontweight='bold')
-        plt.xlabel('Date', fontsize=21, fontweight='bold')
-        plt.ylabel('Cost (₹)', fontsize=21, fontweight='bold')
-        plt.xticks(fontsize=18, rotation=0)
-        plt.yticks(fontsize=18)
-        plt.tight_layout()
-
-        img = io.BytesIO()
-        plt.savefig(img, format='png', bbox_inches='tight')
-        img.seek(0)
-        plt.close('all')
-        
-        plot_url = base64.b64encode(img.getvalue()).decode()
-        
-        total_spent = sum(costs)
-        avg_cost = total_spent / len(tickets) if tickets else 0
-        
-        most_used_lot = (
-            db.session.query(
-                ParkingLot.prime_location_name,
-                db.func.count(Ticket.id).label('ticket_count')
-            )
-            .select_from(Ticket)
-            .join(ParkingSpot, Ticket.spot_id == ParkingSpot.id)
-            .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
-            .filter(Ticket.user_id == current_user.id)
-            .group_by(ParkingLot.prime_location_name)
-            .order_by(db.text('ticket_count DESC'))
-            .first()
-        )
+        plot_url = request_chart('cost_history', {
+            'dates': [day.strftime('%Y-%m-%d') for day, _, _ in summary['daily']],
+            'costs': [revenue for _, _, revenue in summary['daily']],
+        })
 
         stats = {
-            'total_parkings': len(tickets),
-            'total_spent': f"9{total_spent:.2f}",
-            'avg_cost': f"9{avg_cost:.2f}",
-            'most_used_lot': most_used_lot[0] if most_used_lot else "N/A"
+            'total_parkings': summary['total_parkings'],
+            'total_spent': f"9{summary['total_spent']:.2f}",
+            'avg_cost': f"9{summary['avg_cost']:.2f}",
+            'most_used_lot': summary['most_used_lot'] or "N/A"
         }
         
         return render_template('user/summary.html', plot_url=plot_url, stats=stats, user=current_user.username)
@@ -120,7 +85,7 @@ def user_summary():
         flash('Error generating summary. Please try again later.', 'error')
         return redirect(url_for('user_dashboard'))
     
-@app.route('/user/book_parking/<int:record_id>', methods=['POST'])
+@routes.route('/user/book_parking/<int:record_id>', methods=['POST'])
 @user_required
 def book_parking(record_id):
     ticket = Ticket.query.get_or_404(record_id)
@@ -138,7 +103,7 @@ def book_parking(record_id):
     flash('Parking spot booked successfully!', 'success')
     return redirect(url_for('user_dashboard'))
 
-@app.route('/user/release_parking/<int:record_id>', methods=['POST'])
+@routes.route('/user/release_parking/<int:record_id>', methods=['POST'])
 @user_required
 def release_parking(record_id):
     ticket = Ticket.query.get_or_404(record_id)
@@ -150,70 +115,50 @@ def release_parking(record_id):
         flash('This parking spot is not booked.', 'error')
         return redirect(url_for('user_dashboard'))
 
-    leaving_time = datetime.now()
-    duration = Decimal(str((leaving_time - ticket.parking_timestamp).total_seconds() / 3600))
-    # Ensure minimum charge for 1 hour
-    if duration < 1:
-        duration = Decimal('1.0')
-    total_cost = duration * ticket.parking_cost_per_unit_time
-
-    ticket.active = False
-    ticket.leaving_timestamp = leaving_time
-    ticket.total_cost = total_cost
-    ticket.duration = duration
-    ticket.spot.status = 'A'
+    total_cost = release_ticket(ticket)
+    if total_cost is None:
+        db.session.rollback()
+        flash('This parking spot is not booked.', 'error')
+        return redirect(url_for('user_dashboard'))
     
     db.session.commit()
     flash(f'Parking spot released. Total cost: ₹{total_cost:.2f}', 'success')
     return redirect(url_for('user_dashboard'))
 
-@app.route('/user/find', methods=['GET', 'POST'])
+@routes.route('/user/export/tickets.<fmt>')
+@user_required
+def user_export_tickets(fmt):
+    return export_tickets_response(
+        fmt,
+        lot_id=request.args.get('lot_id', type=int),
+        user_id=current_user.id
+    )
+
+@routes.route('/user/find', methods=['GET', 'POST'])
 @user_required
 def find_parking():
     if request.method == 'POST':
         search_query = request.form.get('search_query', '')
         search_type = request.form.get('search_type', 'location')
-        
-        base_query = (db.session.query(ParkingLot)
-                     .join(ParkingSpot)
-                     .filter(ParkingSpot.status == 'A')
-                     .group_by(ParkingLot.id)
-                     .having(db.func.count(ParkingSpot.id) > 0))
-        
-        if search_type == 'location':
-            parking_lots = base_query.filter(
-                ParkingLot.prime_location_name.ilike(f'%{search_query}%')
-            ).all()
-        else:
-            parking_lots = base_query.filter(
-                ParkingLot.pin_code.ilike(f'%{search_query}%')
-            ).all()
-        
-        lots_with_spots = []
-        for lot in parking_lots:
-            available_spots = ParkingSpot.query.filter_by(
-                lot_id=lot.id, 
-                status='A'
-            ).count()
-            lots_with_spots.append({
-                'lot': lot,
-                'available_spots': available_spots
-            })
-        
+        sort = request.form.get('sort', 'relevance')
+
+        lots_with_spots = find_lots(search_query, search_type, sort, pincode=current_user.pincode)
+
         return render_template(
             'user/find.html',
             lots_with_spots=lots_with_spots,
             search_query=search_query,
             search_type=search_type,
+            sort=sort,
             user=current_user.username
         )
     
     return render_template('user/find.html', user=current_user.username)
 
-@app.route('/user/view_ticket/<int:ticket_id>')
+@routes.route('/user/view_ticket/<int:ticket_id>')
 @user_required
 def view_ticket(ticket_id):
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = Ticket.query.options(*with_spot_and_lot()).get_or_404(ticket_id)
     if ticket.user_id != current_user.id:
         flash('Unauthorized access', 'error')
         return redirect(url_for('user_dashboard'))
@@ -1,3 +1,3 @@
-from .db import db
+from .db import db, configure_sqlite
 from .models import *
 
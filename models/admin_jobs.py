@@ -0,0 +1,142 @@
+from sqlalchemy import delete, select
+from .jobs import job_handler
+from .lot_cache import lot_cache
+from .lot_finder import lots_changed
+from .lot_spots import SPOT_CHUNK, add_spots, remove_free_spots
+from .models import (db, DailyLotRevenue, DailyUserRevenue, ParkingLot, ParkingLotCounter,
+                     ParkingSpot, Ticket)
+from .occupancy import rebuild_counters
+from .rollups import rebuild_rollups
+from .spot_index import lot_changed
+
+TICKET_CHUNK = 5000
+
+
+def lot_row_count(lot):
+    """Spots plus tickets in a lot, from the counters and rollups rather than a scan."""
+    closed = db.session.scalar(
+        select(db.func.coalesce(db.func.sum(DailyLotRevenue.ticket_count), 0))
+        .where(DailyLotRevenue.lot_id == lot.id))
+    return lot.get_total_spots_count() + closed
+
+
+def close_lot(lot):
+    """Close ``lot`` to new parks and commit; False if it still has active tickets.
+
+    Every spot claim requires an open lot, so once the close commits no
+    ticket can appear in the lot after the check. A lot that still has
+    active tickets is reopened.
+    """
+    _set_status(lot, 'closed')
+    if not lot.has_active_tickets():
+        return True
+    _set_status(lot, 'open')
+    return False
+
+
+def _set_status(lot, status):
+    lot.status = status
+    lot_cache.invalidate(lot.id)
+    lots_changed()
+    db.session.commit()
+
+
+@job_handler('resize_lot')
+def resize_lot(job, lot_id):
+    """Add or remove free spots, a chunk per commit, until the lot has its maximum."""
+    lot = db.session.get(ParkingLot, lot_id)
+    if lot is None:
+        job.report(0, 0, 'The parking lot no longer exists.')
+        return
+    total = abs(lot.maximum_number_of_spots - lot.get_total_spots_count())
+    done = 0
+    job.report(done, total, f'Resizing {lot.prime_location_name} to {lot.maximum_number_of_spots} spots')
+    while lot.status == 'open':
+        missing = lot.maximum_number_of_spots - lot.get_total_spots_count()
+        if missing > 0:
+            changed = add_spots(lot, min(missing, SPOT_CHUNK))
+        elif missing < 0:
+            changed = remove_free_spots(lot, min(-missing, SPOT_CHUNK))
+            if not changed:
+                job.report(done, total, f'Stopped at {lot.get_total_spots_count()} spots; '
+                                        'the rest are occupied.')
+                return
+        else:
+            break
+        done += changed
+        lot_cache.invalidate(lot.id)
+        job.report(done, total, f'{done} of {total} spots')
+    if lot.status != 'open':
+        job.report(done, total, 'Stopped; the parking lot is being deleted.')
+
+
+@job_handler('delete_lot')
+def delete_lot(job, lot_id):
+    """Close the lot, then delete its closed tickets and its spots, a chunk per commit, then the lot.
+
+    If any step fails, the lot is reopened with whatever spots it has left.
+    """
+    lot = db.session.get(ParkingLot, lot_id)
+    if lot is None:
+        job.report(0, 0, 'The parking lot no longer exists.')
+        return
+    if not close_lot(lot):
+        raise ValueError('Cannot delete parking lot with active tickets.')
+    try:
+        _delete_closed_lot(job, lot)
+    except Exception:
+        db.session.rollback()
+        lot = db.session.get(ParkingLot, lot_id)
+        if lot is not None:
+            _set_status(lot, 'open')
+        raise
+
+
+def _delete_closed_lot(job, lot):
+    lot_id = lot.id
+    done = 0
+    total = lot_row_count(lot)
+    job.report(done, total, f'Deleting {lot.prime_location_name}')
+
+    lot_spots = select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)
+    while True:
+        ticket_ids = list(db.session.scalars(
+            select(Ticket.id)
+            .where(Ticket.spot_id.in_(lot_spots), Ticket.active == False)
+            .limit(TICKET_CHUNK)))
+        if not ticket_ids:
+            break
+        done += db.session.execute(
+            delete(Ticket).where(Ticket.id.in_(ticket_ids))
+            .execution_options(synchronize_session=False)).rowcount
+        job.report(done, total, f'{done} of {total} tickets and spots deleted')
+
+    while True:
+        removed = remove_free_spots(lot, SPOT_CHUNK)
+        if not removed:
+            break
+        done += removed
+        job.report(done, total, f'{done} of {total} tickets and spots deleted')
+
+    for model in (DailyLotRevenue, DailyUserRevenue, ParkingLotCounter):
+        db.session.execute(delete(model).where(model.lot_id == lot_id)
+                           .execution_options(synchronize_session=False))
+    db.session.expire(lot)
+    db.session.execute(delete(ParkingLot).where(ParkingLot.id == lot_id)
+                       .execution_options(synchronize_session=False))
+    db.session.expunge(lot)
+    lot_changed(lot_id)
+    lot_cache.invalidate(lot_id)
+    lots_changed()
+    job.report(total, total, 'Parking lot deleted')
+
+
+@job_handler('rebuild_summaries')
+def rebuild_summaries(job):
+    """Recompute occupancy counters and revenue rollups from the spots and tickets."""
+    job.report(0, 2, 'Rebuilding occupancy counters')
+    rebuild_counters()
+    job.report(1, 2, 'Rebuilding revenue rollups')
+    rebuild_rollups()
+    job.report(2, 2, 'Summaries rebuilt')
+
@@ -0,0 +1,56 @@
+"""Async (asyncio) access to the same tables, for the ASGI read path.
+
+Queries use the ORM models from models.py and the statements the request
+handlers use, run on an aiosqlite engine so a waiting query does not hold
+a thread. Requires ``aiosqlite``.
+"""
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from .availability_feed import counts_select
+from .db import configure_sqlite
+from .lot_stats import lot_availability_select
+from .models import Ticket, User
+from .principals import UserPrincipal, principal_cache
+from .tickets import with_spot_and_lot
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def create_async_session_factory(url, config):
+    """Session factory on an async engine for ``url``, with the app's SQLite PRAGMAs."""
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    engine = create_async_engine(url, **config.get('ASYNC_ENGINE_OPTIONS', {}))
+    configure_sqlite(engine.sync_engine, config.get('SQLITE_PRAGMAS'))
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def load_principal(session, user_id):
+    """Async counterpart of principals.load_principal, sharing its cache."""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        row = (await session.execute(
+            select(User.id, User.username, User.is_admin).where(User.id == user_id))).first()
+        if row is None:
+            return None
+        principal = UserPrincipal(*row)
+        principal_cache.set(user_id, principal)
+    return principal
+
+
+async def lot_availability(session, lot_ids=None):
+    """``(lot, occupied, available)`` for each lot, as lot_stats.get_lot_availability."""
+    return (await session.execute(lot_availability_select(lot_ids))).all()
+
+
+async def get_ticket(session, ticket_id):
+    """A ticket with its spot and lot loaded, or None."""
+    return await session.scalar(
+        select(Ticket).options(*with_spot_and_lot()).where(Ticket.id == ticket_id))
+
+
+async def lot_counts(session):
+    """Every lot's ``(occupied, available)``, as availability_feed.load_counts."""
+    return {lot_id: (occupied, available)
+            for lot_id, occupied, available in await session.execute(counts_select())}
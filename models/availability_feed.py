@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import deque
+from sqlalchemy import select
+from .models import db, ParkingLotCounter
+
+# Changes kept for subscribers that fall behind or reconnect with Last-Event-ID.
+FEED_BUFFER = 4096
+
+log = logging.getLogger(__name__)
+
+
+def counts_select():
+    return select(ParkingLotCounter.lot_id, ParkingLotCounter.occupied_count,
+                  ParkingLotCounter.available_count)
+
+
+def load_counts():
+    """Every lot's ``(occupied, available)`` counts, keyed by lot id."""
+    return {lot_id: (occupied, available)
+            for lot_id, occupied, available in db.session.execute(counts_select())}
+
+
+class AvailabilityFeed:
+    """In-process fan-out of per-lot availability changes.
+
+    Committed counter changes are published once, numbered and appended to
+    a ring buffer; any number of subscribers wait on one condition and read
+    what they missed from the buffer, so a change costs no queries per
+    subscriber. Only changes made by this process are published directly;
+    ``sync`` folds in the rest from the counters table.
+    """
+
+    def __init__(self, size=FEED_BUFFER):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._counts = None
+        self._syncing = False
+
+    def publish(self, lot_id, occupied, available):
+        """Record a lot's new counts and wake subscribers, unless nothing changed."""
+        with self._cond:
+            self._publish(lot_id, occupied, available)
+
+    def _publish(self, lot_id, occupied, available):
+        if self._counts is not None:
+            if self._counts.get(lot_id) == (occupied, available):
+                return
+            self._counts[lot_id] = (occupied, available)
+        self._seq += 1
+        self._events.append((self._seq, lot_id, occupied, available))
+        self._cond.notify_all()
+
+    def sync(self, counts):
+        """Publish the lots whose counts differ from ``counts`` (e.g. changed by another process)."""
+        with self._cond:
+            if self._counts is None:
+                self._counts = counts
+                return
+            for lot_id, (occupied, available) in counts.items():
+                self._publish(lot_id, occupied, available)
+            for lot_id in self._counts.keys() - counts.keys():
+                del self._counts[lot_id]
+
+    @property
+    def loaded(self):
+        return self._counts is not None
+
+    def snapshot(self):
+        """``(seq, counts)``: every lot's counts as of change number ``seq``."""
+        with self._cond:
+            return self._seq, dict(self._counts or {})
+
+    def changes(self, after, timeout=None):
+        """Changes numbered after ``after``, waiting up to ``timeout`` for one.
+
+        Returns ``(seq, lot_id, occupied, available)`` tuples, oldest first,
+        or None when some of them have already left the buffer.
+        """
+        with self._cond:
+            if self._seq == after and timeout:
+                self._cond.wait(timeout)
+            missed = self._seq - after
+            if missed > len(self._events) or missed < 0:
+                return None
+            return [self._events[-i] for i in range(missed, 0, -1)]
+
+    def start_sync(self, app, interval):
+        """Refresh from the counters table every ``interval`` seconds in a daemon thread.
+
+        Safe to call on every subscription; only the first call starts it.
+        """
+        with self._cond:
+            if self._syncing:
+                return
+            self._syncing = True
+
+        def run():
+            while True:
+                time.sleep(interval)
+                with app.app_context():
+                    try:
+                        self.sync(load_counts())
+                    except Exception:
+                        log.exception('Could not sync lot availability')
+
+        threading.Thread(target=run, name='availability-sync', daemon=True).start()
+
+
+availability_feed = AvailabilityFeed()
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe in-process cache with a time-to-live and LRU eviction.
+
+    Entries can carry tags so related entries are dropped together with
+    ``invalidate_tag``. Every invalidation bumps a generation counter;
+    ``get_or_set`` only stores a freshly computed value if no invalidation
+    happened while it was being computed, so a slow read racing a write
+    cannot re-populate the cache with stale data.
+    """
+
+    def __init__(self, ttl, maxsize=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=(), generation=None, ttl=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires = self.clock() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires, value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, factory, tags=lambda value: ()):
+        """Return the cached value for ``key`` or compute, store and return it.
+
+        ``tags`` maps the computed value to the tags it is stored under.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        generation = self._generation
+        value = factory()
+        self.set(key, value, tags(value), generation)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, entry in self._entries.items() if tag in entry[2]]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LocalBackend:
+    """In-process cache backend with the ``get``/``set``/``delete`` subset of Redis.
+
+    Values are kept as Python objects, so nothing is serialised.
+    """
+
+    def __init__(self, maxsize=4096, default_ttl=300):
+        self._cache = TTLCache(ttl=default_ttl, maxsize=maxsize)
+
+    def get(self, name):
+        return self._cache.get(name)
+
+    def set(self, name, value, ex=None):
+        self._cache.set(name, value, ttl=ex)
+
+    def delete(self, *names):
+        for name in names:
+            self._cache.delete(name)
+
+
+class RedisBackend:
+    """Cache backend over a Redis client (or anything with the same methods).
+
+    Values are stored as JSON, so they must be JSON-serialisable and come
+    back with tuples turned into lists.
+    """
+
+    def __init__(self, client, prefix='parking:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, name):
+        raw = self.client.get(self.prefix + name)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, name, value, ex=None):
+        self.client.set(self.prefix + name, json.dumps(value), ex=ex)
+
+    def delete(self, *names):
+        if names:
+            self.client.delete(*(self.prefix + name for name in names))
+
+    @classmethod
+    def from_url(cls, url):
+        # redis is an optional dependency, only needed when configured
+        import redis
+        return cls(redis.Redis.from_url(url))
@@ -0,0 +1,27 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .models import db
+
+
+def after_commit(callback):
+    """Run ``callback`` once the current transaction commits; drop it on rollback."""
+    db.session.info.setdefault('after_commit', []).append(callback)
+
+
+def after_rollback(callback):
+    """Run ``callback`` if the current transaction rolls back; drop it on commit."""
+    db.session.info.setdefault('after_rollback', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_commit_hooks(session):
+    session.info.pop('after_rollback', None)
+    for callback in session.info.pop('after_commit', []):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _run_rollback_hooks(session):
+    session.info.pop('after_commit', None)
+    for callback in session.info.pop('after_rollback', []):
+        callback()
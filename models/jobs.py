@@ -0,0 +1,178 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import aliased
+from .hooks import after_commit
+from .models import db
+
+JOB_POLL_INTERVAL = 1.0
+# A running job whose progress has not moved for this long is assumed to
+# belong to a dead worker and is handed to the next one.
+JOB_STALE_AFTER = timedelta(minutes=10)
+
+JOB_HANDLERS = {}
+
+log = logging.getLogger(__name__)
+
+
+class Job(db.Model):
+    """A unit of background work, queued in the database and run by a worker."""
+    __table_args__ = (
+        db.Index('ix_job_status', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status}>"
+
+    def report(self, progress, total=None, message=None):
+        """Record progress and commit, together with the work done so far."""
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self.updated_at = datetime.now()
+        db.session.commit()
+
+    def to_dict(self):
+        def timestamp(value):
+            return value.isoformat() if value else None
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'message': self.message,
+            'error': self.error,
+            'created_at': timestamp(self.created_at),
+            'started_at': timestamp(self.started_at),
+            'finished_at': timestamp(self.finished_at),
+        }
+
+
+def job_handler(kind):
+    """Register ``fn(job, **params)`` to run jobs of ``kind``.
+
+    Handlers do their work in chunks and call ``job.report`` after each
+    one, which commits it. They must be safe to re-run from the start,
+    since a job whose worker died is picked up again.
+    """
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, **params):
+    """Add a job to the session; workers are woken once it commits."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'No handler for job kind {kind!r}')
+    job = Job(kind=kind, params=json.dumps(params))
+    db.session.add(job)
+    after_commit(_wake.set)
+    return job
+
+
+def pending(kind, **params):
+    """Whether a job of ``kind`` with these params is queued or running."""
+    return db.session.query(
+        select(Job.id).where(Job.kind == kind, Job.params == json.dumps(params),
+                             Job.status.in_(['queued', 'running'])).exists()
+    ).scalar()
+
+
+def claim_next():
+    """Mark the oldest runnable job as running and return its id, or None.
+
+    A job waits while another job of the same kind with the same params
+    is running, so two resizes of one lot never run at the same time.
+    """
+    now = datetime.now()
+    other = aliased(Job)
+    busy = (select(other.id)
+            .where(other.kind == Job.kind, other.params == Job.params, other.id != Job.id,
+                   other.status == 'running', other.updated_at >= now - JOB_STALE_AFTER)
+            .exists())
+    runnable = or_(Job.status == 'queued',
+                   (Job.status == 'running') & (Job.updated_at < now - JOB_STALE_AFTER)) & ~busy
+    candidate = select(Job.id).where(runnable).order_by(Job.id).limit(1)
+    claim = (update(Job)
+             .where(Job.id == candidate.scalar_subquery(), runnable)
+             .values(status='running', started_at=now, updated_at=now)
+             .execution_options(synchronize_session=False))
+    if db.session.get_bind().dialect.update_returning:
+        job_id = db.session.execute(claim.returning(Job.id)).scalar()
+    else:
+        job_id = db.session.scalar(candidate)
+        if job_id is not None and db.session.execute(
+                claim.where(Job.id == job_id)).rowcount != 1:
+            job_id = None
+    db.session.commit()
+    return job_id
+
+
+def run_job(job_id):
+    """Run a claimed job to completion, recording success or failure."""
+    job = db.session.get(Job, job_id)
+    try:
+        JOB_HANDLERS[job.kind](job, **json.loads(job.params))
+    except Exception as e:
+        log.exception('Job %s (%s) failed', job_id, job.kind)
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.status = 'done'
+    job.finished_at = job.updated_at = datetime.now()
+    db.session.commit()
+
+
+def work(app, stop=None):
+    """Claim and run jobs until ``stop`` is set, sleeping while the queue is empty."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job_id = claim_next()
+            except Exception:
+                log.exception('Could not claim a job')
+                db.session.rollback()
+                job_id = None
+            if job_id is not None:
+                try:
+                    run_job(job_id)
+                except Exception:
+                    log.exception('Could not record the outcome of job %s', job_id)
+                    db.session.rollback()
+                continue
+        _wake.wait(JOB_POLL_INTERVAL)
+        _wake.clear()
+
+
+# Set when a job is committed by this process, so idle workers start on it
+# without waiting for the next poll.
+_wake = threading.Event()
+
+
+def start_workers(app, count):
+    """Start ``count`` daemon worker threads for ``app``."""
+    for i in range(count):
+        threading.Thread(target=work, args=(app,), name=f'job-worker-{i}', daemon=True).start()
@@ -0,0 +1,107 @@
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from .cache import LocalBackend, RedisBackend
+from .hooks import after_commit
+from .models import db, ParkingLot
+
+LOT_CACHE_TTL = 300
+ALL_LOTS_KEY = 'lots:all'
+
+LotInfo = namedtuple('LotInfo', ['id', 'prime_location_name', 'price', 'address',
+                                 'pin_code', 'maximum_number_of_spots'])
+
+
+def _lot_key(lot_id):
+    return f'lot:{lot_id}'
+
+
+def _fields(lot):
+    return (lot.id, lot.prime_location_name, str(lot.price), lot.address,
+            lot.pin_code, lot.maximum_number_of_spots)
+
+
+def _info(fields):
+    lot_id, name, price, address, pin_code, max_spots = fields
+    return LotInfo(lot_id, name, Decimal(price), address, pin_code, max_spots)
+
+
+class LotCache:
+    """Read-through cache of parking lot details (not spot counts).
+
+    Entries are plain field tuples so any backend can store them: the
+    in-process ``LocalBackend`` by default, or ``RedisBackend`` to share
+    the cache between processes. Entries expire after ``ttl`` seconds and
+    are deleted once a transaction that changed the lot commits. Every
+    invalidation bumps a generation counter, and a value loaded while one
+    happened is returned but not stored, so a read racing an edit in this
+    process cannot put the old details back for a whole TTL. Prices are
+    billed from the database, never from here.
+    """
+
+    def __init__(self, backend=None, ttl=LOT_CACHE_TTL):
+        self.backend = backend or LocalBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def configure(self, url=None, ttl=LOT_CACHE_TTL):
+        """Use Redis at ``url``, or a fresh in-process backend when it is None."""
+        self.backend = RedisBackend.from_url(url) if url else LocalBackend()
+        self.ttl = ttl
+
+    def _read(self, key, load):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+        value = load()
+        if value is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self.backend.set(key, value, ex=self.ttl)
+        return value
+
+    def get(self, lot_id):
+        """The lot's details as a LotInfo, or None if there is no such lot."""
+        try:
+            lot_id = int(lot_id)
+        except (TypeError, ValueError):
+            return None
+
+        def load():
+            lot = db.session.get(ParkingLot, lot_id)
+            return _fields(lot) if lot is not None else None
+        fields = self._read(_lot_key(lot_id), load)
+        return _info(fields) if fields is not None else None
+
+    def all(self):
+        """Every lot's details in id order."""
+        rows = self._read(ALL_LOTS_KEY, lambda: [
+            _fields(lot) for lot in ParkingLot.query.order_by(ParkingLot.id)])
+        return [_info(fields) for fields in rows]
+
+    def invalidate(self, lot_id=None):
+        """Drop the lot (and the all-lots list) once the current transaction commits."""
+        keys = [ALL_LOTS_KEY] if lot_id is None else [ALL_LOTS_KEY, _lot_key(lot_id)]
+
+        def delete():
+            with self._lock:
+                self._generation += 1
+            self.backend.delete(*keys)
+        after_commit(delete)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses,
+                'hit_ratio': hits / lookups if lookups else 0.0}
+
+
+lot_cache = LotCache()
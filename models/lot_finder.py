@@ -0,0 +1,101 @@
+from .cache import TTLCache
+from .hooks import after_commit
+from .models import db, ParkingLot, ParkingLotCounter
+from .search import lot_search
+
+FIND_LIMIT = 20
+FIND_CACHE_TTL = 10
+FIND_SORTS = ('relevance', 'available', 'price', 'pin')
+FIND_COLUMNS = {'location': 'prime_location_name', 'pincode': 'pin_code'}
+
+# Tag of the cached results sorted by available spots, whose order any
+# lot's count can change.
+AVAILABLE_SORT_TAG = 'sort:available'
+
+find_cache = TTLCache(ttl=FIND_CACHE_TTL, maxsize=512)
+
+
+def _pin_prefix_length(pincode):
+    """Length of the longest common prefix of a lot's pin code and ``pincode``."""
+    pincode = pincode or ''
+    return db.case(
+        *((db.func.substr(ParkingLot.pin_code, 1, n) == pincode[:n], n)
+          for n in range(len(pincode), 0, -1)),
+        else_=0)
+
+
+def _sort_order(sort, pincode):
+    if sort == 'available':
+        return [ParkingLotCounter.available_count.desc()]
+    if sort == 'price':
+        return [ParkingLot.price.asc()]
+    if sort == 'pin' and pincode:
+        return [_pin_prefix_length(pincode).desc()]
+    return []
+
+
+def _find(text, column, sort, pincode, limit):
+    order = _sort_order(sort, pincode)
+    query = (db.session.query(ParkingLot, ParkingLotCounter.available_count)
+             .join(ParkingLotCounter)
+             .filter(ParkingLotCounter.available_count > 0, ParkingLot.status == 'open')
+             .order_by(*order))
+    rows = lot_search.search(text, columns=(column,), query=query, limit=limit,
+                             ranked=not order)
+    return [
+        {
+            'lot': {
+                'id': lot.id,
+                'prime_location_name': lot.prime_location_name,
+                'address': lot.address,
+                'pin_code': lot.pin_code,
+                'price': lot.price,
+            },
+            'available_spots': available,
+        }
+        for lot, available in rows
+    ]
+
+
+def find_lots(text, search_type='location', sort='relevance', pincode=None, limit=FIND_LIMIT):
+    """Lots with free spots matching ``text``, with their available counts.
+
+    One query joins each lot to its counter, sorted by search relevance,
+    most available spots, lowest price or longest pin code prefix shared
+    with ``pincode``, and limited to ``limit`` rows. Results are plain dicts
+    cached for ``FIND_CACHE_TTL`` seconds and tagged with their lot ids
+    (and the sort by available spots), so a change to one of those lots
+    drops them early.
+    """
+    column = FIND_COLUMNS.get(search_type, 'prime_location_name')
+    sort = sort if sort in FIND_SORTS else 'relevance'
+    text = (text or '').strip()
+    key = (text.lower(), column, sort, pincode if sort == 'pin' else None, limit)
+    return find_cache.get_or_set(
+        key,
+        lambda: _find(text, column, sort, pincode, limit),
+        tags=lambda results: [item['lot']['id'] for item in results]
+        + ([AVAILABLE_SORT_TAG] if sort == 'available' else []))
+
+
+def availability_changed(lot_id, available, now_available=None):
+    """Drop cached results affected by a change of ``available`` free spots in a lot.
+
+    Results listing the lot show its old count. More free spots can also
+    move the lot into a search sorted by available spots, and a lot that
+    was full can now match any search, so everything is dropped in that
+    (rare) case only. ``now_available`` is the lot's new count, if known.
+    """
+    def invalidate():
+        find_cache.invalidate_tag(lot_id)
+        if available > 0:
+            if now_available is None or now_available - available <= 0:
+                find_cache.clear()
+            else:
+                find_cache.invalidate_tag(AVAILABLE_SORT_TAG)
+    after_commit(invalidate)
+
+
+def lots_changed():
+    """Drop every cached result once lot details change in this transaction."""
+    after_commit(find_cache.clear)
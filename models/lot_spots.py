@@ -0,0 +1,76 @@
+from sqlalchemy import delete, insert, select
+from .models import db, ParkingSpot, Ticket
+from .occupancy import adjust_counts
+from .spot_index import lot_changed
+
+SPOT_CHUNK = 5000
+
+
+def add_spots(lot, count):
+    """Insert ``count`` available spots into the lot with chunked bulk INSERTs.
+
+    No ParkingSpot objects are built; counters and the free-spot index are
+    updated in the same transaction. Returns the number of spots added.
+    """
+    if count <= 0:
+        return 0
+    rows = [{'lot_id': lot.id, 'status': 'A'}]
+    for start in range(0, count, SPOT_CHUNK):
+        db.session.execute(insert(ParkingSpot), rows * min(SPOT_CHUNK, count - start))
+    db.session.expire(lot, ['spots'])
+    adjust_counts(lot.id, available=count)
+    lot_changed(lot.id)
+    return count
+
+
+def remove_free_spot(lot_id, spot_id):
+    """Delete one spot if it is still available, with its closed tickets.
+
+    The delete is conditional on ``status = 'A'``, like the claim and
+    release updates, so a park that took the spot first keeps it. Returns
+    whether the spot was deleted; the caller rolls back if it was not.
+    """
+    db.session.execute(
+        delete(Ticket)
+        .where(Ticket.spot_id == spot_id, Ticket.active == False)
+        .execution_options(synchronize_session=False))
+    removed = db.session.execute(
+        delete(ParkingSpot)
+        .where(ParkingSpot.id == spot_id, ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')
+        .execution_options(synchronize_session=False)).rowcount
+    if removed != 1:
+        return False
+    adjust_counts(lot_id, available=-1)
+    lot_changed(lot_id)
+    return True
+
+
+def remove_free_spots(lot, count):
+    """Delete up to ``count`` available spots, newest first, in chunks.
+
+    Each chunk picks spot ids with one query, deletes their (closed)
+    tickets as the ORM cascade would, then deletes the spots that are
+    still available. Returns the number of spots removed.
+    """
+    removed = 0
+    while removed < count:
+        spot_ids = list(db.session.scalars(
+            select(ParkingSpot.id)
+            .where(ParkingSpot.lot_id == lot.id, ParkingSpot.status == 'A')
+            .order_by(ParkingSpot.id.desc())
+            .limit(min(SPOT_CHUNK, count - removed))))
+        if not spot_ids:
+            break
+        db.session.execute(
+            delete(Ticket)
+            .where(Ticket.spot_id.in_(spot_ids), Ticket.active == False)
+            .execution_options(synchronize_session=False))
+        removed += db.session.execute(
+            delete(ParkingSpot)
+            .where(ParkingSpot.id.in_(spot_ids), ParkingSpot.status == 'A')
+            .execution_options(synchronize_session=False)).rowcount
+    if removed:
+        db.session.expire(lot, ['spots'])
+        adjust_counts(lot.id, available=-removed)
+        lot_changed(lot.id)
+    return removed
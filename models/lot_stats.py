@@ -0,0 +1,76 @@
+from sqlalchemy import select
+from .models import db, DailyLotRevenue, ParkingLot, ParkingLotCounter
+
+
+def get_lot_stats(lot_ids=None):
+    """Revenue and spot occupancy for every parking lot in a single query.
+
+    Spot counts come from the per-lot counters and revenue from the daily
+    lot rollups, grouped per lot in a subquery outer-joined onto
+    ParkingLot, so there is one statement however many lots exist and its
+    cost does not grow with ticket history. Pass ``lot_ids`` to restrict
+    the result.
+    """
+    revenue = (db.session.query(
+                    DailyLotRevenue.lot_id.label('lot_id'),
+                    db.func.sum(DailyLotRevenue.revenue).label('revenue'))
+               .group_by(DailyLotRevenue.lot_id)
+               .subquery())
+
+    query = (db.session.query(
+                ParkingLot.id,
+                ParkingLot.prime_location_name,
+                db.func.coalesce(revenue.c.revenue, 0),
+                db.func.coalesce(ParkingLotCounter.occupied_count, 0),
+                db.func.coalesce(ParkingLotCounter.available_count, 0))
+             .outerjoin(ParkingLotCounter)
+             .outerjoin(revenue, revenue.c.lot_id == ParkingLot.id)
+             .order_by(ParkingLot.id))
+    if lot_ids is not None:
+        query = query.filter(ParkingLot.id.in_(lot_ids))
+
+    return [
+        {
+            'lot_id': lot_id,
+            'name': name,
+            'revenue': float(lot_revenue),
+            'occupied': int(occupied),
+            'available': int(available),
+        }
+        for lot_id, name, lot_revenue, occupied, available in query
+    ]
+
+
+def summarize_lot_stats(lot_stats):
+    """Totals across the rows returned by ``get_lot_stats``."""
+    total_revenue = sum(stats['revenue'] for stats in lot_stats)
+    total_occupied = sum(stats['occupied'] for stats in lot_stats)
+    total_spots = total_occupied + sum(stats['available'] for stats in lot_stats)
+    return {
+        'total_revenue': total_revenue,
+        'total_spots': total_spots,
+        'total_occupied': total_occupied,
+        'total_available': total_spots - total_occupied,
+        'overall_occupancy': (total_occupied/total_spots*100) if total_spots > 0 else 0
+    }
+
+
+def lot_availability_select(lot_ids=None):
+    """Statement selecting ``(lot, occupied, available)`` per lot, ordered by id.
+
+    Shared by the request handlers and the async read path.
+    """
+    query = (select(
+                ParkingLot,
+                db.func.coalesce(ParkingLotCounter.occupied_count, 0),
+                db.func.coalesce(ParkingLotCounter.available_count, 0))
+             .outerjoin(ParkingLotCounter)
+             .order_by(ParkingLot.id))
+    if lot_ids is not None:
+        query = query.where(ParkingLot.id.in_(lot_ids))
+    return query
+
+
+def get_lot_availability(lot_ids=None):
+    """``(lot, occupied, available)`` for each lot, in one query ordered by id."""
+    return db.session.execute(lot_availability_select(lot_ids)).all()
@@ -0,0 +1,126 @@
+import bisect
+import threading
+
+# Seconds; spans a cached API hit up to a slow chart render.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Fixed-bucket histogram, one series per combination of label values.
+
+    ``observe`` is a bisect and two additions under a lock, cheap enough
+    to call on every request and SQL statement.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                yield f'{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, values)} {total}'
+            yield f'{self.name}_count{_labels(self.labels, values)} {cumulative}'
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        for values, value in series:
+            yield f'{self.name}{_labels(self.labels, values)} {value}'
+
+
+class Collected:
+    """Values read from elsewhere (e.g. cache statistics) each time metrics are rendered.
+
+    ``collect`` returns a mapping of label-value tuples to numbers.
+    """
+
+    def __init__(self, name, help, labels, collect, type='gauge'):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.type = type
+
+    def samples(self):
+        for values, value in sorted(self.collect().items()):
+            yield f'{self.name}{_labels(self.labels, values)} {value}'
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def collected(self, name, help, labels, collect, type='gauge'):
+        return self._register(Collected(name, help, labels, collect, type))
+
+    def render(self):
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
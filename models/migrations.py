@@ -0,0 +1,92 @@
+from datetime import datetime
+from sqlalchemy import inspect
+from .models import db, ParkingSpot, Ticket
+
+MIGRATIONS = []
+
+
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<SchemaMigration {self.version} {self.name}>"
+
+
+def migration(version):
+    """Register a schema change to run once, in version order, on upgrade."""
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return fn
+    return register
+
+
+def _create_indexes(*indexes):
+    connection = db.session.connection()
+    for index in indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def _index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+@migration(1)
+def occupancy_counters():
+    """Build counters for lots created before the counter table existed."""
+    from .occupancy import ensure_counters
+    ensure_counters()
+
+
+@migration(2)
+def hot_path_indexes():
+    """Index the lot/status, ticket history and active ticket lookups."""
+    _create_indexes(
+        _index(ParkingSpot, 'ix_parking_spot_lot_status'),
+        _index(Ticket, 'ix_ticket_user_parked'),
+        _index(Ticket, 'ix_ticket_active_spot'),
+    )
+
+
+@migration(3)
+def revenue_rollups():
+    """Fill the daily revenue rollups from existing ticket history."""
+    from .rollups import rebuild_rollups
+    rebuild_rollups()
+
+
+@migration(4)
+def search_indexes():
+    """Build the FTS5 trigram search indexes for lots and users (SQLite only)."""
+    from .search import SEARCH_INDEXES
+    for index in SEARCH_INDEXES:
+        index.create()
+
+
+@migration(5)
+def lot_status():
+    """Add the open/closed status column to existing parking lots."""
+    connection = db.session.connection()
+    if 'status' not in {column['name'] for column in inspect(connection).get_columns('parking_lot')}:
+        connection.exec_driver_sql(
+            "ALTER TABLE parking_lot ADD COLUMN status VARCHAR(10) NOT NULL DEFAULT 'open'")
+
+
+def upgrade():
+    """Create missing tables, then apply pending migrations in order.
+
+    Tables that do not exist yet are created with their current indexes by
+    ``create_all``; migrations bring databases created by older versions up
+    to date and are recorded in ``schema_migration`` so each runs once.
+    """
+    db.create_all()
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    for version, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        fn()
+        db.session.add(SchemaMigration(version=version, name=fn.__name__))
+        db.session.commit()
+    return [version for version, _ in MIGRATIONS if version not in applied]
@@ -11,21 +11,51 @@ class ParkingLot(db.Model):
     address = db.Column(db.Text, nullable=False)
     pin_code = db.Column(db.String(10), nullable=False)
     maximum_number_of_spots = db.Column(db.Integer, nullable=False)
+    # 'closed' from the start of its deletion: no one can park in it and
+    # searches skip it.
+    status = db.Column(db.String(10), nullable=False, default='open', server_default='open')
 
     spots = db.relationship('ParkingSpot', backref='lot', lazy=True, 
                           cascade='all, delete-orphan')
+    counter = db.relationship('ParkingLotCounter', backref='lot', uselist=False,
+                            cascade='all, delete-orphan')
+    daily_revenue = db.relationship('DailyLotRevenue', lazy=True,
+                                  cascade='all, delete-orphan')
+    daily_user_revenue = db.relationship('DailyUserRevenue', lazy=True,
+                                       cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"<ParkingLot {self.prime_location_name} ({self.address})>"
 
     def needs_spots(self):
-        return len(self.spots) < self.maximum_number_of_spots
+        return self.get_total_spots_count() < self.maximum_number_of_spots
 
     def remaining_spots_to_create(self):
-        return self.maximum_number_of_spots - len(self.spots)
+        return self.maximum_number_of_spots - self.get_total_spots_count()
+
+    def get_counter(self):
+        if self.counter is None:
+            from .occupancy import rebuild_counters
+            rebuild_counters([self.id])
+        return self.counter
 
     def get_occupied_spots_count(self):
-        return ParkingSpot.query.filter_by(lot_id=self.id, status='O').count()
+        return self.get_counter().occupied_count
+
+    def get_available_spots_count(self):
+        return self.get_counter().available_count
+
+    def get_total_spots_count(self):
+        counter = self.get_counter()
+        return counter.occupied_count + counter.available_count
+
+    def has_active_tickets(self):
+        return db.session.query(
+            Ticket.query
+            .join(ParkingSpot)
+            .filter(ParkingSpot.lot_id == self.id, Ticket.active == True)
+            .exists()
+        ).scalar()
 
     def can_reduce_spots(self, new_max_spots):
         occupied_spots = self.get_occupied_spots_count()
@@ -36,19 +66,27 @@ class ParkingLot(db.Model):
             occupied = self.get_occupied_spots_count()
             return False, f"Cannot reduce spots below occupied count ({occupied} spots in use)"
             
-        spots_to_delete = (ParkingSpot.query
-                         .filter_by(lot_id=self.id, status='A')
-                         .order_by(ParkingSpot.id.desc())
-                         .limit(len(self.spots) - new_max_spots)
-                         .all())
-        
-        for spot in spots_to_delete:
-            db.session.delete(spot)
-            
+        from .lot_spots import remove_free_spots
+        remove_free_spots(self, self.get_total_spots_count() - new_max_spots)
+
         return True, f"Successfully reduced to {new_max_spots} spots"
 
 
+class ParkingLotCounter(db.Model):
+    """Denormalized spot counts for a lot, kept in step with ParkingSpot.status."""
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), primary_key=True)
+    occupied_count = db.Column(db.Integer, nullable=False, default=0)
+    available_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ParkingLotCounter lot {self.lot_id}: {self.occupied_count} occupied, {self.available_count} available>"
+
+
 class ParkingSpot(db.Model):
+    __table_args__ = (
+        db.Index('ix_parking_spot_lot_status', 'lot_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), nullable=False)
     status = db.Column(db.String(1), nullable=False, default='A')
@@ -60,7 +98,7 @@ class ParkingSpot(db.Model):
         return any(ticket.active for ticket in self.tickets)
 
     def get_active_ticket(self):
-        return Ticket.query.filter_by(spot_id=self.id, active=True).first()
+        return Ticket.query.filter(Ticket.spot_id == self.id, Ticket.active == True).first()
 
     def __repr__(self):
         return f"<Spot {self.id} in {self.lot.prime_location_name} - {self.status}>"
@@ -83,6 +121,13 @@ class User(db.Model, UserMixin):
         return f"<User {self.username} ({self.fullname})>"
 
 class Ticket(db.Model):
+    __table_args__ = (
+        db.Index('ix_ticket_user_parked', 'user_id', 'parking_timestamp'),
+        db.Index('ix_ticket_active_spot', 'spot_id',
+                 sqlite_where=db.text('active = 1'),
+                 postgresql_where=db.text('active')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     active = db.Column(db.Boolean, default=True, nullable=False)
     spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id'), nullable=False)
@@ -95,4 +140,29 @@ class Ticket(db.Model):
     parking_cost_per_unit_time = db.Column(db.Numeric(8, 2), nullable=False)
 
     def __repr__(self):
-        return f"<Ticket {self.id} by User {self.user_id} for Spot {self.spot_id}>"
\ No newline at end of file
+        return f"<Ticket {self.id} by User {self.user_id} for Spot {self.spot_id}>"
+
+
+class DailyLotRevenue(db.Model):
+    """Closed tickets per lot and parking day, rolled up as they are released."""
+    day = db.Column(db.Date, primary_key=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    total_duration = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyLotRevenue lot {self.lot_id} on {self.day}: {self.revenue}>"
+
+
+class DailyUserRevenue(db.Model):
+    """Closed tickets per user, lot and parking day, rolled up as they are released."""
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    total_duration = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyUserRevenue user {self.user_id} lot {self.lot_id} on {self.day}: {self.revenue}>"
@@ -0,0 +1,95 @@
+from sqlalchemy import case, delete, insert, select, update
+from .models import db, ParkingLot, ParkingLotCounter, ParkingSpot
+from .availability_feed import availability_feed
+from .hooks import after_commit
+from .lot_finder import availability_changed, lots_changed
+
+
+def _counts_select(lot_ids=None):
+    query = (select(
+                ParkingLot.id,
+                db.func.coalesce(db.func.sum(case((ParkingSpot.status == 'O', 1), else_=0)), 0),
+                db.func.coalesce(db.func.sum(case((ParkingSpot.status == 'A', 1), else_=0)), 0))
+             .select_from(ParkingLot)
+             .outerjoin(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)
+             .group_by(ParkingLot.id))
+    if lot_ids is not None:
+        query = query.where(ParkingLot.id.in_(lot_ids))
+    return query
+
+
+def adjust_counts(lot_id, occupied=0, available=0):
+    """Shift a lot's counters by the given deltas in the current transaction.
+
+    Call this next to the ParkingSpot change it mirrors so both land in the
+    same commit. A lot without a counter row is rebuilt from its spots
+    instead, which already reflects the pending change after autoflush.
+    The new counts go to the live availability feed once it commits.
+    """
+    if not occupied and not available:
+        return
+    stmt = (update(ParkingLotCounter)
+            .where(ParkingLotCounter.lot_id == lot_id)
+            .values(occupied_count=ParkingLotCounter.occupied_count + occupied,
+                    available_count=ParkingLotCounter.available_count + available)
+            .execution_options(synchronize_session='fetch'))
+    if db.session.get_bind().dialect.update_returning:
+        counts = db.session.execute(stmt.returning(ParkingLotCounter.occupied_count,
+                                                   ParkingLotCounter.available_count)).first()
+    else:
+        counts = None
+        if db.session.execute(stmt).rowcount:
+            counter = db.session.get(ParkingLotCounter, lot_id)
+            counts = (counter.occupied_count, counter.available_count)
+    if counts is None:
+        rebuild_counters([lot_id])
+        counter = db.session.get(ParkingLotCounter, lot_id)
+        counts = (counter.occupied_count, counter.available_count) if counter else None
+    availability_changed(lot_id, available, counts[1] if counts is not None else None)
+    if counts is not None:
+        after_commit(lambda: availability_feed.publish(lot_id, *counts))
+
+
+def rebuild_counters(lot_ids=None):
+    """Recompute counters from ParkingSpot rows for the given lots (default all)."""
+    lot_ids = list(lot_ids) if lot_ids is not None else None
+    stmt = delete(ParkingLotCounter)
+    if lot_ids is not None:
+        stmt = stmt.where(ParkingLotCounter.lot_id.in_(lot_ids))
+    db.session.execute(stmt.execution_options(synchronize_session=False))
+    db.session.execute(
+        insert(ParkingLotCounter).from_select(
+            ['lot_id', 'occupied_count', 'available_count'], _counts_select(lot_ids)))
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, ParkingLotCounter):
+            db.session.expire(obj)
+        elif isinstance(obj, ParkingLot):
+            db.session.expire(obj, ['counter'])
+    lots_changed()
+
+
+def ensure_counters():
+    """Create counter rows for lots that do not have one yet."""
+    missing = [lot_id for (lot_id,) in db.session.query(ParkingLot.id)
+               .outerjoin(ParkingLotCounter)
+               .filter(ParkingLotCounter.lot_id.is_(None))]
+    if missing:
+        rebuild_counters(missing)
+        db.session.commit()
+    return missing
+
+
+def find_drift():
+    """Lots whose stored counters disagree with their ParkingSpot rows.
+
+    Returns ``(lot_id, stored, actual)`` tuples where each count is an
+    ``(occupied, available)`` pair; ``stored`` is None for a missing row.
+    """
+    stored = {row.lot_id: (row.occupied_count, row.available_count)
+              for row in ParkingLotCounter.query}
+    drift = []
+    for lot_id, occupied, available in db.session.execute(_counts_select()):
+        actual = (int(occupied), int(available))
+        if stored.get(lot_id) != actual:
+            drift.append((lot_id, stored.get(lot_id), actual))
+    return drift
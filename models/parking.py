@@ -0,0 +1,288 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload
+from .models import db, ParkingLot, ParkingSpot, Ticket, User
+from .hooks import after_rollback
+from .lot_cache import lot_cache
+from .occupancy import adjust_counts
+from .rollups import record_closed_ticket, record_closed_tickets
+from .spot_index import free_spots, spot_freed, lot_changed
+
+ALLOCATION_ATTEMPTS = 5
+# Row ids are SQLite INTEGERs: larger values cannot even be bound.
+MAX_ID = 2 ** 63
+
+
+def valid_id(value):
+    """Whether a decoded JSON value can be a row id: an int (not a bool) in range."""
+    return type(value) is int and 0 < value < MAX_ID
+
+
+def _lot_open(lot_id):
+    """Condition for every spot claim: the lot is not closed for deletion."""
+    return select(ParkingLot.id).where(ParkingLot.id == lot_id, ParkingLot.status == 'open').exists()
+
+
+def _claim_spot_stmt(lot_id, dialect):
+    candidate = (select(ParkingSpot.id)
+                 .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')
+                 .limit(1))
+    if dialect.name == 'postgresql':
+        candidate = candidate.with_for_update(skip_locked=True)
+    return (update(ParkingSpot)
+            .where(ParkingSpot.id == candidate.scalar_subquery(),
+                   ParkingSpot.status == 'A', _lot_open(lot_id))
+            .values(status='O')
+            .returning(ParkingSpot.id)
+            .execution_options(synchronize_session=False))
+
+
+def _claim_known_spot(lot_id, spot_id):
+    claimed = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'A', _lot_open(lot_id))
+        .values(status='O')
+        .execution_options(synchronize_session=False))
+    return claimed.rowcount == 1
+
+
+def _allocate_from_db(lot_id):
+    """Pick and claim a spot using the database alone.
+
+    Where the database supports ``UPDATE ... RETURNING`` the candidate is
+    picked and claimed in one statement (with ``FOR UPDATE SKIP LOCKED`` on
+    PostgreSQL); otherwise a conditional update on ``status = 'A'`` is
+    retried until it wins a spot.
+    """
+    dialect = db.session.get_bind().dialect
+    if dialect.update_returning:
+        return db.session.execute(_claim_spot_stmt(lot_id, dialect)).scalar()
+
+    for _ in range(ALLOCATION_ATTEMPTS):
+        spot_id = (db.session.query(ParkingSpot.id)
+                   .filter_by(lot_id=lot_id, status='A')
+                   .limit(1)
+                   .scalar())
+        if spot_id is None:
+            return None
+        if _claim_known_spot(lot_id, spot_id):
+            return spot_id
+    return None
+
+
+def allocate_spot(lot_id):
+    """Atomically mark one available spot in ``lot_id`` occupied.
+
+    Returns the claimed spot id, or None when the lot has no free spot or
+    is closed.
+    The candidate comes from the in-process free-spot index and is claimed
+    by primary key; if the index is empty or its candidate was already
+    taken elsewhere, the lot is dropped from the index and the spot is
+    allocated from the database instead.
+    """
+    spot_id = free_spots.take(lot_id)
+    if spot_id is not None:
+        if _claim_known_spot(lot_id, spot_id):
+            after_rollback(lambda: free_spots.invalidate(lot_id))
+            return spot_id
+        free_spots.invalidate(lot_id)
+
+    spot_id = _allocate_from_db(lot_id)
+    if spot_id is not None:
+        free_spots.invalidate(lot_id)
+    return spot_id
+
+
+def _lot_price(lot_id):
+    """The lot's price as the database has it, for use inside the ticket INSERT.
+
+    Lot details come from lot_cache, which may lag a price change made
+    through another process; billing reads the row instead, at no extra
+    round trip.
+    """
+    return select(ParkingLot.price).where(ParkingLot.id == lot_id).scalar_subquery()
+
+
+def park_in_lot(user_id, lot_id, vehicle_number, parked_at=None):
+    """Allocate a spot in the lot and open a ticket for it.
+
+    Returns the new (uncommitted) Ticket, or None when the lot is full or
+    closed.
+    """
+    lot = lot_cache.get(lot_id)
+    if lot is None:
+        return None
+    spot_id = allocate_spot(lot.id)
+    if spot_id is None:
+        return None
+
+    ticket = Ticket(
+        spot_id=spot_id,
+        user_id=user_id,
+        vehicle_number=vehicle_number,
+        parking_timestamp=parked_at or datetime.now(),
+        parking_cost_per_unit_time=_lot_price(lot.id),
+        active=True
+    )
+    db.session.add(ticket)
+    adjust_counts(lot.id, occupied=1, available=-1)
+    return ticket
+
+
+def release_ticket(ticket, leaving_time=None, closed=None, freed=None):
+    """Close an active ticket and free its spot.
+
+    Returns the total cost, or None if the ticket was already released
+    (for example by a concurrent request). The updates synchronise the
+    session by primary key rather than by scanning it, so releasing many
+    tickets in one transaction stays linear. Pass a list as ``closed`` to
+    collect the rollup entry for ``record_closed_tickets`` instead of
+    writing it straight away, and a dict as ``freed`` to count the freed
+    spot per lot instead of adjusting the lot's counters.
+    """
+    leaving_time = leaving_time or datetime.now()
+    duration = Decimal(str((leaving_time - ticket.parking_timestamp).total_seconds() / 3600))
+    # Ensure minimum charge for 1 hour
+    if duration < 1:
+        duration = Decimal('1.0')
+    total_cost = duration * ticket.parking_cost_per_unit_time
+
+    released = db.session.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket.id, Ticket.active == True)
+        .values(active=False,
+                leaving_timestamp=leaving_time,
+                total_cost=total_cost,
+                duration=duration)
+        .execution_options(synchronize_session='fetch'))
+    if released.rowcount != 1:
+        return None
+    entry = (ticket.user_id, ticket.spot.lot_id, ticket.parking_timestamp, total_cost, duration)
+    if closed is not None:
+        closed.append(entry)
+    else:
+        record_closed_ticket(*entry)
+
+    spot = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == ticket.spot_id, ParkingSpot.status == 'O')
+        .values(status='A')
+        .execution_options(synchronize_session='fetch'))
+    if spot.rowcount == 1:
+        if freed is not None:
+            freed[ticket.spot.lot_id] = freed.get(ticket.spot.lot_id, 0) + 1
+        else:
+            adjust_counts(ticket.spot.lot_id, occupied=-1, available=1)
+        spot_freed(ticket.spot.lot_id, ticket.spot_id)
+    return total_cost
+
+
+def _claim_spots(lot_id, count):
+    """Claim up to ``count`` free spots in one lot; returns the spot ids."""
+    dialect = db.session.get_bind().dialect
+    if not dialect.update_returning:
+        spot_ids = []
+        for _ in range(count):
+            spot_id = _allocate_from_db(lot_id)
+            if spot_id is None:
+                break
+            spot_ids.append(spot_id)
+        return spot_ids
+
+    candidates = (select(ParkingSpot.id)
+                  .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')
+                  .limit(count))
+    if dialect.name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+    claimed = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id.in_(candidates), ParkingSpot.status == 'A', _lot_open(lot_id))
+        .values(status='O')
+        .returning(ParkingSpot.id)
+        .execution_options(synchronize_session=False))
+    return [spot_id for (spot_id,) in claimed]
+
+
+def process_batch(operations, now=None):
+    """Apply a list of park/release operations in the current transaction.
+
+    Each operation is a dict: ``{'op': 'park', 'lot_id', 'user_id',
+    'vehicle_number'}`` or ``{'op': 'release', 'ticket_id'}``. Releases run
+    first so their spots can be reused by parks in the same batch; parks
+    are then grouped per lot and given spots with one claim statement per
+    lot, in request order. Returns one result dict per operation, in input
+    order, with ``ok`` and either the ticket or an ``error`` message.
+    Counters are adjusted once per lot for the releases and once per lot
+    for the parks; rollups for the released tickets are written once per
+    day and lot.
+    """
+    now = now or datetime.now()
+    results = [None] * len(operations)
+    parks, releases = {}, []
+    for index, operation in enumerate(operations):
+        kind = operation.get('op') if isinstance(operation, dict) else None
+        if kind == 'park' and valid_id(operation.get('lot_id')) \
+                and valid_id(operation.get('user_id')) and operation.get('vehicle_number'):
+            parks.setdefault(operation['lot_id'], []).append(index)
+        elif kind == 'release' and valid_id(operation.get('ticket_id')):
+            releases.append(index)
+        else:
+            results[index] = {'ok': False, 'error': 'Invalid operation.'}
+
+    if releases:
+        ticket_ids = {operations[index]['ticket_id'] for index in releases}
+        tickets = {ticket.id: ticket for ticket in
+                   Ticket.query.options(joinedload(Ticket.spot))
+                   .filter(Ticket.id.in_(ticket_ids))}
+        closed, freed = [], {}
+        for index in releases:
+            ticket = tickets.get(operations[index]['ticket_id'])
+            if ticket is None:
+                results[index] = {'ok': False, 'error': 'Ticket not found.'}
+            elif release_ticket(ticket, now, closed, freed) is None:
+                results[index] = {'ok': False, 'error': 'This parking spot is not booked.'}
+            else:
+                results[index] = {'ok': True, 'ticket': ticket}
+        record_closed_tickets(closed)
+        for lot_id, count in freed.items():
+            adjust_counts(lot_id, occupied=-count, available=count)
+
+    if parks:
+        lots = {lot_id: lot_cache.get(lot_id) for lot_id in parks}
+        user_ids = {operations[index]['user_id'] for indexes in parks.values() for index in indexes}
+        known_users = {user_id for (user_id,) in
+                       db.session.query(User.id).filter(User.id.in_(user_ids))}
+        for lot_id, indexes in parks.items():
+            lot = lots.get(lot_id)
+            if lot is None:
+                for index in indexes:
+                    results[index] = {'ok': False, 'error': 'Parking lot not found.'}
+                continue
+            valid = []
+            for index in indexes:
+                if operations[index]['user_id'] in known_users:
+                    valid.append(index)
+                else:
+                    results[index] = {'ok': False, 'error': 'User not found.'}
+            indexes = valid
+            spot_ids = _claim_spots(lot_id, len(indexes)) if indexes else []
+            for index, spot_id in zip(indexes, spot_ids):
+                operation = operations[index]
+                ticket = Ticket(
+                    spot_id=spot_id,
+                    user_id=operation['user_id'],
+                    vehicle_number=operation['vehicle_number'],
+                    parking_timestamp=now,
+                    parking_cost_per_unit_time=_lot_price(lot_id),
+                    active=True
+                )
+                db.session.add(ticket)
+                results[index] = {'ok': True, 'ticket': ticket}
+            for index in indexes[len(spot_ids):]:
+                results[index] = {'ok': False, 'error': 'No parking spots available in this lot.'}
+            if spot_ids:
+                adjust_counts(lot_id, occupied=len(spot_ids), available=-len(spot_ids))
+                lot_changed(lot_id)
+        db.session.flush()
+    return results
@@ -1,8 +1,20 @@
 from models import db, ParkingLot, ParkingSpot, User, Ticket
+from models.lot_cache import lot_cache
+from models.lot_spots import add_spots
+from models.occupancy import rebuild_counters
+from models.rollups import record_closed_ticket, rebuild_rollups
+from sqlalchemy import insert, select
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 
+TICKET_CHUNK = 50000
+
 def populate_db():
+    """Add the demo lots, users and ticket history that are missing.
+
+    Safe to run repeatedly: existing rows are looked up with one query per
+    table and everything missing is added in a single transaction.
+    """
     lot_data = [
         {
             'prime_location_name': 'Downtown Parking',
@@ -19,21 +31,23 @@ def populate_db():
             'maximum_number_of_spots': 8
         }
     ]
+    existing_lots = {lot.prime_location_name: lot for lot in ParkingLot.query.filter(
+        ParkingLot.prime_location_name.in_([l['prime_location_name'] for l in lot_data]))}
     lots = []
     for lot_info in lot_data:
-        lot = ParkingLot.query.filter_by(prime_location_name=lot_info['prime_location_name']).first()
+        lot = existing_lots.get(lot_info['prime_location_name'])
         if not lot:
             lot = ParkingLot(**lot_info)
             db.session.add(lot)
-            db.session.commit()
-        existing_spots = ParkingSpot.query.filter_by(lot_id=lot.id).count()
-        spots_needed = lot_info['maximum_number_of_spots'] - existing_spots
-        if spots_needed > 0:
-            for i in range(spots_needed):
-                spot = ParkingSpot(lot_id=lot.id, status='A')
-                db.session.add(spot)
-            db.session.commit()
+            lot_cache.invalidate()
         lots.append(lot)
+    db.session.flush()
+
+    spot_counts = dict(db.session.query(ParkingSpot.lot_id, db.func.count(ParkingSpot.id))
+                       .filter(ParkingSpot.lot_id.in_([lot.id for lot in lots]))
+                       .group_by(ParkingSpot.lot_id))
+    for lot, lot_info in zip(lots, lot_data):
+        add_spots(lot, lot_info['maximum_number_of_spots'] - spot_counts.get(lot.id, 0))
 
     user_data = [
         {
@@ -50,36 +64,34 @@ def populate_db():
             'address': '101 Maple Ave',
             'pincode': '111222',
         },
+        {
+            'username': 'admin',
+            'password': 'admin123',
+            'fullname': 'Admin User',
+            'address': '789 Oak St',
+            'pincode': '789012',
+            'is_admin': True,
+        },
     ]
-
+    existing_users = {user.username: user for user in User.query.filter(
+        User.username.in_([u['username'] for u in user_data]))}
     users = []
     for u in user_data:
-        user = User.query.filter_by(username=u['username']).first()
+        user = existing_users.get(u['username'])
         if not user:
+            # Hashing is deliberately slow, so only new users pay for it
             user = User(
                 username=u['username'],
                 password_hash=generate_password_hash(u['password']),
                 fullname=u['fullname'],
                 address=u['address'],
                 pincode=u['pincode'],
-                is_admin=False
+                is_admin=u.get('is_admin', False)
             )
             db.session.add(user)
-            db.session.commit()
-        users.append(user)
-
-    admin_user = User.query.filter_by(username='admin').first()
-    if not admin_user:
-        admin_user = User(
-            username='admin',
-            password_hash=generate_password_hash('admin123'),
-            fullname='Admin User',
-            address='789 Oak St',
-            pincode='789012',
-            is_admin=True
-        )
-        db.session.add(admin_user)
-        db.session.commit()
+        if not user.is_admin:
+            users.append(user)
+    db.session.flush()
 
     # Create inactive tickets for each user
     ticket_data = [
@@ -89,31 +101,34 @@ def populate_db():
         ('JKL321', 3, 6),
         ('QWE987', 8, 1),
     ]
-    
+
     base_date = datetime(2025, 7, 1, 10, 0, 0)  # July 1, 2025, 10:00 AM
-    
+
+    existing_tickets = set(db.session.execute(
+        select(Ticket.user_id, Ticket.vehicle_number, Ticket.parking_timestamp)
+        .where(Ticket.user_id.in_([user.id for user in users]),
+               Ticket.vehicle_number.in_([vehicle for vehicle, _, _ in ticket_data]))))
+    spots_by_lot = {lot.id: [] for lot in lots}
+    for lot_id, spot_id in db.session.execute(
+            select(ParkingSpot.lot_id, ParkingSpot.id)
+            .where(ParkingSpot.lot_id.in_(list(spots_by_lot)))
+            .order_by(ParkingSpot.id)):
+        spots_by_lot[lot_id].append(spot_id)
+
     for i, user in enumerate(users):
         lot = lots[i % len(lots)]
-        spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-        
+        spots = spots_by_lot[lot.id]
+
         for j, (vehicle, days_ago, duration) in enumerate(ticket_data):
-            spot = spots[j % len(spots)]
             start_time = base_date - timedelta(days=days_ago, hours=duration)
             end_time = start_time + timedelta(hours=duration)
-            
-            # Check if ticket already exists
-            existing_ticket = Ticket.query.filter_by(
-                user_id=user.id,
-                vehicle_number=vehicle,
-                parking_timestamp=start_time
-            ).first()
-            
-            if existing_ticket:
+
+            if (user.id, vehicle, start_time) in existing_tickets:
                 continue
-            
+
             ticket = Ticket(
                 user_id=user.id,
-                spot_id=spot.id,
+                spot_id=spots[j % len(spots)],
                 vehicle_number=vehicle,
                 active=False,
                 parking_timestamp=start_time,
@@ -123,5 +138,85 @@ def populate_db():
                 duration=duration
             )
             db.session.add(ticket)
-    
-    db.session.commit()
\ No newline at end of file
+            record_closed_ticket(user.id, lot.id, start_time, ticket.total_cost, duration)
+
+    db.session.commit()
+
+
+def generate_synthetic_data(n_lots, spots_per_lot, n_users=1, tickets_per_lot=0,
+                            password='password', start=datetime(2025, 1, 1, 8, 0, 0)):
+    """Bulk-load synthetic lots, spots, users and closed tickets for benchmarking.
+
+    Rows are written with executemany INSERTs and no ORM objects: lots and
+    spots in one transaction, users in another, then tickets in chunks of
+    TICKET_CHUNK per transaction. Users are named ``user_<id>`` and share
+    one password hash (an unusable one if ``password`` is None). Ticket
+    ``i`` parks on the i-th new spot (cycling) for two hours, ``i`` minutes
+    after ``start``. Counters and revenue rollups are rebuilt at the end.
+    Returns the new lot ids.
+    """
+    first_lot = (db.session.query(db.func.max(ParkingLot.id)).scalar() or 0) + 1
+    lot_ids = range(first_lot, first_lot + n_lots)
+    if n_lots:
+        db.session.execute(insert(ParkingLot), [
+            {
+                'prime_location_name': f'Lot {lot_id}',
+                'price': 40,
+                'address': f'{i} Synthetic Road',
+                'pin_code': f'{500000 + i % 1000}',
+                'maximum_number_of_spots': spots_per_lot,
+            }
+            for i, lot_id in enumerate(lot_ids)
+        ])
+        if spots_per_lot:
+            for lot_id in lot_ids:
+                db.session.execute(insert(ParkingSpot),
+                                   [{'lot_id': lot_id, 'status': 'A'}] * spots_per_lot)
+        lot_cache.invalidate()
+        db.session.commit()
+
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    if n_users:
+        password_hash = generate_password_hash(password) if password is not None else '!'
+        db.session.execute(insert(User), [
+            {
+                'username': f'user_{user_id}',
+                'fullname': f'User {user_id}',
+                'address': 'Synthetic Road',
+                'pincode': '500000',
+                'is_admin': False,
+                'password_hash': password_hash,
+            }
+            for user_id in range(first_user, first_user + n_users)
+        ])
+        db.session.commit()
+
+    n_tickets = n_lots * tickets_per_lot if spots_per_lot and n_users else 0
+    if n_tickets:
+        spot_ids = list(db.session.scalars(
+            select(ParkingSpot.id)
+            .where(ParkingSpot.lot_id >= first_lot)
+            .order_by(ParkingSpot.id)))
+        for chunk_start in range(0, n_tickets, TICKET_CHUNK):
+            rows = []
+            for i in range(chunk_start, min(chunk_start + TICKET_CHUNK, n_tickets)):
+                parked = start + timedelta(minutes=i)
+                rows.append({
+                    'spot_id': spot_ids[i % len(spot_ids)],
+                    'user_id': first_user + i % n_users,
+                    'vehicle_number': f'SY{i:07d}',
+                    'active': False,
+                    'parking_timestamp': parked,
+                    'leaving_timestamp': parked + timedelta(hours=2),
+                    'duration': 2.0,
+                    'parking_cost_per_unit_time': 40,
+                    'total_cost': 80,
+                })
+            # A Core insert on the table skips the ORM's per-row bulk bookkeeping
+            db.session.execute(insert(Ticket.__table__), rows)
+            db.session.commit()
+
+    rebuild_counters(lot_ids)
+    rebuild_rollups()
+    db.session.commit()
+    return list(lot_ids)
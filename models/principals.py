@@ -0,0 +1,59 @@
+from flask_login import UserMixin
+from .cache import TTLCache
+from .hooks import after_commit
+from .models import db, User
+
+PRINCIPAL_TTL = 60
+
+principal_cache = TTLCache(ttl=PRINCIPAL_TTL, maxsize=10000)
+
+
+class UserPrincipal(UserMixin):
+    """Slim stand-in for the logged-in User: id, username and is_admin.
+
+    Principals are shared between requests, so they are read-only. Any
+    other attribute (fullname, address, ...) is read from the full User
+    row, loaded into the current request's session on first use. Code
+    that changes a user must load the real User and call
+    ``principal_changed``.
+    """
+
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+
+    @property
+    def user(self):
+        return db.session.get(User, self.id)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self):
+        return f"<UserPrincipal {self.username}>"
+
+
+def load_principal(user_id):
+    """The cached principal for ``user_id``, loading only three columns on a miss."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        row = (db.session.query(User.id, User.username, User.is_admin)
+               .filter(User.id == user_id)
+               .first())
+        if row is None:
+            return None
+        principal = UserPrincipal(*row)
+        principal_cache.set(user_id, principal)
+    return principal
+
+
+def principal_changed(user_id):
+    """Drop the cached principal once the current transaction commits."""
+    after_commit(lambda: principal_cache.delete(user_id))
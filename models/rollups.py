@@ -0,0 +1,117 @@
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, DailyLotRevenue, DailyUserRevenue, ParkingLot, ParkingSpot, Ticket
+
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+ROLLUP_COLUMNS = ('ticket_count', 'revenue', 'total_duration')
+
+
+def _increment(model, keys, deltas):
+    upsert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        stmt = upsert(model).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: getattr(model, column) + stmt.excluded[column] for column in deltas})
+        db.session.execute(stmt)
+        return
+
+    stmt = update(model).values(**{column: getattr(model, column) + value
+                                   for column, value in deltas.items()})
+    for column, value in keys.items():
+        stmt = stmt.where(getattr(model, column) == value)
+    if db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount == 0:
+        db.session.execute(insert(model).values(**keys, **deltas))
+
+
+def record_closed_ticket(user_id, lot_id, parked_at, total_cost, duration):
+    """Add one closed ticket to the daily lot and user rollups."""
+    record_closed_tickets([(user_id, lot_id, parked_at, total_cost, duration)])
+
+
+def record_closed_tickets(closed):
+    """Add closed tickets to the rollups with one upsert per rollup row.
+
+    ``closed`` holds ``(user_id, lot_id, parked_at, total_cost, duration)``
+    tuples; tickets sharing a day and lot are summed before writing.
+    """
+    lot_deltas, user_deltas = {}, {}
+    for user_id, lot_id, parked_at, total_cost, duration in closed:
+        day = parked_at.date()
+        for totals in (lot_deltas.setdefault((day, lot_id), [0, 0, 0.0]),
+                       user_deltas.setdefault((day, user_id, lot_id), [0, 0, 0.0])):
+            totals[0] += 1
+            totals[1] += total_cost
+            totals[2] += float(duration)
+
+    for (day, lot_id), deltas in lot_deltas.items():
+        _increment(DailyLotRevenue, {'day': day, 'lot_id': lot_id},
+                   dict(zip(ROLLUP_COLUMNS, deltas)))
+    for (day, user_id, lot_id), deltas in user_deltas.items():
+        _increment(DailyUserRevenue, {'day': day, 'user_id': user_id, 'lot_id': lot_id},
+                   dict(zip(ROLLUP_COLUMNS, deltas)))
+
+
+def _closed_tickets(*group_by):
+    day = db.func.date(Ticket.parking_timestamp)
+    return (select(day, *group_by,
+                   db.func.count(Ticket.id),
+                   db.func.sum(Ticket.total_cost),
+                   db.func.coalesce(db.func.sum(Ticket.duration), 0))
+            .select_from(Ticket)
+            .join(ParkingSpot, Ticket.spot_id == ParkingSpot.id)
+            .where(Ticket.active == False, Ticket.total_cost.isnot(None))
+            .group_by(day, *group_by))
+
+
+def rebuild_rollups():
+    """Recompute both rollup tables from every closed ticket."""
+    db.session.execute(delete(DailyLotRevenue).execution_options(synchronize_session=False))
+    db.session.execute(delete(DailyUserRevenue).execution_options(synchronize_session=False))
+    db.session.execute(insert(DailyLotRevenue).from_select(
+        ['day', 'lot_id', *ROLLUP_COLUMNS],
+        _closed_tickets(ParkingSpot.lot_id)))
+    db.session.execute(insert(DailyUserRevenue).from_select(
+        ['day', 'user_id', 'lot_id', *ROLLUP_COLUMNS],
+        _closed_tickets(Ticket.user_id, ParkingSpot.lot_id)))
+
+
+def user_revenue_summary(user_id):
+    """Parking totals for one user from the rollups, or None without history.
+
+    ``daily`` holds ``(day, ticket_count, revenue)`` per parking day, oldest
+    first.
+    """
+    daily = [(day, int(count), float(revenue or 0)) for day, count, revenue in
+             db.session.query(
+                 DailyUserRevenue.day,
+                 db.func.sum(DailyUserRevenue.ticket_count),
+                 db.func.sum(DailyUserRevenue.revenue))
+             .filter(DailyUserRevenue.user_id == user_id)
+             .group_by(DailyUserRevenue.day)
+             .order_by(DailyUserRevenue.day.asc())]
+    if not daily:
+        return None
+
+    most_used_lot = (
+        db.session.query(
+            ParkingLot.prime_location_name,
+            db.func.sum(DailyUserRevenue.ticket_count).label('ticket_count')
+        )
+        .select_from(DailyUserRevenue)
+        .join(ParkingLot, DailyUserRevenue.lot_id == ParkingLot.id)
+        .filter(DailyUserRevenue.user_id == user_id)
+        .group_by(ParkingLot.prime_location_name)
+        .order_by(db.text('ticket_count DESC'))
+        .first()
+    )
+
+    total_parkings = sum(count for _, count, _ in daily)
+    total_spent = sum(revenue for _, _, revenue in daily)
+    return {
+        'daily': daily,
+        'total_parkings': total_parkings,
+        'total_spent': total_spent,
+        'avg_cost': total_spent / total_parkings if total_parkings else 0,
+        'most_used_lot': most_used_lot[0] if most_used_lot else None,
+    }
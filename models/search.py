@@ -0,0 +1,172 @@
+import math
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, case, func, literal_column, or_, select
+from sqlalchemy.exc import OperationalError
+from .models import db, ParkingLot, User
+
+SEARCH_LIMIT = 50
+MIN_MATCH_LENGTH = 3
+# Only this many matches that pass the caller's filters (in the order the
+# index yields them) are ranked, so a very common term costs a bounded
+# amount of sorting work.
+RANK_WINDOW = 1000
+# A fuzzy match must contain at least this share of the query's trigrams.
+MIN_TRIGRAM_SHARE = 0.3
+
+# FTS5 tables live outside the models' metadata so create_all never tries
+# to create them as ordinary tables; the search_indexes migration does.
+_fts_metadata = MetaData()
+
+
+class SearchIndex:
+    """SQLite FTS5 trigram index over text columns of one model's table.
+
+    The index is an external-content FTS5 table kept in step with its
+    source table by triggers, so ORM writes, bulk inserts and raw SQL all
+    update it. Queries of at least three characters are answered from the
+    index, ranked by bm25 within the first ``RANK_WINDOW`` matches that
+    pass the caller's filters; shorter queries, other databases and
+    databases without FTS5 fall back to ``ILIKE '%q%'``. Every search is
+    limited.
+    """
+
+    def __init__(self, name, model, columns):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.table = Table(name, _fts_metadata,
+                           Column('rowid', Integer), Column('rank', Float),
+                           *(Column(column, Text) for column in columns))
+        self._ready = set()
+
+    def _ddl(self):
+        source = self.model.__table__.name
+        columns = ', '.join(self.columns)
+        new_values = ', '.join(f'new.{column}' for column in self.columns)
+        old_values = ', '.join(f'old.{column}' for column in self.columns)
+        insert_new = (f'INSERT INTO {self.name}(rowid, {columns}) '
+                      f'VALUES (new.id, {new_values});')
+        delete_old = (f"INSERT INTO {self.name}({self.name}, rowid, {columns}) "
+                      f"VALUES ('delete', old.id, {old_values});")
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+            f"{columns}, content='{source}', content_rowid='id', tokenize='trigram')",
+            f'CREATE TRIGGER IF NOT EXISTS {self.name}_ai AFTER INSERT ON "{source}" '
+            f'BEGIN {insert_new} END',
+            f'CREATE TRIGGER IF NOT EXISTS {self.name}_ad AFTER DELETE ON "{source}" '
+            f'BEGIN {delete_old} END',
+            f'CREATE TRIGGER IF NOT EXISTS {self.name}_au AFTER UPDATE OF {columns} ON "{source}" '
+            f'BEGIN {delete_old} {insert_new} END',
+        ]
+
+    def create(self):
+        """Create the index and its triggers and fill it from the source table.
+
+        Returns False, leaving the database untouched, where FTS5 with the
+        trigram tokenizer is not available.
+        """
+        if db.session.get_bind().dialect.name != 'sqlite':
+            return False
+        connection = db.session.connection()
+        try:
+            with connection.begin_nested():
+                for statement in self._ddl():
+                    connection.exec_driver_sql(statement)
+        except OperationalError:
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self):
+        db.session.connection().exec_driver_sql(
+            f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')")
+
+    def is_ready(self):
+        engine = db.session.get_bind()
+        if engine.url in self._ready:
+            return True
+        if engine.dialect.name != 'sqlite':
+            return False
+        exists = db.session.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.name}).scalar()
+        if exists:
+            self._ready.add(engine.url)
+        return bool(exists)
+
+    def _matches(self, query, expression, ranked):
+        """Ids of rows matching ``expression``, with their bm25 rank when ``ranked``.
+
+        Ranked matches are limited to ``RANK_WINDOW``, taken from ``query``
+        with its filters applied, so rows the caller filters out (full or
+        closed lots, say) cannot use the window up.
+        """
+        match = literal_column(self.name).op('MATCH')(expression)
+        if not ranked:
+            return select(self.table.c.rowid).where(match).subquery()
+        return (query
+                .with_entities(self.model.id.label('rowid'), self.table.c.rank)
+                .join(self.table, self.table.c.rowid == self.model.id)
+                .filter(match)
+                .order_by(None)
+                .limit(RANK_WINDOW)
+                .subquery())
+
+    def search(self, text, columns=None, query=None, limit=SEARCH_LIMIT, ranked=True):
+        """Rows of ``query`` (default: all of the model) whose columns contain ``text``.
+
+        An empty ``text`` matches every row, in id order. Substring matches
+        come first, best bm25 rank first. When there are none, rows holding
+        at least ``MIN_TRIGRAM_SHARE`` of the trigrams of ``text`` are
+        returned instead, most shared trigrams first, so small typos still
+        find something; all-digit queries such as pin codes only match
+        exactly. With ``ranked=False`` every match is considered and the
+        order of ``query`` is kept, falling back to id.
+        """
+        text = (text or '').strip()
+        columns = columns or self.columns
+        id_column = self.model.id
+        query = query if query is not None else self.model.query
+        if not text:
+            return query.order_by(id_column).limit(limit).all()
+
+        if len(text) < MIN_MATCH_LENGTH or not self.is_ready():
+            pattern = f'%{text}%'
+            return (query
+                    .filter(or_(*(getattr(self.model, column).ilike(pattern)
+                                  for column in columns)))
+                    .order_by(id_column)
+                    .limit(limit)
+                    .all())
+
+        scope = '{' + ' '.join(columns) + '} : '
+        matches = self._matches(query, scope + _quote(text), ranked)
+        order = (matches.c.rank, id_column) if ranked else (id_column,)
+        rows = (query
+                .join(matches, matches.c.rowid == id_column)
+                .order_by(*order)
+                .limit(limit)
+                .all())
+        trigrams = sorted({text[i:i + 3].lower() for i in range(len(text) - 2)})
+        if rows or len(trigrams) < 2 or text.isdigit():
+            return rows
+
+        shared = sum(case((or_(*(func.instr(func.lower(getattr(self.model, column)), trigram) > 0
+                                  for column in columns)), 1), else_=0)
+                     for trigram in trigrams)
+        query = query.filter(shared >= math.ceil(len(trigrams) * MIN_TRIGRAM_SHARE))
+        matches = self._matches(query, scope + '(' + ' OR '.join(_quote(t) for t in trigrams) + ')', ranked)
+        order = (shared.desc(), matches.c.rank, id_column) if ranked else (id_column,)
+        return (query
+                .join(matches, matches.c.rowid == id_column)
+                .order_by(*order)
+                .limit(limit)
+                .all())
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+lot_search = SearchIndex('lot_search', ParkingLot, ('prime_location_name', 'pin_code'))
+user_search = SearchIndex('user_search', User, ('username',))
+SEARCH_INDEXES = (lot_search, user_search)
@@ -0,0 +1,56 @@
+from sqlalchemy import and_
+from .models import db, ParkingSpot, Ticket
+
+SPOTS_PER_PAGE = 500
+MAX_SPOTS_PER_PAGE = 2000
+SPOT_STATUSES = ('A', 'O')
+
+
+def lot_spots_query(lot_id, after=None, status=None):
+    """Spots of a lot after ``after`` in id order, outer-joined to active tickets."""
+    query = (db.session.query(
+                ParkingSpot.id,
+                ParkingSpot.status,
+                Ticket.id,
+                Ticket.vehicle_number,
+                Ticket.parking_timestamp)
+             .outerjoin(Ticket, and_(Ticket.spot_id == ParkingSpot.id, Ticket.active == True))
+             .filter(ParkingSpot.lot_id == lot_id))
+    if after is not None:
+        query = query.filter(ParkingSpot.id > after)
+    if status is not None:
+        query = query.filter(ParkingSpot.status == status)
+    return query.order_by(ParkingSpot.id)
+
+
+def lot_spots_page(lot_id, after=None, status=None, per_page=SPOTS_PER_PAGE):
+    """One page of a lot's spots in id order, with each spot's active ticket.
+
+    Pages are keyed on spot id, and active tickets come from an outer join
+    on the partial active-ticket index, so a page is one query however
+    large the lot is. Returns ``(rows, next_after)`` where each row is
+    ``(spot_id, status, ticket_id, vehicle_number, parking_timestamp)``
+    (ticket fields are None for free spots) and ``next_after`` is None on
+    the last page.
+    """
+    rows = lot_spots_query(lot_id, after, status).limit(per_page + 1).all()
+    next_after = rows[per_page - 1][0] if len(rows) > per_page else None
+    return rows[:per_page], next_after
+
+
+def pack_spots_page(rows, next_after):
+    """Compact JSON form of a ``lot_spots_page`` result.
+
+    Spot ids are delta-encoded (the first is absolute), statuses are one
+    character per spot in the same order, and active tickets are keyed by
+    spot id as ``[ticket_id, vehicle_number, parking_timestamp]``.
+    """
+    ids, statuses, tickets = [], [], {}
+    previous = 0
+    for spot_id, status, ticket_id, vehicle_number, parked_at in rows:
+        ids.append(spot_id - previous)
+        previous = spot_id
+        statuses.append(status)
+        if ticket_id is not None:
+            tickets[spot_id] = [ticket_id, vehicle_number, parked_at.isoformat()]
+    return {'ids': ids, 'status': ''.join(statuses), 'tickets': tickets, 'next': next_after}
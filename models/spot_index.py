@@ -0,0 +1,58 @@
+import threading
+from .models import db, ParkingSpot
+from .hooks import after_commit
+
+
+class FreeSpotIndex:
+    """Per-process free-list of available spot ids, keyed by lot id.
+
+    A lot's list is loaded from ParkingSpot the first time it is needed and
+    is then kept current by the park/release/add/delete paths. It is only a
+    hint: callers must still claim spots with a conditional update and
+    ``invalidate`` the lot when the database disagrees, since other
+    processes change spots without touching this index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}
+
+    def _load(self, lot_id):
+        spot_ids = {spot_id for (spot_id,) in db.session.query(ParkingSpot.id)
+                    .filter_by(lot_id=lot_id, status='A')}
+        with self._lock:
+            return self._free.setdefault(lot_id, spot_ids)
+
+    def take(self, lot_id):
+        """Remove and return a free spot id, or None if the list is empty."""
+        free = self._free.get(lot_id)
+        if free is None:
+            free = self._load(lot_id)
+        with self._lock:
+            return free.pop() if free else None
+
+    def add(self, lot_id, spot_id):
+        with self._lock:
+            free = self._free.get(lot_id)
+            if free is not None:
+                free.add(spot_id)
+
+    def invalidate(self, lot_id=None):
+        with self._lock:
+            if lot_id is None:
+                self._free.clear()
+            else:
+                self._free.pop(lot_id, None)
+
+
+free_spots = FreeSpotIndex()
+
+
+def spot_freed(lot_id, spot_id):
+    """Return a spot to the index when the current transaction commits."""
+    after_commit(lambda: free_spots.add(lot_id, spot_id))
+
+
+def lot_changed(lot_id):
+    """Reload a lot's free list after its spots were added or removed."""
+    after_commit(lambda: free_spots.invalidate(lot_id))
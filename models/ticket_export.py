@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from sqlalchemy import select
+from .models import db, ParkingLot, ParkingSpot, Ticket, User
+
+BATCH_SIZE = 1000
+EXPORT_FIELDS = [
+    'ticket_id', 'user_id', 'username', 'lot_id', 'lot_name', 'spot_id',
+    'vehicle_number', 'parking_timestamp', 'leaving_timestamp', 'duration',
+    'cost_per_hour', 'total_cost', 'active',
+]
+
+
+def export_statement(lot_id=None, user_id=None, start=None, end=None):
+    """Ticket history joined with user, spot and lot, oldest ticket first.
+
+    ``start`` and ``end`` are dates; both are inclusive and apply to the
+    parking timestamp.
+    """
+    stmt = (select(Ticket.id, Ticket.user_id, User.username, ParkingSpot.lot_id,
+                   ParkingLot.prime_location_name, Ticket.spot_id, Ticket.vehicle_number,
+                   Ticket.parking_timestamp, Ticket.leaving_timestamp, Ticket.duration,
+                   Ticket.parking_cost_per_unit_time, Ticket.total_cost, Ticket.active)
+            .join(User, Ticket.user_id == User.id)
+            .join(ParkingSpot, Ticket.spot_id == ParkingSpot.id)
+            .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+            .order_by(Ticket.id))
+    if lot_id is not None:
+        stmt = stmt.where(ParkingSpot.lot_id == lot_id)
+    if user_id is not None:
+        stmt = stmt.where(Ticket.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(Ticket.parking_timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(Ticket.parking_timestamp < end + timedelta(days=1))
+    return stmt
+
+
+def _batches(stmt):
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    for batch in result.partitions():
+        yield batch
+    result.close()
+
+
+def _plain(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(stmt):
+    """CSV text in one chunk per batch of rows, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for batch in _batches(stmt):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(stmt):
+    """One JSON object per line, in one chunk per batch of rows."""
+    for batch in _batches(stmt):
+        yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, map(_plain, row)))) + '\n'
+                      for row in batch)
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from .models import ParkingSpot, Ticket
+
+TICKETS_PER_PAGE = 25
+
+
+def with_spot_and_lot():
+    """Loader options that fetch a ticket's spot and lot in the same query."""
+    return (joinedload(Ticket.spot).joinedload(ParkingSpot.lot),)
+
+
+def encode_cursor(ticket):
+    return f"{ticket.parking_timestamp.isoformat()}_{ticket.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a page cursor into ``(parking_timestamp, id)``; None if malformed."""
+    try:
+        timestamp, ticket_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(ticket_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def user_tickets_page(user_id, cursor=None, per_page=TICKETS_PER_PAGE):
+    """One page of a user's tickets, newest first, with spot and lot loaded.
+
+    Pages are keyed on ``(parking_timestamp, id)`` so each page is an index
+    range scan regardless of how deep into the history it is. Returns the
+    tickets and the cursor for the next page (None on the last page).
+    """
+    query = (Ticket.query
+             .options(*with_spot_and_lot())
+             .filter(Ticket.user_id == user_id))
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        timestamp, ticket_id = after
+        query = query.filter(or_(
+            Ticket.parking_timestamp < timestamp,
+            and_(Ticket.parking_timestamp == timestamp, Ticket.id < ticket_id)))
+    tickets = (query
+               .order_by(Ticket.parking_timestamp.desc(), Ticket.id.desc())
+               .limit(per_page + 1)
+               .all())
+    next_cursor = encode_cursor(tickets[per_page - 1]) if len(tickets) > per_page else None
+    return tickets[:per_page], next_cursor
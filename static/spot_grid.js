@@ -0,0 +1,155 @@
+// Incrementally loads a lot's spot grid from /api/lots/<id>/spots.
+// Pages are fetched as the end of the grid scrolls into view; each page
+// carries delta-encoded spot ids, a one-character-per-spot status string
+// and the active ticket of every occupied spot.
+(function () {
+    var grid = document.getElementById('spot-grid');
+    var sentinel = document.getElementById('spot-grid-sentinel');
+    var filter = document.getElementById('spot-status-filter');
+    if (!grid) {
+        return;
+    }
+
+    var after = null;
+    var done = false;
+    var loading = false;
+    var generation = 0;
+
+    function spotUrl(template, spotId) {
+        return template.replace(/\/0$/, '/' + spotId);
+    }
+
+    function spotCard(spotId, status, ticket) {
+        var occupied = status === 'O';
+        var col = document.createElement('div');
+        col.className = 'col-6 col-md-3 col-lg-2 mb-2';
+
+        var card = document.createElement('div');
+        card.className = 'card h-100 border-' + (occupied ? 'danger' : 'success');
+        var body = document.createElement('div');
+        body.className = 'card-body p-2 small';
+
+        var title = document.createElement('div');
+        title.className = 'fw-bold';
+        title.textContent = 'Spot ' + spotId;
+        body.appendChild(title);
+
+        var badge = document.createElement('span');
+        badge.className = 'badge ' + (occupied ? 'bg-danger' : 'bg-success');
+        badge.textContent = occupied ? 'Occupied' : 'Available';
+        body.appendChild(badge);
+
+        if (occupied && ticket) {
+            var vehicle = document.createElement('div');
+            vehicle.textContent = ticket[1];
+            body.appendChild(vehicle);
+            var link = document.createElement('a');
+            link.className = 'btn btn-info btn-sm mt-1';
+            link.href = spotUrl(grid.dataset.detailsUrl, spotId);
+            link.textContent = 'Details';
+            body.appendChild(link);
+        } else if (!occupied) {
+            var form = document.createElement('form');
+            form.method = 'POST';
+            form.action = spotUrl(grid.dataset.deleteUrl, spotId);
+            form.className = 'mt-1';
+            form.onsubmit = function () {
+                return confirm('Are you sure you want to delete this parking spot?');
+            };
+            var button = document.createElement('button');
+            button.type = 'submit';
+            button.className = 'btn btn-danger btn-sm';
+            button.textContent = 'Delete';
+            form.appendChild(button);
+            body.appendChild(form);
+        }
+
+        card.appendChild(body);
+        col.appendChild(card);
+        return col;
+    }
+
+    function render(page) {
+        var fragment = document.createDocumentFragment();
+        var spotId = 0;
+        for (var i = 0; i < page.ids.length; i++) {
+            spotId += page.ids[i];
+            fragment.appendChild(spotCard(spotId, page.status[i], page.tickets[spotId]));
+        }
+        grid.appendChild(fragment);
+    }
+
+    function loadMore() {
+        if (loading || done) {
+            return;
+        }
+        loading = true;
+        var current = generation;
+        var params = new URLSearchParams();
+        if (after !== null) {
+            params.set('after', after);
+        }
+        if (filter.value) {
+            params.set('status', filter.value);
+        }
+        fetch(grid.dataset.feedUrl + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (page) {
+                if (current !== generation) {
+                    return;
+                }
+                render(page);
+                after = page.next;
+                done = page.next === null;
+                sentinel.textContent = done
+                    ? (grid.children.length ? '' : 'No parking spots found.')
+                    : 'Loading spots…';
+            })
+            .catch(function () {
+                if (current !== generation) {
+                    return;
+                }
+                sentinel.textContent = 'Could not load parking spots.';
+                done = true;
+            })
+            .finally(function () {
+                if (current !== generation) {
+                    return;
+                }
+                loading = false;
+                if (!done && isVisible()) {
+                    loadMore();
+                }
+            });
+    }
+
+    function isVisible() {
+        var box = sentinel.getBoundingClientRect();
+        var scroller = document.getElementById('spot-grid-scroll').getBoundingClientRect();
+        return box.top < scroller.bottom + 200;
+    }
+
+    function reset() {
+        generation++;
+        grid.innerHTML = '';
+        after = null;
+        done = false;
+        loading = false;
+        sentinel.textContent = 'Loading spots…';
+        loadMore();
+    }
+
+    new IntersectionObserver(function (entries) {
+        if (entries[0].isIntersecting) {
+            loadMore();
+        }
+    }, {root: document.getElementById('spot-grid-scroll'), rootMargin: '200px'}).observe(sentinel);
+
+    filter.addEventListener('change', reset);
+    loadMore();
+})();
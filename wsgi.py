@@ -0,0 +1,13 @@
+"""Production entry point for multi-worker WSGI servers, e.g.
+
+    gunicorn --workers 4 --threads 4 wsgi:app
+
+Each server process also runs JOB_WORKERS background job threads; set it
+to 0 to run `flask --app wsgi jobs-worker` separately instead.
+"""
+from app import create_app
+from config import ProductionConfig
+from models import jobs
+
+app = create_app(ProductionConfig)
+jobs.start_workers(app, app.config['JOB_WORKERS'])